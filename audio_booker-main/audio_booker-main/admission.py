@@ -0,0 +1,157 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+
+class AdmissionController:
+    """Giới hạn số session đang đọc theo năng lực tổng hợp đo được, người đến sau xếp hàng.
+
+    - Năng lực = số slot engine chạy song song (kích thước pool của engine) /
+      real-time factor (giây engine chạy cho mỗi giây audio nó tạo ra, trung
+      bình trượt), nhân hệ số dự phòng; max_active > 0 thay thế bằng một giới
+      hạn cố định
+    - Chỉ đo các lần engine thực sự chạy (câu/trang chưa có trong cache), bắt
+      đầu từ giả định thận trọng là tổng hợp chậm bằng thời gian phát
+    - Session đang đọc giữ slot tới khi kết thúc, hủy, rời đi hoặc không có
+      hoạt động trong idle_timeout giây; slot trống được cấp cho người đầu hàng
+    - Thời gian chờ ước lượng theo thời lượng đọc trung bình của các session
+      đã rời đi: mỗi khi có slot trống thì hàng dịch lên một người
+
+    Trạng thái thuộc riêng từng worker process, cũng như pool engine của nó.
+    """
+
+    def __init__(self, max_active: Optional[int] = None, idle_timeout: Optional[float] = None,
+                 headroom: float = 0.8, smoothing: float = 0.1):
+        self.max_active = max_active if max_active is not None else int(os.environ.get('APP_MAX_ACTIVE_SESSIONS', '0'))
+        # Số slot của engine, app đặt lại theo pool thực tế qua set_concurrency
+        self.concurrency = 1
+        self.idle_timeout = idle_timeout or float(os.environ.get('APP_SESSION_IDLE_SECONDS', '180'))
+        self.headroom = headroom
+        self.smoothing = smoothing
+        # Chưa đo được gì: giả định engine chỉ vừa kịp thời gian phát
+        self.rtf = 1.0
+        self.samples = 0
+        self.average_session = 300.0
+        self._active = {}
+        self._waiting = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'admitted': 0, 'queued': 0, 'released': 0, 'idle_released': 0}
+
+    def capacity(self) -> int:
+        if self.max_active > 0:
+            return self.max_active
+        return max(1, int(self.concurrency * self.headroom / max(self.rtf, 1e-3)))
+
+    def set_concurrency(self, slots: int):
+        """Số job engine chạy được cùng lúc (số worker/process trong pool của engine)"""
+        with self._lock:
+            self.concurrency = max(1, slots)
+
+    def record_engine_run(self, wall_seconds: float, audio_seconds: float):
+        """Ghi một lần engine chạy (giây chạy, giây audio tạo ra) để cập nhật real-time factor.
+
+        Mỗi mẫu chỉ kéo ước lượng đi một phần (smoothing), nên vài lần chạy
+        nhanh bất thường không tắt được admission control.
+        """
+        if audio_seconds <= 0 or wall_seconds <= 0:
+            return
+        sample = wall_seconds / audio_seconds
+        with self._lock:
+            self.samples += 1
+            self.rtf += self.smoothing * (sample - self.rtf)
+
+    def admit(self, session_id: str) -> Optional[int]:
+        """None nếu session được đọc ngay (hoặc đang đọc), ngược lại là vị trí trong hàng (từ 1)"""
+        with self._lock:
+            if session_id in self._active:
+                self._active[session_id]['seen'] = time.monotonic()
+                return None
+            if session_id not in self._waiting:
+                if not self._waiting and len(self._active) < self.capacity():
+                    self._activate(session_id)
+                    return None
+                self._waiting[session_id] = time.monotonic()
+                self.stats['queued'] += 1
+            return list(self._waiting).index(session_id) + 1
+
+    def touch(self, session_id: str):
+        with self._lock:
+            if session_id in self._active:
+                self._active[session_id]['seen'] = time.monotonic()
+
+    def is_active(self, session_id: str) -> bool:
+        with self._lock:
+            return session_id in self._active
+
+    def release(self, session_id: str) -> List[str]:
+        """Session ngừng đọc (hoặc rời hàng); trả về các session vừa được cấp slot"""
+        with self._lock:
+            self._waiting.pop(session_id, None)
+            self._deactivate(session_id)
+            return self._promote()
+
+    def reap_idle(self) -> List[str]:
+        """Thu hồi slot của session không hoạt động quá idle_timeout; trả về các session vừa được cấp slot"""
+        now = time.monotonic()
+        with self._lock:
+            for session_id, info in list(self._active.items()):
+                if now - info['seen'] > self.idle_timeout:
+                    self._deactivate(session_id)
+                    self.stats['idle_released'] += 1
+            return self._promote()
+
+    def queue(self) -> List[Tuple[str, int, float]]:
+        """(session_id, vị trí, số giây chờ ước lượng) của mọi session đang chờ"""
+        with self._lock:
+            # Mỗi session rời đi nhường chỗ cho một người; capacity session rời đi sau mỗi average_session giây
+            per_slot = self.average_session / self.capacity()
+            return [(session_id, position, round(position * per_slot, 1))
+                    for position, session_id in enumerate(self._waiting, start=1)]
+
+    def _activate(self, session_id: str):
+        now = time.monotonic()
+        self._active[session_id] = {'since': now, 'seen': now}
+        self.stats['admitted'] += 1
+
+    def _deactivate(self, session_id: str):
+        info = self._active.pop(session_id, None)
+        if info is None:
+            return
+        self.stats['released'] += 1
+        # Thời gian đọc tính tới lần hoạt động cuối (session bị thu hồi vì idle không tính phần chờ)
+        self.average_session += 0.2 * ((info['seen'] - info['since']) - self.average_session)
+        self.average_session = max(self.average_session, 1.0)
+
+    def _promote(self) -> List[str]:
+        promoted = []
+        while self._waiting and len(self._active) < self.capacity():
+            session_id, _ = self._waiting.popitem(last=False)
+            self._activate(session_id)
+            promoted.append(session_id)
+        return promoted
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.stats,
+                        active=len(self._active),
+                        waiting=len(self._waiting),
+                        capacity=self.capacity(),
+                        rtf=round(self.rtf, 3),
+                        rtf_samples=self.samples,
+                        concurrency=self.concurrency,
+                        average_session=round(self.average_session, 1))
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission() -> AdmissionController:
+    """Admission controller dùng chung cho process"""
+    global _controller
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController()
+        return _controller
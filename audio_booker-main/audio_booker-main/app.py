@@ -1,15 +1,33 @@
 import os
+import hmac
+import math
+import mimetypes
 import uuid
 import threading
 import time
-from flask import Flask, render_template, request, jsonify, send_from_directory, url_for
+from contextlib import ExitStack
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory, url_for
 from flask_socketio import SocketIO, join_room, emit
 
+from admission import get_admission
+from audio_encoder import get_encoder
+from audio_postprocess import get_postprocessor
+from audio_utils import probe_duration
+from cancellation import CancellationToken
+from coqui_model_cache import model_cache
+from engine_router import all_routers
+from offload import configure as configure_offload, run_blocking
+from profiling import CallTracer, get_profiler
+from pyttsx3_pool import get_shared_pool
+from sentence_cache import SentenceAudioCache
+from session_store import create_session_store
+from sqlite_queue import SqliteQueueManager
 from text_processor import TextProcessor
 from dialect_mapper import DialectMapper
 from tts_engine import TTSEngine
 from google_tts_engine import GoogleTTSEngine
 from hybrid_tts_engine import HybridTTSEngine
+from subprocess_tts_engine import PersistentSubprocessTTSEngine
 from vietnamese_tts_engine import VietnameseTTSEngine
 
 
@@ -17,16 +35,97 @@ app = Flask(__name__, static_folder='static', template_folder='templates')
 app.config['SECRET_KEY'] = 'dev-secret'
 app.config['UPLOAD_FOLDER'] = os.path.join(os.getcwd(), 'uploads')
 app.config['AUDIO_FOLDER'] = os.path.join(os.getcwd(), 'static', 'audio')
+# Seconds of audio to keep rendered ahead of the page currently playing
+app.config['PREFETCH_SECONDS'] = float(os.environ.get('APP_PREFETCH_SECONDS', '30'))
+# Number of upcoming rendered pages advertised to the client for preloading
+app.config['MANIFEST_PAGES'] = int(os.environ.get('APP_MANIFEST_PAGES', '3'))
+# Most pages a batching engine (pyttsx3) renders in one look-ahead driver run
+app.config['BATCH_PAGES'] = int(os.environ.get('APP_BATCH_PAGES', '4'))
+app.config['SENTENCE_CACHE_FOLDER'] = os.path.join(os.getcwd(), 'cache', 'sentences')
+app.config['SENTENCE_CACHE'] = os.environ.get('APP_SENTENCE_CACHE', '1') == '1'
+app.config['SENTENCE_CACHE_MB'] = int(os.environ.get('APP_SENTENCE_CACHE_MB', '500'))
+# Pause inserted between stitched sentence clips (WAV pages)
+app.config['SENTENCE_GAP_MS'] = int(os.environ.get('APP_SENTENCE_GAP_MS', '250'))
+# Sentences of the page a reader is waiting for (first page, after a seek)
+# synthesized concurrently; 1 = one after another
+app.config['PAGE_PARALLELISM'] = int(os.environ.get('APP_PAGE_PARALLELISM', '4'))
+
+# Pages up to this size are pushed as binary Socket.IO attachments to clients
+# that ask for it, saving the audio_url round trip; 0 = always send URLs
+app.config['INLINE_AUDIO_BYTES'] = int(os.environ.get('APP_INLINE_AUDIO_KB', '256')) * 1024
+# Most pushed audio a client may leave unacknowledged; past that pages go as URLs
+app.config['INLINE_AUDIO_WINDOW_BYTES'] = int(os.environ.get('APP_INLINE_AUDIO_WINDOW_KB', '1024')) * 1024
+
+# Token required by /admin endpoints (they are disabled when unset)
+app.config['ADMIN_TOKEN'] = os.environ.get('APP_ADMIN_TOKEN', '')
 
 # Ensure folders exist
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['AUDIO_FOLDER'], exist_ok=True)
 
-socketio = SocketIO(app, cors_allowed_origins='*')
 
+def _create_socketio() -> SocketIO:
+    """Room emits go through APP_MESSAGE_QUEUE when several workers serve the app.
+
+    sqlite:///path uses the local SqliteQueueManager stand-in; any other URL
+    (redis://, amqp://) is handed to Flask-SocketIO's own queue support.
+    """
+    queue_url = os.environ.get('APP_MESSAGE_QUEUE', '')
+    if queue_url.startswith('sqlite:///'):
+        manager = SqliteQueueManager(queue_url[len('sqlite:///'):])
+        return SocketIO(app, cors_allowed_origins='*', client_manager=manager)
+    if queue_url:
+        return SocketIO(app, cors_allowed_origins='*', message_queue=queue_url)
+    return SocketIO(app, cors_allowed_origins='*')
+
+
+socketio = _create_socketio()
+# Engine calls block (subprocess, HTTP, runAndWait); under eventlet/gevent they
+# run on native threads so one slow page never stalls other clients
+configure_offload(socketio.async_mode)
+
+
+# Session metadata (dialect, reading position, rendered pages) lives in a store
+# shared by every worker process; engines, mappers and locks are per process
+session_store = create_session_store(os.environ.get('APP_SESSION_STORE', ''))
+_runtime = {}
+_runtime_lock = threading.Lock()
+# Socket.IO client id -> session ids it joined on this worker (for disconnect cleanup)
+_socket_sessions = {}
+# Socket.IO client id -> pushed audio bytes it has not acknowledged yet, for
+# clients that joined with inline_audio
+_inline_audio = {}
 
-# In-memory state per session
-sessions = {}
+# A prefetch claim older than this is considered abandoned (e.g. its worker died)
+PREFETCH_STALE_SECONDS = 300
+
+# Caps concurrently reading sessions at what the engines can keep ahead of; others wait in line
+admission = get_admission()
+# Seconds between idle-session sweeps and queue_position updates
+ADMISSION_TICK_SECONDS = 5
+_admission_loop_started = False
+
+# Sentence-level audio shared by every session (None when disabled)
+sentence_cache = SentenceAudioCache(
+    app.config['SENTENCE_CACHE_FOLDER'],
+    max_bytes=app.config['SENTENCE_CACHE_MB'] * 1024 * 1024,
+    gap_ms=app.config['SENTENCE_GAP_MS'],
+    # Only sentences the engine actually synthesized feed the capacity estimate
+    on_engine_run=admission.record_engine_run
+) if app.config['SENTENCE_CACHE'] else None
+
+
+_subprocess_engine = None
+_subprocess_engine_lock = threading.Lock()
+
+
+def _get_subprocess_engine():
+    """The synthesizer pool is started once and shared by every session."""
+    global _subprocess_engine
+    with _subprocess_engine_lock:
+        if _subprocess_engine is None:
+            _subprocess_engine = PersistentSubprocessTTSEngine()
+        return _subprocess_engine
 
 
 def _select_tts_engine():
@@ -37,9 +136,20 @@ def _select_tts_engine():
     - google     (requires internet, outputs mp3, good Vietnamese)
     - hybrid     (tries Coqui then pyttsx3, outputs wav)
     - pyttsx3    (local SAPI5, may not have Vietnamese voices)
+    - subprocess (long-lived CLI synthesizer from APP_SYNTH_COMMAND, outputs wav)
     """
     preferred = os.environ.get('APP_TTS_ENGINE', 'vietnamese').lower()
 
+    if preferred == 'subprocess':
+        synth = _get_subprocess_engine()
+        if synth.available:
+            return synth, 'wav'
+        # fallback chain
+        g = GoogleTTSEngine()
+        if getattr(g, 'available', False):
+            return g, 'mp3'
+        return TTSEngine(), 'wav'
+
     if preferred == 'vietnamese':
         try:
             vn = VietnameseTTSEngine()
@@ -81,42 +191,636 @@ def _select_tts_engine():
     return TTSEngine(), 'wav'
 
 
-def _emit_page(session_id: str, page_index: int):
-    """Generate audio for one page and emit to the client room."""
-    session = sessions.get(session_id)
-    if not session:
-        return False
+def _engine_name(tts) -> str:
+    """The name _build_tts_engine knows an engine instance by (same values as APP_TTS_ENGINE)."""
+    for name, engine_class in (('vietnamese', VietnameseTTSEngine), ('google', GoogleTTSEngine),
+                               ('hybrid', HybridTTSEngine), ('subprocess', PersistentSubprocessTTSEngine),
+                               ('pyttsx3', TTSEngine)):
+        if isinstance(tts, engine_class):
+            return name
+    raise ValueError(f"Unknown TTS engine {type(tts).__name__}")
 
-    pages = session['pages']
-    if page_index < 0 or page_index >= len(pages):
-        return False
 
-    dialect = session['dialect']
+def _build_tts_engine(name: str):
+    """Build exactly the named engine (no fallback chain); None when it is unavailable here.
+
+    Workers that did not handle the upload use this so every worker writes a
+    session's pages in the format recorded at upload time.
+    """
+    if name == 'subprocess':
+        tts = _get_subprocess_engine()
+        return tts if tts.available else None
+    if name == 'vietnamese':
+        tts = VietnameseTTSEngine()
+        return tts if getattr(tts, 'available', False) else None
+    if name == 'google':
+        tts = GoogleTTSEngine()
+        return tts if getattr(tts, 'available', False) else None
+    if name == 'hybrid':
+        tts = HybridTTSEngine()
+        available = getattr(tts, 'coqui_available', False) or getattr(tts, 'pyttsx3_available', False)
+        return tts if available else None
+    if name == 'pyttsx3':
+        return TTSEngine()
+    return None
+
+
+def _engine_slots(tts) -> int:
+    """How many synthesis jobs the engine runs at once: the size of its worker/process pool."""
+    if isinstance(tts, PersistentSubprocessTTSEngine):
+        return tts.pool_size
+    if isinstance(tts, VietnameseTTSEngine):
+        host = tts.persistent_host
+        return host.pool_size if host is not None else 1
+    if isinstance(tts, TTSEngine) or getattr(tts, 'pyttsx3_available', False):
+        # pyttsx3 (also Hybrid's fallback) runs on the worker pool; Coqui batches through one model
+        pool = get_shared_pool()
+        return pool.num_workers if pool is not None else 1
+    # Google fetches a page's chunks over all of its connections at once
+    return 1
+
+
+def _new_runtime(session_id: str, tts) -> dict:
+    return {
+        'tts': tts,
+        'mapper': DialectMapper(),
+        'render_locks': {},
+        'pages': session_store.pages(session_id),
+        # Cancellation token of each synthesis running here -> True for look-ahead jobs
+        'jobs': {}
+    }
+
+
+def _session_runtime(session_id: str, engine: str):
+    """This worker's engine, mapper, page render locks, book and running jobs for a session, created on first use.
+
+    The runtime holds the only strong reference a worker keeps to the shared
+    book, so dropping it lets the book go once no local session reads it.
+    Returns None when the session's engine is unavailable on this worker.
+    """
+    runtime = _runtime.get(session_id)
+    if runtime is not None:
+        return runtime
+    tts = _build_tts_engine(engine)
+    if tts is None:
+        print(f"❌ Session {session_id} needs the {engine} engine, which is unavailable on this worker")
+        return None
+    with _runtime_lock:
+        return _runtime.setdefault(session_id, _new_runtime(session_id, tts))
+
+
+def _get_session(session_id: str):
+    """A snapshot of the shared session state merged with this worker's runtime objects.
+
+    Returns None for unknown sessions and for sessions whose engine this
+    worker cannot build. Changes must go through
+    session_store.update() to be seen by other workers.
+    """
+    if not session_id:
+        return None
+    session = session_store.get(session_id)
+    if session is None:
+        # Cancelled (possibly on another worker): drop our engine for it
+        _runtime.pop(session_id, None)
+        return None
+    runtime = _session_runtime(session_id, session['engine'])
+    if runtime is None:
+        return None
+    session.update(runtime)
+    return session
+
+
+def _page_lock(session: dict, page_index: int) -> threading.Lock:
+    """Per-page render lock: a seek target never waits behind look-ahead of other pages."""
+    with _runtime_lock:
+        return session['render_locks'].setdefault(page_index, threading.Lock())
+
+
+def _page_text(session: dict, page_index: int, dialect: str) -> str:
     mapper: DialectMapper = session['mapper']
-    tts = session['tts']
-    audio_ext = session['audio_ext']
+    return mapper.transform_text(session['pages'][page_index], dialect)
 
-    page_text = pages[page_index]
-    mapped_text = mapper.transform_text(page_text, dialect)
 
-    filename = f"{session_id}_page_{page_index}.{audio_ext}"
-    output_path = os.path.join(app.config['AUDIO_FOLDER'], filename)
+def _start_job(session_id: str, session: dict, epoch=None) -> CancellationToken:
+    """Register a cancellation token for a synthesis about to run on this worker.
 
-    ok = tts.generate_audio(mapped_text, output_path, dialect=dialect)
-    if not ok:
-        socketio.emit('error', {'message': 'Failed to generate audio'}, to=session_id)
-        return False
+    Every job stops once the session is gone. A look-ahead job (``epoch``
+    given) also stops when the reader seeks or switches dialect, even if that
+    happened on another worker: the token polls the shared store for it.
+    """
+    dialect = session['dialect']
+
+    def stale():
+        state = session_store.get(session_id)
+        if state is None:
+            return True
+        return epoch is not None and (state['epoch'] != epoch or state['dialect'] != dialect)
+
+    token = CancellationToken(check=stale)
+    with _runtime_lock:
+        session['jobs'][token] = epoch is not None
+    return token
 
-    audio_url = f"/static/audio/{filename}"
 
-    socketio.emit('new_page', {
+def _finish_job(session: dict, token: CancellationToken):
+    with _runtime_lock:
+        session['jobs'].pop(token, None)
+
+
+def _cancel_jobs(session_id: str, lookahead_only: bool = False):
+    """Cancel synthesis running on this worker for a session (all of it, or only look-ahead)."""
+    with _runtime_lock:
+        runtime = _runtime.get(session_id)
+        jobs = list(runtime['jobs'].items()) if runtime else []
+    for token, lookahead in jobs:
+        if lookahead or not lookahead_only:
+            token.cancel()
+
+
+def _render_page(session_id: str, page_index: int, encode: bool = False, epoch=None, parallel: int = 1):
+    """Synthesize one page to disk and record it in the session's page state.
+
+    Returns the page entry (number, url, duration, size) or None on failure
+    or cancellation. Pages already rendered with the current dialect are
+    reused. With ``encode`` the page is also compressed to the session's
+    output format; only the background prefetch worker asks for that so the
+    request path never waits on the encoder (its pages are encoded afterwards,
+    see _encode_page). ``epoch`` marks a look-ahead
+    render that is abandoned when the reader seeks or changes dialect.
+    ``parallel`` synthesizes that many of the page's sentences at once.
+    """
+    return _render_pages(session_id, [page_index], encode, epoch, parallel)[0]
+
+
+def _render_pages(session_id: str, page_indices: list, encode: bool = False, epoch=None,
+                  parallel: int = 1) -> list:
+    """Like _render_page for several pages, returning one entry (or None) per index.
+
+    Engines with generate_many synthesize all missing pages in one call
+    (one pyttsx3 driver run, or one concurrent Google fetch) instead of one per page.
+    """
+    session = _get_session(session_id)
+    if not session:
+        return [None] * len(page_indices)
+    valid = sorted({i for i in page_indices if 0 <= i < len(session['pages'])})
+
+    with ExitStack() as stack:
+        # Always locked in page order, so overlapping windows never deadlock
+        for page_index in valid:
+            stack.enter_context(_page_lock(session, page_index))
+
+        # Re-read: pages may have been rendered while we waited for the locks
+        session = _get_session(session_id)
+        if not session:
+            return [None] * len(page_indices)
+        dialect = session['dialect']
+        tts = session['tts']
+        source_ext = session['source_ext']
+
+        entries = {}
+        jobs = []
+        for page_index in valid:
+            rendered = session['rendered'].get(page_index)
+            if rendered and rendered['dialect'] == dialect:
+                entries[page_index] = rendered
+                continue
+            # The dialect is part of the name so re-rendering never overwrites a
+            # file a client may still be streaming (e.g. a published playlist segment)
+            stem = f"{session_id}_page_{page_index}_{dialect}"
+            # Page locks are per worker: another worker may render the same page at
+            # the same time, so each render writes its own file and is renamed into place
+            work_path = os.path.join(app.config['AUDIO_FOLDER'], f"tmp_{uuid.uuid4().hex}.{source_ext}")
+            jobs.append((page_index, stem, _page_text(session, page_index, dialect), work_path))
+
+        if jobs:
+            token = _start_job(session_id, session, epoch)
+            try:
+                results = _synthesize(tts, [(text, path) for _, _, text, path in jobs], dialect, source_ext, token,
+                                      parallel)
+            finally:
+                _finish_job(session, token)
+            for (page_index, stem, _, work_path), ok in zip(jobs, results):
+                if ok:
+                    entries[page_index] = _finish_page(session_id, session, page_index, stem, work_path, encode)
+                    continue
+                if token.cancelled:
+                    print(f"⚠️ Page {page_index} of session {session_id} cancelled")
+                if os.path.exists(work_path):
+                    os.remove(work_path)
+
+    return [entries.get(i) for i in page_indices]
+
+
+def _synthesize(tts, pages: list, dialect: str, source_ext: str, token: CancellationToken,
+                parallel: int = 1) -> list:
+    """Render [(text, output_path)] through the sentence cache, then the engine directly."""
+    # Engine pools start lazily, so the slot count is only known once they ran
+    admission.set_concurrency(_engine_slots(tts))
+    results = [False] * len(pages)
+    if sentence_cache is not None:
+        results = sentence_cache.synthesize_pages(tts, pages, dialect, source_ext, cancel=token, parallel=parallel)
+    retry = [k for k, ok in enumerate(results) if not ok]
+    if not retry or token.cancelled:
+        return results
+    started = time.monotonic()
+    if len(retry) > 1 and hasattr(tts, 'generate_many'):
+        redone = tts.generate_many([(pages[k][0], pages[k][1], dialect) for k in retry], cancel=token)
+    else:
+        redone = []
+        for k in retry:
+            redone.append(not token.cancelled and tts.generate_audio(pages[k][0], pages[k][1],
+                                                                     dialect=dialect, cancel=token))
+    for k, ok in zip(retry, redone):
+        results[k] = ok
+    if not token.cancelled:
+        # Pages rendered one engine job at a time: a direct measure of engine speed
+        admission.record_engine_run(time.monotonic() - started,
+                                    sum(probe_duration(pages[k][1]) for k, ok in zip(retry, redone) if ok))
+    return results
+
+
+def _finish_page(session_id: str, session: dict, page_index: int, stem: str, work_path: str, encode: bool):
+    """Post-process (and optionally encode) a page synthesized to work_path and record its entry.
+
+    The finished file is renamed to its served name in one step, so a client
+    or another worker never sees a partly written or rewritten page.
+    """
+    source_ext = session['source_ext']
+    filename = f"{stem}.{source_ext}"
+
+    # Trim dead air, downmix and downsample PCM output before it is measured or served
+    get_postprocessor().process(work_path)
+
+    duration = probe_duration(work_path)
+    encoded = False
+    if encode and session['audio_ext'] != source_ext:
+        encoded_name = f"{stem}.{session['audio_ext']}"
+        encoded_path = os.path.join(app.config['AUDIO_FOLDER'], encoded_name)
+        if get_encoder().encode(work_path, encoded_path):
+            os.remove(work_path)
+            filename = encoded_name
+            encoded = True
+    if not encoded:
+        os.replace(work_path, os.path.join(app.config['AUDIO_FOLDER'], filename))
+
+    entry = {
         'page_number': page_index,
-        'text': mapped_text,
-        'audio_url': audio_url
-    }, to=session_id)
+        'audio_url': f"/static/audio/{filename}",
+        'filename': filename,
+        'duration': duration,
+        'size': os.path.getsize(os.path.join(app.config['AUDIO_FOLDER'], filename)),
+        'dialect': session['dialect']
+    }
+
+    def record(state):
+        state['rendered'][page_index] = entry
+        state['page_durations'][page_index] = duration
+        _extend_playlist(state)
+
+    session_store.update(session_id, record)
+    return entry
+
+
+def _extend_playlist(session: dict):
+    """Append newly rendered pages to the session's segment playlist, in page order.
+
+    Published segments are never replaced, so a player that already fetched
+    the playlist keeps a consistent timeline even if the dialect changes.
+    """
+    playlist = session['playlist']
+    while len(playlist) < session['total_pages']:
+        rendered = session['rendered'].get(len(playlist))
+        if not rendered:
+            break
+        playlist.append({
+            'page_number': rendered['page_number'],
+            'filename': rendered['filename'],
+            'duration': rendered['duration']
+        })
+
+
+def _emit_page(session_id: str, page_index: int):
+    """Generate audio for one page and emit to the client room.
+
+    When an admin armed tracing for the session, this one render is traced and
+    the report is stored with the session.
+    """
+    session = session_store.get(session_id)
+    if session and session.get('trace_requested') and _claim_trace(session_id):
+        tracer = CallTracer()
+        ok = _emit_page_run(session_id, page_index, tracer)
+        report = {
+            'page_number': page_index,
+            'ok': ok,
+            'seconds': round(tracer.seconds, 3),
+            'finished_at': time.time(),
+            'collapsed': tracer.collapsed()
+        }
+        session_store.update(session_id, lambda state: state.update(trace_report=report))
+        return ok
+    return _emit_page_run(session_id, page_index)
+
+
+def _claim_trace(session_id: str) -> bool:
+    """Take the pending trace request so only one run (on one worker) is traced."""
+    claimed = []
+
+    def claim(state):
+        if state.get('trace_requested'):
+            state['trace_requested'] = False
+            claimed.append(True)
+
+    session_store.update(session_id, claim)
+    return bool(claimed)
+
+
+def _emit_page_run(session_id: str, page_index: int, tracer: CallTracer = None):
+    # The reader is waiting on this page: spread its sentences over the engine workers
+    parallel = app.config['PAGE_PARALLELISM']
+    if tracer is not None:
+        # Traced on the worker thread that renders, so the engine work is seen
+        # without blocking the event loop; emits stay on this green thread
+        entry = run_blocking(tracer.run, _render_page, session_id, page_index, parallel=parallel)
+    else:
+        entry = run_blocking(_render_page, session_id, page_index, parallel=parallel)
+    session = _get_session(session_id)
+    if not entry or not session:
+        if session_id in session_store:
+            socketio.emit('error', {'message': 'Failed to generate audio'}, to=session_id)
+        return False
+
+    payload = _manifest_entry(session, entry)
+    payload['manifest'] = _manifest(session, page_index)
+    # Bytes go first: the client has them by the time new_page asks for the URL
+    _push_audio(session_id, payload)
+    socketio.emit('new_page', payload, to=session_id)
+
+    if _needs_encode(session, entry):
+        socketio.start_background_task(_encode_page, session_id, page_index, entry['filename'])
+    _schedule_prefetch(session_id)
     return True
 
 
+def _needs_encode(session: dict, entry: dict) -> bool:
+    return os.path.splitext(entry['filename'])[1][1:] != session['audio_ext']
+
+
+def _encode_page(session_id: str, page_index: int, filename: str):
+    """Encode a page served uncompressed on the request path, then point its entry at the encoded file.
+
+    The source file stays on disk (it is removed with the session), so a
+    client already streaming it, or a playlist segment that names it, keeps working.
+    """
+    session = session_store.get(session_id)
+    if not session:
+        return
+    encoded_name = f"{os.path.splitext(filename)[0]}.{session['audio_ext']}"
+    encoded_path = os.path.join(app.config['AUDIO_FOLDER'], encoded_name)
+    if not run_blocking(get_encoder().encode, os.path.join(app.config['AUDIO_FOLDER'], filename), encoded_path):
+        return
+    size = os.path.getsize(encoded_path)
+
+    def swap(state):
+        entry = state['rendered'].get(page_index)
+        # Re-rendered meanwhile (dialect change): the encoded file is stale
+        if entry and entry['filename'] == filename:
+            state['rendered'][page_index] = dict(entry, filename=encoded_name, size=size,
+                                                 audio_url=f"/static/audio/{encoded_name}")
+
+    session_store.update(session_id, swap)
+
+
+def _manifest_entry(session: dict, entry: dict) -> dict:
+    """The client-facing description of a rendered page."""
+    return {
+        'page_number': entry['page_number'],
+        'text': _page_text(session, entry['page_number'], entry['dialect']),
+        'audio_url': entry['audio_url'],
+        'duration': entry['duration'],
+        'size': entry['size']
+    }
+
+
+def _manifest(session: dict, page_index: int) -> list:
+    """Already-rendered pages right after page_index, for the client to preload."""
+    manifest = []
+    index = page_index + 1
+    while index < len(session['pages']) and len(manifest) < app.config['MANIFEST_PAGES']:
+        rendered = session['rendered'].get(index)
+        if not rendered or rendered['dialect'] != session['dialect']:
+            break
+        manifest.append(_manifest_entry(session, rendered))
+        index += 1
+    return manifest
+
+
+def _push_audio(session_id: str, page: dict):
+    """Send a small page's audio as a binary page_audio event to the session's inline-audio clients.
+
+    Only clients connected to this worker get it, and only while their
+    unacknowledged pushes stay within INLINE_AUDIO_WINDOW_BYTES; a client
+    that reads slowly falls back to fetching audio_url instead of piling up
+    data in the server's send queue.
+    """
+    size = page['size']
+    if not size or size > app.config['INLINE_AUDIO_BYTES']:
+        return
+    with _runtime_lock:
+        targets = [sid for sid, pending in _inline_audio.items()
+                   if session_id in _socket_sessions.get(sid, ())
+                   and pending + size <= app.config['INLINE_AUDIO_WINDOW_BYTES']]
+        for sid in targets:
+            _inline_audio[sid] += size
+    if not targets:
+        return
+
+    filename = os.path.basename(page['audio_url'])
+    try:
+        with open(os.path.join(app.config['AUDIO_FOLDER'], filename), 'rb') as f:
+            audio = f.read()
+    except OSError as e:
+        print(f"⚠️ Could not push audio {filename}: {e}")
+        audio = None
+    payload = {k: v for k, v in page.items() if k != 'manifest'}
+    payload['mime_type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    payload['audio'] = audio
+    for sid in targets:
+        if audio is None:
+            _audio_acked(sid, size)
+            continue
+        # The client acknowledges once it has turned the bytes into a playable blob. The target
+        # is connected to this worker, so the bytes skip the message queue shared with other workers
+        socketio.emit('page_audio', payload, to=sid, callback=lambda *_, sid=sid: _audio_acked(sid, size),
+                      ignore_queue=True)
+
+
+def _audio_acked(sid: str, size: int):
+    with _runtime_lock:
+        if sid in _inline_audio:
+            _inline_audio[sid] = max(0, _inline_audio[sid] - size)
+
+
+def _buffered_seconds(session: dict):
+    """Playback time already rendered after the current page.
+
+    Returns (seconds, next_index) where next_index is the first page that
+    still needs rendering.
+    """
+    index = session.get('current_page', 0) + 1
+    buffered = 0.0
+    while index < len(session['pages']):
+        rendered = session['rendered'].get(index)
+        if not rendered or rendered['dialect'] != session['dialect']:
+            break
+        buffered += rendered['duration']
+        index += 1
+    return buffered, index
+
+
+def _schedule_prefetch(session_id: str):
+    """Start a background look-ahead for the session unless one is running on any worker.
+
+    A look-ahead started before the latest seek (older epoch) does not block a
+    new one: it stops at its next page boundary and leaves the claim alone.
+    """
+    claimed = []
+
+    def claim(state):
+        current = state.get('prefetching')
+        if (not current or current['epoch'] != state['epoch']
+                or time.time() - current['since'] > PREFETCH_STALE_SECONDS):
+            state['prefetching'] = {'since': time.time(), 'epoch': state['epoch']}
+            claimed.append(state['epoch'])
+
+    session_store.update(session_id, claim)
+    if claimed:
+        socketio.start_background_task(_prefetch_worker, session_id, claimed[0])
+
+
+def _lookahead_window(session: dict, buffered: float, next_index: int) -> list:
+    """Pages to render in the next look-ahead step.
+
+    One page at a time, unless the engine batches (generate_many): then as many
+    pages as should fill the buffer, estimated from pages rendered so far and
+    capped by BATCH_PAGES.
+    """
+    count = 1
+    durations = list(session['page_durations'].values())
+    if hasattr(session['tts'], 'generate_many') and durations:
+        average = max(sum(durations) / len(durations), 0.1)
+        count = math.ceil((app.config['PREFETCH_SECONDS'] - buffered) / average)
+        count = max(1, min(count, app.config['BATCH_PAGES']))
+    return list(range(next_index, min(next_index + count, len(session['pages']))))
+
+
+def _prefetch_worker(session_id: str, epoch: int = 0):
+    """Render upcoming pages until PREFETCH_SECONDS of playback is buffered.
+
+    Stops as soon as the session's epoch moves on (seek), since the pages it
+    would render are no longer ahead of the reader.
+    """
+
+    def refresh(state):
+        # Keep the claim fresh so other workers don't take it over as stale
+        if state.get('prefetching') and state['prefetching']['epoch'] == epoch:
+            state['prefetching']['since'] = time.time()
+
+    def release(state):
+        if state.get('prefetching') and state['prefetching']['epoch'] == epoch:
+            state['prefetching'] = None
+
+    try:
+        while True:
+            session = _get_session(session_id)
+            if not session or session['epoch'] != epoch:
+                return
+            buffered, next_index = _buffered_seconds(session)
+            if next_index >= len(session['pages']) or buffered >= app.config['PREFETCH_SECONDS']:
+                return
+            window = _lookahead_window(session, buffered, next_index)
+            entries = run_blocking(_render_pages, session_id, window, encode=True, epoch=epoch)
+            session_store.update(session_id, refresh)
+            for page_index, entry in zip(window, entries):
+                if not entry:
+                    return
+                if page_index - session.get('current_page', 0) <= app.config['MANIFEST_PAGES']:
+                    payload = _manifest_entry(session, entry)
+                    _push_audio(session_id, payload)
+                    socketio.emit('manifest_ready', payload, to=session_id)
+    finally:
+        session_store.update(session_id, release)
+
+
+def _admit(session_id: str) -> bool:
+    """Take (or keep) a reading slot for the session.
+
+    When every slot is taken the session joins the waiting line and its room
+    gets a queue_position event instead of audio; it is started as soon as a
+    slot frees up.
+    """
+    position = admission.admit(session_id)
+    if position is None:
+        return True
+    _ensure_admission_loop()
+    socketio.emit('queue_position', _queue_payload(session_id), to=session_id)
+    return False
+
+
+def _queue_payload(session_id: str) -> dict:
+    for waiting_id, position, wait in admission.queue():
+        if waiting_id == session_id:
+            return {'session_id': session_id, 'queue_position': position, 'estimated_wait': wait}
+    return {'session_id': session_id, 'queue_position': 0, 'estimated_wait': 0.0}
+
+
+def _release(session_id: str):
+    """Give up the session's reading slot (or place in line) and start whoever gets it."""
+    _start_admitted(admission.release(session_id))
+
+
+def _start_admitted(session_ids: list):
+    for session_id in session_ids:
+        session = session_store.get(session_id)
+        if not session:
+            _release(session_id)
+            continue
+        print(f"✅ Session {session_id} admitted from the waiting line")
+        socketio.emit('admitted', {'session_id': session_id}, to=session_id)
+        socketio.start_background_task(_emit_page, session_id, session.get('current_page', 0))
+    if session_ids:
+        _notify_queue()
+
+
+def _notify_queue():
+    """Tell every waiting session its current place in line and estimated wait."""
+    for session_id, position, wait in admission.queue():
+        socketio.emit('queue_position', {
+            'session_id': session_id,
+            'queue_position': position,
+            'estimated_wait': wait
+        }, to=session_id)
+
+
+def _ensure_admission_loop():
+    global _admission_loop_started
+    with _runtime_lock:
+        if _admission_loop_started:
+            return
+        _admission_loop_started = True
+    socketio.start_background_task(_admission_loop)
+
+
+def _admission_loop():
+    """Free slots of readers that went quiet and keep waiting readers' estimates current."""
+    while True:
+        socketio.sleep(ADMISSION_TICK_SECONDS)
+        try:
+            _start_admitted(admission.reap_idle())
+            _notify_queue()
+        except Exception as e:
+            print(f"⚠️ Admission sweep failed: {e}")
+
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -144,83 +848,268 @@ def upload():
     full_text = processor.extract_text(save_path)
     pages = processor.split_into_pages(full_text)
 
-    # Prepare session objects
-    mapper = DialectMapper()
-    tts, audio_ext = _select_tts_engine()
+    # Prepare session objects; other workers build their own engine on first use
+    tts, source_ext = run_blocking(_select_tts_engine)
 
-    sessions[session_id] = {
+    # The page text goes into the shared book store: sessions reading the same
+    # book share one buffer and keep only its id
+    session_store.create(session_id, {
         'filename': uploaded.filename,
         'filepath': save_path,
         'dialect': dialect,
-        'pages': pages,
-        'mapper': mapper,
-        'tts': tts,
-        'audio_ext': audio_ext
-    }
+        'total_pages': len(pages),
+        # Engine every worker builds for this session, the format it writes, and
+        # the (possibly compressed) format served to clients
+        'engine': _engine_name(tts),
+        'source_ext': source_ext,
+        'audio_ext': get_encoder().output_ext(source_ext),
+        'current_page': 0,
+        'rendered': {},
+        'page_durations': {},
+        # Bumped on every jump; look-ahead for an older epoch is abandoned
+        'epoch': 0,
+        # Claim of the running look-ahead: {'since', 'epoch'} (None when idle)
+        'prefetching': None,
+        # Append-only list of segments exposed at /playlist/<session_id>.m3u8
+        'playlist': []
+    }, pages)
+    _runtime[session_id] = _new_runtime(session_id, tts)
 
     return jsonify({
         'success': True,
         'session_id': session_id,
         'filename': uploaded.filename,
-        'total_pages': len(pages)
+        'total_pages': len(pages),
+        'playlist_url': url_for('playlist', session_id=session_id)
     })
 
 
 @app.route('/start_reading/<session_id>')
 def start_reading(session_id: str):
-    if session_id not in sessions:
-        return jsonify({'success': False, 'message': 'Invalid session'}), 404
-
     # Initialize current page and emit first page immediately
-    sessions[session_id]['current_page'] = 0
-    _emit_page(session_id, 0)
+    if not _move_to(session_id, 0):
+        return jsonify({'success': False, 'message': 'Invalid session'}), 404
+    if not _admit(session_id):
+        # Reading starts (with an admitted event) once a slot frees up
+        return jsonify(dict(_queue_payload(session_id), success=True, queued=True))
+    # The page arrives as a new_page event; the request doesn't wait for synthesis
+    socketio.start_background_task(_emit_page, session_id, 0)
     return jsonify({'success': True})
 
 
+def _move_to(session_id: str, page_index: int) -> bool:
+    """Jump the reading position and start a new epoch so old look-ahead stops."""
+    def move(state):
+        state['current_page'] = page_index
+        state['epoch'] += 1
+    return session_store.update(session_id, move) is not None
+
+
+@app.route('/playlist/<session_id>.m3u8')
+def playlist(session_id: str):
+    """The session as a growing HLS event playlist, one segment per rendered page.
+
+    A standard player polls this playlist and fetches segments ahead by
+    itself; segment fetches advance the look-ahead instead of page_finished.
+    HLS only carries MPEG-TS/fMP4 or packed MP3/AAC, so pages that are not
+    MP3 are served as AAC in MPEG-TS (remuxed with ffmpeg).
+    """
+    session = session_store.get(session_id)
+    if not session:
+        return jsonify({'success': False, 'message': 'Invalid session'}), 404
+    if _hls_remux(session) and not get_encoder().ffmpeg:
+        return jsonify({'success': False,
+                        'message': 'HLS needs MP3 pages or ffmpeg to remux them; use the Socket.IO reader'}), 415
+
+    if not _admit(session_id):
+        # Players retry after Retry-After; the first segment is rendered once a slot frees up
+        waiting = _queue_payload(session_id)
+        response = jsonify(dict(waiting, success=False, queued=True))
+        response.headers['Retry-After'] = str(max(ADMISSION_TICK_SECONDS, int(waiting['estimated_wait'])))
+        return response, 503
+
+    if not session['playlist']:
+        # Players give up on an empty playlist, so the first segment is rendered before answering
+        run_blocking(_render_page, session_id, 0, parallel=app.config['PAGE_PARALLELISM'])
+    _schedule_prefetch(session_id)
+
+    session = session_store.get(session_id) or session
+    segments = session['playlist']
+    target = max([int(math.ceil(s['duration'])) for s in segments] + [1])
+    lines = [
+        '#EXTM3U',
+        '#EXT-X-VERSION:3',
+        f'#EXT-X-TARGETDURATION:{target}',
+        '#EXT-X-MEDIA-SEQUENCE:0',
+        '#EXT-X-PLAYLIST-TYPE:EVENT'
+    ]
+    for index, segment in enumerate(segments):
+        lines.append(f"#EXTINF:{segment['duration']:.3f},")
+        lines.append(url_for('playlist_segment', session_id=session_id, index=index))
+    if len(segments) == session['total_pages']:
+        lines.append('#EXT-X-ENDLIST')
+
+    response = Response('\n'.join(lines) + '\n', mimetype='application/vnd.apple.mpegurl')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.route('/playlist/<session_id>/<int:index>')
+def playlist_segment(session_id: str, index: int):
+    """Serve one playlist segment and keep rendering ahead of the player."""
+    session = session_store.get(session_id)
+    if not session or index >= len(session['playlist']):
+        return jsonify({'success': False, 'message': 'Invalid segment'}), 404
+
+    segment = session['playlist'][index]
+    session_store.update(session_id, lambda state: _track_hls_playback(state, index))
+    if _admit(session_id):
+        _schedule_prefetch(session_id)
+
+    filename = segment['filename']
+    if _hls_remux(session):
+        ts_name = f"{os.path.splitext(filename)[0]}.ts"
+        ts_path = os.path.join(app.config['AUDIO_FOLDER'], ts_name)
+        if not os.path.exists(ts_path) and not run_blocking(
+                get_encoder().remux_hls, os.path.join(app.config['AUDIO_FOLDER'], filename), ts_path):
+            return jsonify({'success': False, 'message': 'Segment conversion failed'}), 500
+        filename = ts_name
+    return send_from_directory(app.config['AUDIO_FOLDER'], filename)
+
+
+def _hls_remux(session: dict) -> bool:
+    """Whether playlist segments need remuxing: only all-MP3 sessions are served as packed audio."""
+    return not (session['source_ext'] == 'mp3' and session['audio_ext'] == 'mp3')
+
+
+def _track_hls_playback(state: dict, index: int):
+    """Estimate the HLS player's playback position from segment fetches.
+
+    Players fetch several segments ahead, so the newest fetched segment
+    overstates the position and the look-ahead budget would be measured from
+    the wrong page. Instead the clock started at the first fetch is walked
+    through segment durations, capped at the newest segment fetched. A fetch
+    behind the estimate (seek back, restart) restarts the clock there.
+    """
+    now = time.time()
+    playlist = state['playlist']
+    clock = state.get('hls_clock')
+    if clock is None or index < _hls_position(playlist, clock, now):
+        clock = {'index': index, 'at': now, 'fetched': index}
+    clock['fetched'] = max(clock['fetched'], index)
+    state['hls_clock'] = clock
+    position = min(_hls_position(playlist, clock, now), clock['fetched'])
+    state['current_page'] = playlist[position]['page_number']
+
+
+def _hls_position(playlist: list, clock: dict, now: float) -> int:
+    index = clock['index']
+    elapsed = now - clock['at']
+    while index < len(playlist) - 1 and elapsed >= playlist[index]['duration']:
+        elapsed -= playlist[index]['duration']
+        index += 1
+    return index
+
+
 @socketio.on('join_session')
 def on_join_session(data):
     session_id = data.get('session_id')
-    if not session_id or session_id not in sessions:
+    if not session_id or session_id not in session_store:
         emit('error', {'message': 'Invalid session'})
         return
     join_room(session_id)
+    with _runtime_lock:
+        _socket_sessions.setdefault(request.sid, set()).add(session_id)
+        if data.get('inline_audio') and app.config['INLINE_AUDIO_BYTES'] > 0:
+            _inline_audio.setdefault(request.sid, 0)
+
+
+@socketio.on('disconnect')
+def on_disconnect():
+    """Stop synthesis nobody on this worker is waiting for any more."""
+    with _runtime_lock:
+        joined = _socket_sessions.pop(request.sid, set())
+        _inline_audio.pop(request.sid, None)
+        still_joined = set().union(*_socket_sessions.values()) if _socket_sessions else set()
+    for session_id in joined - still_joined:
+        _cancel_jobs(session_id)
+        _release(session_id)
 
 
 @socketio.on('page_finished')
 def on_page_finished(data):
     session_id = data.get('session_id')
     last_page = data.get('page_number')
-    if not session_id or session_id not in sessions:
+    session = session_store.get(session_id) if session_id else None
+    if not session:
         emit('error', {'message': 'Invalid session'})
         return
 
-    session = sessions[session_id]
     next_index = int(last_page) + 1
-    if next_index >= len(session['pages']):
+    if next_index >= session['total_pages']:
         # End of book
         emit('new_page', {
             'page_number': last_page,
             'text': '',
-            'audio_url': ''
+            'audio_url': '',
+            'duration': 0.0,
+            'size': 0,
+            'manifest': []
         }, to=session_id)
+        _release(session_id)
         return
 
-    session['current_page'] = next_index
-    _emit_page(session_id, next_index)
+    session_store.update(session_id, lambda state: state.update(current_page=next_index))
+    # A reader back from a long pause may have lost the slot and has to wait again
+    if _admit(session_id):
+        socketio.start_background_task(_emit_page, session_id, next_index)
+
+
+@socketio.on('seek')
+def on_seek(data):
+    """Jump to any page: render it first, then look ahead from there."""
+    session_id = data.get('session_id')
+    session = session_store.get(session_id) if session_id else None
+    if not session:
+        emit('error', {'message': 'Invalid session'})
+        return
+    try:
+        page_index = int(data.get('page_number'))
+    except (TypeError, ValueError):
+        page_index = -1
+    if page_index < 0 or page_index >= session['total_pages']:
+        emit('error', {'message': 'Invalid page'})
+        return
+
+    _move_to(session_id, page_index)
+    # Look-ahead around the old position is useless now; free its engine slot
+    _cancel_jobs(session_id, lookahead_only=True)
+    if not _admit(session_id):
+        return
+    # Rendered right away: only this page's lock is taken, so the target
+    # never waits for look-ahead around the old position
+    socketio.start_background_task(_emit_page, session_id, page_index)
 
 
 @socketio.on('leave_session')
 def on_leave_session(data):
     session_id = data.get('session_id')
-    if not session_id or session_id not in sessions:
+    if not session_id or session_id not in session_store:
         return
-    # Best-effort cleanup is handled in /cancel
+    with _runtime_lock:
+        _socket_sessions.get(request.sid, set()).discard(session_id)
+    # Best-effort cleanup is handled in /cancel; stop synthesis for the reader right away
+    _cancel_jobs(session_id)
+    _release(session_id)
     emit('left', {'session_id': session_id})
 
 
 @app.route('/cancel/<session_id>')
 def cancel_session(session_id: str):
-    session = sessions.pop(session_id, None)
+    session = session_store.delete(session_id)
+    _cancel_jobs(session_id)
+    _runtime.pop(session_id, None)
+    _release(session_id)
     if not session:
         return jsonify({'success': True})
     # Cleanup generated audio files for this session
@@ -241,23 +1130,115 @@ def cancel_session(session_id: str):
 def on_change_dialect(data):
     session_id = data.get('session_id')
     new_dialect = data.get('dialect')
-    if not session_id or session_id not in sessions:
+    if not session_id or session_id not in session_store:
         emit('error', {'message': 'Invalid session'})
         return
     if new_dialect not in ['north', 'central', 'south']:
         emit('error', {'message': 'Invalid dialect'})
         return
-    sessions[session_id]['dialect'] = new_dialect
+    session_store.update(session_id, lambda state: state.update(dialect=new_dialect))
+    # Look-ahead in the old dialect would only be thrown away
+    _cancel_jobs(session_id, lookahead_only=True)
+    admission.touch(session_id)
     emit('dialect_changed', {'dialect': new_dialect})
 
 
+def _warm_up_models():
+    """Load shared TTS models before the first reader asks for a page."""
+    if os.environ.get('APP_COQUI_WARMUP', '0') == '1':
+        model_cache.warm_up()
+
+
+def _admin_denied():
+    """Error response unless the request carries the admin token."""
+    token = app.config['ADMIN_TOKEN']
+    if not token:
+        return jsonify({'success': False, 'message': 'Admin endpoints disabled'}), 404
+    supplied = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(supplied.encode('utf-8'), token.encode('utf-8')):
+        return jsonify({'success': False, 'message': 'Forbidden'}), 403
+    return None
+
+
+@app.route('/admin/profile/start', methods=['POST'])
+def admin_profile_start():
+    """Sample every thread of this worker for a bounded window."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    profiler = get_profiler()
+    try:
+        seconds = float(request.args.get('seconds', '10'))
+        interval = float(request.args.get('interval_ms', '5')) / 1000.0
+    except ValueError:
+        return jsonify({'success': False, 'message': 'seconds and interval_ms must be numbers'}), 400
+    if not profiler.start(seconds, interval):
+        return jsonify({'success': False, 'message': 'Profiler already running'}), 409
+    return jsonify({'success': True, **profiler.status()})
+
+
+@app.route('/admin/profile')
+def admin_profile():
+    """Profiler status, or the collapsed-stack report with ?format=collapsed."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    profiler = get_profiler()
+    if request.args.get('format') == 'collapsed':
+        return Response(profiler.collapsed(), mimetype='text/plain')
+    return jsonify(profiler.status())
+
+
+@app.route('/admin/trace/<session_id>', methods=['GET', 'POST'])
+def admin_trace(session_id: str):
+    """POST arms tracing of the session's next _emit_page; GET returns the last report."""
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.method == 'POST':
+        if session_store.update(session_id, lambda state: state.update(trace_requested=True)) is None:
+            return jsonify({'success': False, 'message': 'Invalid session'}), 404
+        return jsonify({'success': True})
+
+    session = session_store.get(session_id)
+    if not session:
+        return jsonify({'success': False, 'message': 'Invalid session'}), 404
+    report = session.get('trace_report')
+    if request.args.get('format') == 'collapsed':
+        return Response(report['collapsed'] if report else '', mimetype='text/plain')
+    summary = {k: v for k, v in report.items() if k != 'collapsed'} if report else None
+    return jsonify({'pending': bool(session.get('trace_requested')), 'report': summary})
+
+
+@app.route('/stats/models')
+def model_stats():
+    return jsonify(model_cache.memory_usage())
+
+
+@app.route('/stats/encoding')
+def encoding_stats():
+    stats = get_encoder().snapshot()
+    stats['postprocess'] = get_postprocessor().snapshot()
+    return jsonify(stats)
+
+
+@app.route('/stats/routing')
+def routing_stats():
+    return jsonify({name: router.snapshot() for name, router in all_routers().items()})
+
+
+@app.route('/stats/admission')
+def admission_stats():
+    return jsonify(admission.snapshot())
+
+
 if __name__ == '__main__':
+    _warm_up_models()
+    port = int(os.environ.get('APP_PORT', '5001'))
     # Prefer eventlet if available (as listed in requirements)
     try:
         import eventlet
         import eventlet.wsgi  # noqa: F401
-        socketio.run(app, host='0.0.0.0', port=5001)
+        socketio.run(app, host='0.0.0.0', port=port)
     except Exception:
-        socketio.run(app, host='0.0.0.0', port=5001)
-
-
+        socketio.run(app, host='0.0.0.0', port=port)
@@ -0,0 +1,146 @@
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from typing import Optional
+
+# Định dạng đầu ra -> phần mở rộng file phục vụ cho trình duyệt
+OUTPUT_FORMATS = {
+    'wav': None,      # giữ nguyên file engine tạo ra
+    'opus': 'ogg',    # Opus trong Ogg (audio/ogg)
+}
+
+
+class AudioEncoder:
+    """Mã hóa audio trang sau khi tổng hợp sang codec giọng nói gọn nhẹ.
+
+    - format 'wav': không mã hóa, phục vụ thẳng file của engine
+    - format 'opus': Opus trong Ogg ở bitrate cấu hình (kbps), bằng ffmpeg
+      hoặc opusenc (opusenc chỉ đọc được WAV)
+
+    Nếu không có công cụ mã hóa, encoder tự tắt và giữ định dạng gốc.
+    """
+
+    def __init__(self, audio_format: Optional[str] = None, bitrate_kbps: Optional[int] = None,
+                 timeout: float = 120.0):
+        self.format = (audio_format or os.environ.get('APP_AUDIO_FORMAT', 'wav')).lower()
+        self.bitrate_kbps = bitrate_kbps or int(os.environ.get('APP_AUDIO_BITRATE', '24'))
+        self.timeout = timeout
+        self.ffmpeg = shutil.which('ffmpeg')
+        self.opusenc = shutil.which('opusenc')
+        self.stats = {'encoded': 0, 'hls_segments': 0, 'failed': 0, 'bytes_in': 0, 'bytes_out': 0, 'seconds': 0.0}
+        self._lock = threading.Lock()
+
+        if self.format not in OUTPUT_FORMATS:
+            print(f"⚠️ Unknown APP_AUDIO_FORMAT '{self.format}', keeping wav")
+            self.format = 'wav'
+        self.enabled = self.format != 'wav' and bool(self.ffmpeg or self.opusenc)
+        if self.format != 'wav' and not self.enabled:
+            print(f"⚠️ Neither ffmpeg nor opusenc found, serving uncompressed audio instead of {self.format}")
+
+    def output_ext(self, source_ext: str) -> str:
+        """Phần mở rộng của file phục vụ cho client khi engine tạo ra source_ext"""
+        if not self.enabled:
+            return source_ext
+        return OUTPUT_FORMATS[self.format] or source_ext
+
+    def _command(self, source_path: str, output_path: str) -> Optional[list]:
+        if self.ffmpeg:
+            return [
+                self.ffmpeg, '-nostdin', '-y', '-loglevel', 'error',
+                '-i', source_path,
+                '-ac', '1',
+                '-c:a', 'libopus', '-b:a', f"{self.bitrate_kbps}k",
+                '-application', 'voip',
+                '-f', 'ogg', output_path
+            ]
+        if self.opusenc and source_path.lower().endswith('.wav'):
+            return [
+                self.opusenc, '--quiet', '--speech',
+                '--bitrate', str(self.bitrate_kbps),
+                source_path, output_path
+            ]
+        return None
+
+    def encode(self, source_path: str, output_path: str) -> bool:
+        """Mã hóa source_path thành output_path (ghi qua file tạm rồi đổi tên)"""
+        if not self.enabled:
+            return False
+        tmp_path = os.path.join(os.path.dirname(output_path) or '.',
+                                f"tmp_{uuid.uuid4().hex}.{self.output_ext('wav')}")
+        command = self._command(source_path, tmp_path)
+        if command is None:
+            return False
+        return self._run(command, source_path, tmp_path, output_path, 'encoded')
+
+    def remux_hls(self, source_path: str, output_path: str) -> bool:
+        """Chuyển một trang (WAV, Ogg...) thành segment HLS: AAC trong MPEG-TS (cần ffmpeg)"""
+        if not self.ffmpeg:
+            return False
+        tmp_path = os.path.join(os.path.dirname(output_path) or '.', f"tmp_{uuid.uuid4().hex}.ts")
+        command = [
+            self.ffmpeg, '-nostdin', '-y', '-loglevel', 'error',
+            '-i', source_path,
+            '-ac', '1',
+            '-c:a', 'aac', '-b:a', f"{max(self.bitrate_kbps, 32)}k",
+            '-f', 'mpegts', tmp_path
+        ]
+        return self._run(command, source_path, tmp_path, output_path, 'hls_segments')
+
+    def _run(self, command: list, source_path: str, tmp_path: str, output_path: str, counter: str) -> bool:
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                    stderr=subprocess.PIPE, timeout=self.timeout)
+            if result.returncode != 0 or not os.path.exists(tmp_path) or os.path.getsize(tmp_path) == 0:
+                error = result.stderr.decode('utf-8', 'replace').strip()
+                print(f"❌ Audio encoding failed ({os.path.basename(command[0])}): {error[:200]}")
+                with self._lock:
+                    self.stats['failed'] += 1
+                return False
+            os.replace(tmp_path, output_path)
+        except Exception as e:
+            print(f"❌ Audio encoding failed: {e}")
+            with self._lock:
+                self.stats['failed'] += 1
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+        with self._lock:
+            self.stats[counter] += 1
+            self.stats['bytes_in'] += os.path.getsize(source_path)
+            self.stats['bytes_out'] += os.path.getsize(output_path)
+            self.stats['seconds'] += time.perf_counter() - start
+        return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        stats['ratio'] = round(stats['bytes_out'] / stats['bytes_in'], 3) if stats['bytes_in'] else None
+        return {
+            'format': self.format,
+            'enabled': self.enabled,
+            'bitrate_kbps': self.bitrate_kbps,
+            'tool': os.path.basename(self.ffmpeg or self.opusenc or '') or None,
+            'stats': stats
+        }
+
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def get_encoder() -> AudioEncoder:
+    """Encoder dùng chung cho toàn process (cấu hình qua APP_AUDIO_FORMAT / APP_AUDIO_BITRATE)"""
+    global _encoder
+    with _encoder_lock:
+        if _encoder is None:
+            _encoder = AudioEncoder()
+        return _encoder
@@ -0,0 +1,199 @@
+import os
+import importlib.util
+import struct
+import threading
+import uuid
+import wave
+from typing import Optional
+
+from audio_utils import read_wav_format
+
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_IEEE_FLOAT = 3
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def read_pcm_wav(path: str):
+    """Đọc WAV PCM (8/16/24/32-bit int hoặc float32) thành mảng float32 [n, channels] và sample rate"""
+    import numpy as np
+
+    with open(path, 'rb') as f:
+        fmt, data_offset, data_size = read_wav_format(f)
+        format_tag, channels, sample_rate = struct.unpack('<HHI', fmt[:8])
+        bits = struct.unpack('<H', fmt[14:16])[0]
+        if format_tag == WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+            format_tag = struct.unpack('<H', fmt[24:26])[0]
+        f.seek(data_offset)
+        raw = f.read(data_size if data_size not in (0, 0xFFFFFFFF) else -1)
+
+    width = bits // 8
+    if channels < 1 or width < 1:
+        raise ValueError("invalid WAV format")
+    raw = raw[:len(raw) - len(raw) % (width * channels)]
+
+    if format_tag == WAVE_FORMAT_IEEE_FLOAT and width == 4:
+        samples = np.frombuffer(raw, dtype='<f4').astype(np.float32)
+    elif format_tag != WAVE_FORMAT_PCM:
+        raise ValueError(f"unsupported WAV format tag {format_tag}")
+    elif width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif width == 2:
+        samples = np.frombuffer(raw, dtype='<i2').astype(np.float32) / 32768.0
+    elif width == 3:
+        # 24-bit: ghép 3 byte thành int32 (byte cao nhất mang dấu)
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        values = np.where(values & 0x800000, values - 0x1000000, values)
+        samples = values.astype(np.float32) / 8388608.0
+    elif width == 4:
+        samples = np.frombuffer(raw, dtype='<i4').astype(np.float32) / 2147483648.0
+    else:
+        raise ValueError(f"unsupported sample width {bits} bits")
+
+    return samples.reshape(-1, channels), sample_rate
+
+
+def write_pcm16_wav(path: str, samples, sample_rate: int):
+    """Ghi mảng float32 mono thành WAV PCM 16-bit"""
+    import numpy as np
+
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767.0).astype('<i2')
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm.tobytes())
+
+
+def downmix(samples):
+    """Trộn các kênh về mono (trung bình cộng)"""
+    if samples.ndim == 1:
+        return samples
+    if samples.shape[1] == 1:
+        return samples[:, 0]
+    return samples.mean(axis=1, dtype=samples.dtype)
+
+
+def trim_silence(samples, sample_rate: int, threshold_db: float = -45.0,
+                 frame_ms: float = 10.0, keep_ms: float = 150.0):
+    """Cắt khoảng lặng đầu/cuối theo năng lượng RMS từng frame so với đỉnh của cả buffer.
+
+    Giữ lại keep_ms ở mỗi đầu để giọng không bị cắt cụt.
+    """
+    import numpy as np
+
+    frame = max(1, int(sample_rate * frame_ms / 1000.0))
+    frames = len(samples) // frame
+    if frames == 0:
+        return samples
+
+    energy = np.sqrt(np.mean(samples[:frames * frame].reshape(frames, frame) ** 2, axis=1))
+    peak = float(energy.max())
+    if peak <= 0.0:
+        return samples[:0]
+    voiced = np.flatnonzero(energy >= peak * (10.0 ** (threshold_db / 20.0)))
+
+    keep = int(sample_rate * keep_ms / 1000.0)
+    start = max(0, int(voiced[0]) * frame - keep)
+    end = min(len(samples), (int(voiced[-1]) + 1) * frame + keep)
+    return samples[start:end]
+
+
+def resample(samples, source_rate: int, target_rate: int):
+    """Đổi sample rate bằng FFT (cắt/đệm phổ), đã chống aliasing khi hạ rate"""
+    import numpy as np
+
+    if source_rate == target_rate or len(samples) == 0:
+        return samples
+    n_out = max(1, int(round(len(samples) * target_rate / float(source_rate))))
+    spectrum = np.fft.rfft(samples)
+    bins = n_out // 2 + 1
+    if bins <= len(spectrum):
+        spectrum = spectrum[:bins]
+    else:
+        spectrum = np.concatenate([spectrum, np.zeros(bins - len(spectrum), dtype=spectrum.dtype)])
+    return (np.fft.irfft(spectrum, n_out) * (n_out / float(len(samples)))).astype(np.float32)
+
+
+class AudioPostProcessor:
+    """Hậu xử lý audio WAV của trang sau khi engine tạo ra.
+
+    - Cắt khoảng lặng đầu/cuối theo ngưỡng năng lượng
+    - Trộn về mono
+    - Hạ sample rate về tần số cho giọng nói (không tăng rate nếu file gốc thấp hơn)
+
+    Cần numpy; không có numpy thì stage này tự tắt.
+    """
+
+    def __init__(self, sample_rate: Optional[int] = None, threshold_db: Optional[float] = None,
+                 keep_ms: Optional[float] = None, enabled: Optional[bool] = None):
+        self.sample_rate = sample_rate or int(os.environ.get('APP_AUDIO_SAMPLE_RATE', '22050'))
+        self.threshold_db = threshold_db if threshold_db is not None else float(
+            os.environ.get('APP_SILENCE_THRESHOLD_DB', '-45'))
+        self.keep_ms = keep_ms if keep_ms is not None else float(os.environ.get('APP_SILENCE_KEEP_MS', '150'))
+        if enabled is None:
+            enabled = os.environ.get('APP_AUDIO_POSTPROCESS', '1') == '1'
+        self.enabled = enabled and importlib.util.find_spec('numpy') is not None
+        self.stats = {'processed': 0, 'failed': 0, 'seconds_in': 0.0, 'seconds_out': 0.0}
+        self._lock = threading.Lock()
+
+    def process(self, path: str) -> bool:
+        """Xử lý file WAV tại chỗ (ghi qua file tạm). Trả về False nếu file giữ nguyên."""
+        if not self.enabled or not path.lower().endswith('.wav'):
+            return False
+        tmp_path = os.path.join(os.path.dirname(path) or '.', f"tmp_{uuid.uuid4().hex}.wav")
+        try:
+            samples, rate = read_pcm_wav(path)
+            seconds_in = len(samples) / float(rate)
+
+            mono = downmix(samples)
+            mono = trim_silence(mono, rate, self.threshold_db, keep_ms=self.keep_ms)
+            target_rate = min(rate, self.sample_rate)
+            mono = resample(mono, rate, target_rate)
+            if len(mono) == 0:
+                # Toàn khoảng lặng: giữ nguyên file gốc
+                return False
+
+            write_pcm16_wav(tmp_path, mono, target_rate)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"⚠️ Audio post-processing skipped: {e}")
+            with self._lock:
+                self.stats['failed'] += 1
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+        with self._lock:
+            self.stats['processed'] += 1
+            self.stats['seconds_in'] += seconds_in
+            self.stats['seconds_out'] += len(mono) / float(target_rate)
+        return True
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            stats = dict(self.stats)
+        return {
+            'enabled': self.enabled,
+            'sample_rate': self.sample_rate,
+            'threshold_db': self.threshold_db,
+            'keep_ms': self.keep_ms,
+            'stats': stats
+        }
+
+
+_postprocessor = None
+_postprocessor_lock = threading.Lock()
+
+
+def get_postprocessor() -> AudioPostProcessor:
+    """Post-processor dùng chung cho toàn process"""
+    global _postprocessor
+    with _postprocessor_lock:
+        if _postprocessor is None:
+            _postprocessor = AudioPostProcessor()
+        return _postprocessor
@@ -0,0 +1,256 @@
+import os
+import struct
+
+# Bảng bitrate (kbps) và sample rate của MP3, theo (version, layer)
+_MP3_BITRATES = {
+    (1, 1): [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+    (1, 2): [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+    (1, 3): [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    (2, 1): [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+    (2, 2): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    (2, 3): [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+_MP3_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000],
+}
+
+
+def parse_mp3_frame_header(header: bytes):
+    """Đọc 4 byte header của một frame MP3.
+
+    Trả về (frame_length, samples_per_frame, sample_rate) hoặc None nếu không hợp lệ.
+    """
+    if len(header) < 4 or header[0] != 0xFF or (header[1] & 0xE0) != 0xE0:
+        return None
+
+    version_bits = (header[1] >> 3) & 0x03
+    layer_bits = (header[1] >> 1) & 0x03
+    bitrate_index = (header[2] >> 4) & 0x0F
+    sample_rate_index = (header[2] >> 2) & 0x03
+    padding = (header[2] >> 1) & 0x01
+
+    if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    version = {0: 2.5, 2: 2, 3: 1}[version_bits]
+    layer = 4 - layer_bits
+    bitrate = _MP3_BITRATES[(1 if version == 1 else 2, layer)][bitrate_index] * 1000
+    sample_rate = _MP3_SAMPLE_RATES[version][sample_rate_index]
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    elif layer == 2 or version == 1:
+        samples = 1152
+        length = 144 * bitrate // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate // sample_rate + padding
+
+    return length, samples, sample_rate
+
+
+def id3v2_size(header: bytes) -> int:
+    """Kích thước tag ID3v2 ở đầu file (0 nếu không có)"""
+    if len(header) < 10 or header[:3] != b'ID3':
+        return 0
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def _xing_offset(frame: bytes):
+    """Vị trí tag Xing/Info trong frame (sau side info), None nếu là frame audio thường"""
+    for pos in (13, 21, 36):
+        if frame[pos:pos + 4] in (b'Xing', b'Info'):
+            return pos
+    return None
+
+
+def _xing_frame_count(frame: bytes):
+    """Số frame trong header Xing/Info của frame đầu (None nếu không có)"""
+    pos = _xing_offset(frame)
+    if pos is not None and len(frame) >= pos + 12:
+        flags = struct.unpack('>I', frame[pos + 4:pos + 8])[0]
+        if flags & 0x01:
+            return struct.unpack('>I', frame[pos + 8:pos + 12])[0]
+    return None
+
+
+def mp3_duration(path: str) -> float:
+    """Thời lượng MP3 bằng cách duyệt header các frame, không giải mã"""
+    file_size = os.path.getsize(path)
+    duration = 0.0
+    with open(path, 'rb') as f:
+        offset = id3v2_size(f.read(10))
+        # Frame đầu của mỗi stream có thể là header Xing/Info chứa sẵn số frame
+        expect_xing = True
+        while offset + 4 <= file_size:
+            f.seek(offset)
+            header = f.read(4)
+            info = parse_mp3_frame_header(header)
+            if info is None or info[0] <= 0:
+                # Mất đồng bộ (ví dụ nhiều file mp3 ghép lại có ID3 ở giữa): dò frame kế tiếp
+                skip = id3v2_size(header + f.read(6))
+                offset += skip if skip else 1
+                expect_xing = expect_xing or bool(skip)
+                continue
+
+            length, samples, sample_rate = info
+            if expect_xing:
+                expect_xing = False
+                f.seek(offset)
+                frames = _xing_frame_count(f.read(min(length, 200)))
+                if frames:
+                    duration += frames * samples / float(sample_rate)
+                    offset = _skip_described_frames(f, offset + length, file_size, frames)
+                    expect_xing = True
+                    continue
+
+            duration += samples / float(sample_rate)
+            offset += length
+    return duration
+
+
+def _skip_described_frames(f, offset: int, file_size: int, frames: int) -> int:
+    """Bỏ qua `frames` frame đã được tính qua header Xing"""
+    skipped = 0
+    while skipped < frames and offset + 4 <= file_size:
+        f.seek(offset)
+        info = parse_mp3_frame_header(f.read(4))
+        if info is None or info[0] <= 0:
+            break
+        offset += info[0]
+        skipped += 1
+    return offset
+
+
+def read_wav_format(f):
+    """Đọc header RIFF/WAVE.
+
+    Trả về (fmt_chunk_bytes, data_offset, data_size) với f là file mở ở chế độ 'rb'.
+    """
+    riff = f.read(12)
+    if len(riff) < 12 or riff[:4] != b'RIFF' or riff[8:12] != b'WAVE':
+        raise ValueError("not a RIFF/WAVE file")
+
+    fmt = None
+    while True:
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            raise ValueError("missing data chunk")
+        chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+        if chunk_id == b'fmt ':
+            fmt = f.read(chunk_size)
+            if chunk_size % 2:
+                f.read(1)
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError("data chunk before fmt chunk")
+            return fmt, f.tell(), chunk_size
+        else:
+            f.seek(chunk_size + (chunk_size % 2), os.SEEK_CUR)
+
+
+def wav_duration(path: str) -> float:
+    """Thời lượng WAV chỉ từ header (fmt + kích thước data chunk)"""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        fmt, data_offset, data_size = read_wav_format(f)
+    byte_rate = struct.unpack('<I', fmt[8:12])[0]
+    if not byte_rate:
+        return 0.0
+    # Một số engine ghi WAV dạng stream với kích thước data = 0 hoặc 0xFFFFFFFF
+    if data_size in (0, 0xFFFFFFFF) or data_offset + data_size > file_size:
+        data_size = file_size - data_offset
+    return data_size / float(byte_rate)
+
+
+# Trang Ogg dài tối đa 27 + 255 + 255 * 255 byte
+_OGG_MAX_PAGE = 65307
+# Granule position của Opus luôn tính theo 48 kHz
+_OPUS_GRANULE_RATE = 48000
+
+
+def ogg_opus_duration(path: str) -> float:
+    """Thời lượng Ogg Opus: granule position của trang cuối trừ pre-skip (48 kHz)"""
+    file_size = os.path.getsize(path)
+    with open(path, 'rb') as f:
+        head = f.read(4096)
+        tail_size = min(file_size, _OGG_MAX_PAGE * 2)
+        f.seek(file_size - tail_size)
+        tail = f.read(tail_size)
+
+    pos = head.find(b'OpusHead')
+    if pos < 0 or pos + 12 > len(head):
+        return 0.0
+    pre_skip = struct.unpack('<H', head[pos + 10:pos + 12])[0]
+
+    # Trang cuối có granule hợp lệ (-1 nghĩa là không có packet nào kết thúc trong trang)
+    last = tail.rfind(b'OggS')
+    while last >= 0:
+        if last + 14 <= len(tail) and tail[last + 4] == 0:
+            granule = struct.unpack('<q', tail[last + 6:last + 14])[0]
+            if granule >= 0:
+                return max(0.0, (granule - pre_skip) / float(_OPUS_GRANULE_RATE))
+        last = tail.rfind(b'OggS', 0, last)
+    return 0.0
+
+
+def probe_duration(path: str) -> float:
+    """Lấy thời lượng (giây) của file WAV, MP3 hoặc Ogg Opus mà không giải mã audio"""
+    try:
+        if not os.path.exists(path):
+            return 0.0
+        with open(path, 'rb') as f:
+            head = f.read(12)
+        if head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+            return wav_duration(path)
+        if head[:4] == b'OggS':
+            return ogg_opus_duration(path)
+        if head[:3] == b'ID3' or (len(head) >= 2 and head[0] == 0xFF and (head[1] & 0xE0) == 0xE0):
+            return mp3_duration(path)
+        if path.lower().endswith('.mp3'):
+            return mp3_duration(path)
+        return 0.0
+    except Exception as e:
+        print(f"Error getting audio duration: {e}")
+        return 0.0
+
+
+def mp3_audio_range(read_at, size: int):
+    """Vị trí (start, end) của phần frame audio trong một stream MP3.
+
+    `read_at(offset, n)` đọc n byte tại offset (từ bytes hoặc file), `size` là
+    tổng kích thước. Bỏ tag ID3v2 ở đầu, tag ID3v1 ở cuối, frame Xing/Info và
+    frame cuối bị cắt dở; chỉ đọc header của từng frame.
+    """
+    end = size
+    if end >= 128 and read_at(end - 128, 3) == b'TAG':
+        end -= 128
+
+    offset = id3v2_size(read_at(0, 10))
+    start = None
+    last_complete = offset
+    while offset + 4 <= end:
+        info = parse_mp3_frame_header(read_at(offset, 4))
+        if info is None or info[0] <= 0:
+            if start is not None:
+                break
+            offset += 1
+            continue
+        length = info[0]
+        if offset + length > end:
+            break
+        if start is None:
+            start = offset
+            if _xing_offset(read_at(offset, 40)) is not None:
+                start = offset + length
+        offset += length
+        last_complete = offset
+
+    if start is None:
+        return 0, 0
+    return start, max(start, last_complete)
@@ -0,0 +1,140 @@
+import io
+import os
+import struct
+
+from audio_utils import mp3_audio_range, read_wav_format
+
+COPY_BLOCK_SIZE = 64 * 1024
+
+
+class AudioConcatWriter:
+    """Ghi nối nhiều đoạn audio (WAV hoặc MP3) thẳng xuống đĩa khi từng đoạn tới.
+
+    - MP3: bỏ tag ID3v2/ID3v1, frame Xing/Info lặp lại và frame cuối bị cắt dở
+      của từng đoạn, chỉ giữ các frame audio.
+    - WAV: ghi header RIFF một lần, nối PCM của các đoạn cùng định dạng rồi ghi
+      lại kích thước RIFF/data khi đóng.
+
+    Bộ nhớ dùng cho mỗi trang không phụ thuộc độ dài trang (copy theo block).
+    """
+
+    def __init__(self, output_path: str, audio_ext: str):
+        if audio_ext not in ('wav', 'mp3'):
+            raise ValueError(f"Unsupported audio format: {audio_ext}")
+        self.output_path = output_path
+        self.audio_ext = audio_ext
+        self.segments = 0
+        self._file = open(output_path, 'wb')
+        self._fmt = None
+        self._data_size = 0
+        self._closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def append_bytes(self, data: bytes):
+        """Thêm một đoạn audio hoàn chỉnh (nội dung một file wav/mp3) đang có trong bộ nhớ"""
+        self._append_stream(io.BytesIO(data), len(data))
+
+    def append_file(self, path: str):
+        """Thêm một file audio, đọc theo block"""
+        with open(path, 'rb') as f:
+            self._append_stream(f, os.path.getsize(path))
+
+    def append_silence(self, seconds: float):
+        """Thêm khoảng lặng giữa hai đoạn (chỉ WAV, sau đoạn đầu tiên; MP3 bỏ qua)"""
+        if self.audio_ext != 'wav' or self._fmt is None or seconds <= 0:
+            return
+        byte_rate, block_align, bits = struct.unpack('<IHH', self._fmt[8:16])
+        length = int(byte_rate * seconds) // max(block_align, 1) * block_align
+        # PCM 8-bit không dấu lấy 0x80 làm mức im lặng
+        fill = b'\x80' if bits == 8 else b'\0'
+        remaining = length
+        while remaining > 0:
+            block = min(COPY_BLOCK_SIZE, remaining)
+            self._file.write(fill * block)
+            remaining -= block
+        self._data_size += length
+
+    def _append_stream(self, f, size: int):
+        if self.audio_ext == 'mp3':
+            self._append_mp3(f, size)
+        else:
+            self._append_wav(f, size)
+        self.segments += 1
+        self._file.flush()
+
+    def _append_mp3(self, f, size: int):
+        def read_at(offset, n):
+            f.seek(offset)
+            return f.read(n)
+
+        start, end = mp3_audio_range(read_at, size)
+        self._copy_range(f, start, end - start)
+
+    def _append_wav(self, f, size: int):
+        fmt, data_offset, data_size = read_wav_format(f)
+        if data_size in (0, 0xFFFFFFFF) or data_offset + data_size > size:
+            data_size = size - data_offset
+
+        if self._fmt is None:
+            self._fmt = fmt
+            self._write_wav_header()
+        elif fmt[:16] != self._fmt[:16]:
+            raise ValueError("WAV format mismatch between segments")
+
+        self._copy_range(f, data_offset, data_size)
+        self._data_size += data_size
+
+    def _copy_range(self, f, offset: int, length: int):
+        f.seek(offset)
+        remaining = length
+        while remaining > 0:
+            block = f.read(min(COPY_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            self._file.write(block)
+            remaining -= len(block)
+
+    def _write_wav_header(self):
+        fmt = self._fmt
+        data_size = self._data_size
+        self._file.write(b'RIFF')
+        self._file.write(struct.pack('<I', 4 + 8 + len(fmt) + 8 + data_size + (data_size % 2)))
+        self._file.write(b'WAVE')
+        self._file.write(b'fmt ' + struct.pack('<I', len(fmt)) + fmt)
+        self._file.write(b'data' + struct.pack('<I', data_size))
+
+    def close(self):
+        """Hoàn tất file: với WAV ghi lại header RIFF theo tổng kích thước PCM"""
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            if self.audio_ext == 'wav':
+                if self._fmt is None:
+                    raise ValueError("no WAV input")
+                if self._data_size % 2:
+                    self._file.write(b'\0')
+                self._file.seek(0)
+                self._write_wav_header()
+        finally:
+            self._file.close()
+
+    def abort(self):
+        """Hủy ghi và xóa file dở dang"""
+        if not self._closed:
+            self._closed = True
+            self._file.close()
+        try:
+            os.remove(self.output_path)
+        except OSError:
+            pass
+
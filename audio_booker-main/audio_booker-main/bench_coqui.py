@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark inference Coqui trên CPU: real-time factor (RTF = thời gian tổng hợp /
+thời lượng audio) và throughput trang theo từng cấu hình quantize / số thread /
+số worker đồng thời.
+
+    python bench_coqui.py --pages 8 --quantize none int8 --workers 1 2 4
+    python bench_coqui.py --threads 1 2 4 --workers 2
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_utils import probe_duration
+from coqui_model_cache import (DEFAULT_COQUI_MODEL, CoquiModelCache, InferenceSettings,
+                               apply_thread_settings, inference_context)
+from text_processor import TextProcessor
+
+
+def _load_pages(path: str, count: int) -> list:
+    processor = TextProcessor()
+    pages = processor.split_into_pages(processor.extract_text(path))
+    while len(pages) < count:
+        pages = pages + pages
+    return pages[:count]
+
+
+def run_setting(pages: list, model_name: str, settings: InferenceSettings) -> dict:
+    # Mỗi cấu hình dùng cache riêng để model được nạp (và quantize) đúng theo settings
+    cache = CoquiModelCache(settings)
+    apply_thread_settings(settings)
+    tts = cache.get(model_name)
+    out_dir = tempfile.mkdtemp(prefix='bench_coqui_')
+
+    with inference_context():
+        tts.tts_to_file(text="Xin chào.", file_path=os.path.join(out_dir, 'warmup.wav'))
+
+    def render(item):
+        index, text = item
+        path = os.path.join(out_dir, f"page_{index}.wav")
+        t0 = time.perf_counter()
+        with inference_context():
+            tts.tts_to_file(text=text, file_path=path)
+        elapsed = time.perf_counter() - t0
+        return elapsed, probe_duration(path)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=settings.synth_workers) as executor:
+        results = list(executor.map(render, enumerate(pages)))
+    total = time.perf_counter() - start
+
+    rtfs = [elapsed / duration for elapsed, duration in results if duration > 0]
+    return {
+        'mean_rtf': statistics.mean(rtfs) if rtfs else float('nan'),
+        'page_latency': statistics.mean(elapsed for elapsed, _ in results),
+        'pages_per_s': len(pages) / total,
+        'param_mb': cache.memory_usage()['total_parameter_bytes'] / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CPU inference settings for Coqui TTS')
+    parser.add_argument('--file', default=os.path.join('uploads', 'Thanh_giong.txt'))
+    parser.add_argument('--model', default=DEFAULT_COQUI_MODEL)
+    parser.add_argument('--pages', type=int, default=8)
+    parser.add_argument('--quantize', nargs='+', default=['none', 'int8'])
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2])
+    parser.add_argument('--threads', type=int, nargs='+', default=[0],
+                        help='intra-op threads (0 = số core / số worker)')
+    args = parser.parse_args()
+
+    pages = _load_pages(args.file, args.pages)
+    print(f"{'quantize':>8} {'workers':>7} {'threads':>7} {'RTF':>6} {'page s':>7} {'pages/s':>8} {'params MB':>9}")
+    for quantize in args.quantize:
+        for workers in args.workers:
+            for threads in args.threads:
+                settings = InferenceSettings(quantize=quantize, synth_workers=workers,
+                                             intra_op_threads=threads or None)
+                r = run_setting(pages, args.model, settings)
+                print(f"{quantize:>8} {workers:>7} {settings.intra_op_threads:>7} {r['mean_rtf']:>6.2f} "
+                      f"{r['page_latency']:>7.2f} {r['pages_per_s']:>8.2f} {r['param_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
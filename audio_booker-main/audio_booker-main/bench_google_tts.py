@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Benchmark GoogleTTSEngine với stub server cục bộ: độ trễ mỗi trang và throughput
+theo số kết nối keep-alive, có thể bơm lỗi để kiểm tra hedging/retry/circuit breaker.
+
+    python bench_google_tts.py --latency 0.15 --pages 10 --connections 1 2 4 8
+    python bench_google_tts.py --pages 30 --connections 4 --error-rate 0.1 --slow-rate 0.05
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from stub_tts_server import start_stub_server
+from text_processor import TextProcessor
+
+
+def _load_pages(path: str, count: int) -> list:
+    processor = TextProcessor()
+    pages = processor.split_into_pages(processor.extract_text(path))
+    while len(pages) < count:
+        pages = pages + pages
+    return pages[:count]
+
+
+def run_setting(pages: list, connections: int, **faults) -> dict:
+    server = start_stub_server(**faults)
+    os.environ['APP_GOOGLE_TTS_URL'] = server.url
+    os.environ['APP_GOOGLE_TTS_CONNECTIONS'] = str(connections)
+
+    from google_tts_engine import GoogleTTSEngine
+    engine = GoogleTTSEngine()
+
+    out_dir = tempfile.mkdtemp(prefix='bench_tts_')
+    page_times = []
+    failed = 0
+    start = time.perf_counter()
+    for i, text in enumerate(pages):
+        t0 = time.perf_counter()
+        ok = engine.generate_audio(text, os.path.join(out_dir, f"page_{i}.mp3"))
+        page_times.append(time.perf_counter() - t0)
+        if not ok:
+            failed += 1
+    total = time.perf_counter() - start
+    server.shutdown()
+
+    return {
+        'connections': connections,
+        'mean_ms': statistics.mean(page_times) * 1000,
+        'p95_ms': sorted(page_times)[int(len(page_times) * 0.95) - 1] * 1000,
+        'pages_per_s': len(pages) / total,
+        'requests': server.requests,
+        'tcp_connections': server.connections,
+        'failed': failed,
+        'resilience': engine.get_resilience_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark GoogleTTSEngine against a stub server')
+    parser.add_argument('--file', default=os.path.join('uploads', 'Thanh_giong.txt'))
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.15)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--connections', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--slow-rate', type=float, default=0.0)
+    parser.add_argument('--slow-latency', type=float, default=3.0)
+    parser.add_argument('--drop-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    faults = {
+        'latency': args.latency, 'jitter': args.jitter, 'error_rate': args.error_rate,
+        'slow_rate': args.slow_rate, 'slow_latency': args.slow_latency, 'drop_rate': args.drop_rate,
+    }
+    pages = _load_pages(args.file, args.pages)
+    print(f"{'conns':>5} {'mean ms':>9} {'p95 ms':>9} {'pages/s':>8} {'requests':>9} {'tcp':>5} {'failed':>6}")
+    for connections in args.connections:
+        r = run_setting(pages, connections, **faults)
+        print(f"{r['connections']:>5} {r['mean_ms']:>9.1f} {r['p95_ms']:>9.1f} "
+              f"{r['pages_per_s']:>8.2f} {r['requests']:>9} {r['tcp_connections']:>5} {r['failed']:>6}")
+        print(f"      {r['resilience']}")
+
+
+if __name__ == "__main__":
+    main()
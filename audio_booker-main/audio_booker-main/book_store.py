@@ -0,0 +1,93 @@
+import hashlib
+import threading
+import unicodedata
+from array import array
+from typing import List, Optional, Sequence
+
+
+class Book:
+    """Một cuốn sách lưu một lần: toàn bộ text (đã chuẩn hóa NFC) trong một buffer
+    liền mạch và mảng offset biên trang.
+
+    Dùng như một list trang chỉ đọc: len(book), book[i] cắt trang từ buffer chung.
+    """
+
+    __slots__ = ('book_id', 'text', 'offsets', '__weakref__')
+
+    def __init__(self, book_id: str, text: str, offsets: array):
+        self.book_id = book_id
+        self.text = text
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        count = len(self)
+        if index < 0:
+            index += count
+        if index < 0 or index >= count:
+            raise IndexError('page index out of range')
+        return self.text[self.offsets[index]:self.offsets[index + 1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+def pack_pages(pages: Sequence[str]):
+    """Ghép các trang thành (book_id, text, offsets); sách giống hệt nhau có cùng book_id"""
+    normalized = [unicodedata.normalize('NFC', page) for page in pages]
+    offsets = array('I', [0])
+    for page in normalized:
+        offsets.append(offsets[-1] + len(page))
+    text = ''.join(normalized)
+    digest = hashlib.sha1(text.encode('utf-8'))
+    digest.update(offsets.tobytes())
+    return digest.hexdigest(), text, offsets
+
+
+class BookStore:
+    """Các cuốn sách dùng chung giữa session trong process, đếm tham chiếu.
+
+    Mười người đọc cùng một truyện chỉ giữ một bản text; mỗi session chỉ còn
+    book_id. Sách được giải phóng khi session cuối cùng đọc nó kết thúc.
+    """
+
+    def __init__(self):
+        self._books = {}
+        self._refs = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, pages: List[str]) -> Book:
+        """Lấy (hoặc tạo) sách cho danh sách trang và tăng số tham chiếu"""
+        book_id, text, offsets = pack_pages(pages)
+        with self._lock:
+            book = self._books.get(book_id)
+            if book is None:
+                book = Book(book_id, text, offsets)
+                self._books[book_id] = book
+            self._refs[book_id] = self._refs.get(book_id, 0) + 1
+            return book
+
+    def get(self, book_id: str) -> Optional[Book]:
+        with self._lock:
+            return self._books.get(book_id)
+
+    def release(self, book_id: str):
+        """Giảm số tham chiếu, xóa sách khi không còn session nào dùng"""
+        with self._lock:
+            refs = self._refs.get(book_id, 0) - 1
+            if refs > 0:
+                self._refs[book_id] = refs
+            else:
+                self._refs.pop(book_id, None)
+                self._books.pop(book_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'books': len(self._books),
+                'readers': sum(self._refs.values()),
+                'text_chars': sum(len(b.text) for b in self._books.values())
+            }
@@ -0,0 +1,54 @@
+import threading
+import time
+from typing import Callable, Optional
+
+
+class SynthesisCancelled(Exception):
+    """Job tổng hợp đã bị hủy (engine bắt lỗi này và trả về False như mọi lỗi khác)"""
+
+
+class CancellationToken:
+    """Cờ hủy hợp tác truyền từ app xuống engine.
+
+    - cancel(): hủy ngay trong process hiện tại (cancel, leave_session, disconnect...)
+    - check: hàm tùy chọn trả True khi job không còn cần nữa (ví dụ session đã
+      seek/đổi giọng trên worker khác); chỉ gọi tối đa mỗi check_interval giây
+
+    Engine kiểm tra token ở ranh giới chunk/câu và trong các vòng chờ
+    subprocess/worker (kill process hoặc trả slot về pool khi bị hủy).
+    """
+
+    def __init__(self, check: Optional[Callable[[], bool]] = None, check_interval: float = 0.2):
+        self._event = threading.Event()
+        self._check = check
+        self._check_interval = check_interval
+        self._last_check = 0.0
+
+    def cancel(self):
+        self._event.set()
+
+    @property
+    def cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self._check is not None:
+            now = time.monotonic()
+            if now - self._last_check >= self._check_interval:
+                self._last_check = now
+                try:
+                    stale = self._check()
+                except Exception:
+                    stale = False
+                if stale:
+                    self.cancel()
+                    return True
+        return False
+
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise SynthesisCancelled()
+
+
+def is_cancelled(token: Optional[CancellationToken]) -> bool:
+    return token is not None and token.cancelled
+
@@ -0,0 +1,199 @@
+import io
+import os
+import queue
+import threading
+import time
+import wave
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import List, Optional
+
+from audio_writer import AudioConcatWriter
+from cancellation import CancellationToken
+from coqui_model_cache import DEFAULT_COQUI_MODEL, batching_enabled, inference_context, model_cache
+from sentence_cache import split_sentences
+
+# Khoảng lặng giữa các câu, giống Synthesizer.tts của Coqui (10000 mẫu)
+SENTENCE_GAP_SAMPLES = 10000
+
+
+class CoquiBatcher:
+    """Gom các request tổng hợp theo câu từ mọi session trong một cửa sổ ngắn
+    và chạy chung một lần inference theo batch.
+
+    - max_batch_size: số câu tối đa mỗi batch
+    - max_wait: thời gian chờ tối đa (giây) để gom thêm câu sau câu đầu tiên
+    """
+
+    def __init__(self, model_name: str = DEFAULT_COQUI_MODEL, max_batch_size: int = 8, max_wait: float = 0.02):
+        self.model_name = model_name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.stats = {'batches': 0, 'items': 0, 'fallbacks': 0}
+        self._requests = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def sample_rate(self) -> int:
+        return model_cache.get(self.model_name).synthesizer.output_sample_rate
+
+    def submit(self, text: str) -> Future:
+        """Gửi một câu, trả về Future[numpy waveform float32]"""
+        future = Future()
+        self._requests.put((text, future))
+        return future
+
+    def synthesize(self, texts: List[str], cancel: Optional[CancellationToken] = None) -> list:
+        """Tổng hợp nhiều câu (có thể được gom chung batch với session khác).
+
+        Khi bị hủy, các câu chưa vào batch bị bỏ và ném SynthesisCancelled.
+        """
+        futures = [self.submit(t) for t in texts]
+        if cancel is None:
+            return [f.result() for f in futures]
+        try:
+            wavs = []
+            for future in futures:
+                while True:
+                    cancel.raise_if_cancelled()
+                    try:
+                        wavs.append(future.result(timeout=0.05))
+                        break
+                    except FutureTimeout:
+                        continue
+            return wavs
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def _collect_batch(self) -> list:
+        batch = [self._requests.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._requests.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            # Bỏ các câu của job đã bị hủy trong lúc chờ
+            batch = [(text, future) for text, future in self._collect_batch()
+                     if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            texts = [text for text, _ in batch]
+            try:
+                wavs = self._infer_batch(texts)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.stats['batches'] += 1
+            self.stats['items'] += len(batch)
+            for (_, future), wav in zip(batch, wavs):
+                future.set_result(wav)
+
+    def _infer_batch(self, texts: List[str]) -> list:
+        tts = model_cache.get(self.model_name)
+        if len(texts) > 1:
+            try:
+                return self._batched_vits(tts, texts)
+            except Exception as e:
+                print(f"⚠️ Batched Coqui inference failed, running per sentence: {e}")
+                self.stats['fallbacks'] += 1
+        import numpy as np
+        with inference_context():
+            return [np.asarray(tts.tts(text=t), dtype=np.float32) for t in texts]
+
+    @staticmethod
+    def _batched_vits(tts, texts: List[str]) -> list:
+        """Một lần forward VITS cho cả batch (pad token, cắt output theo y_mask)"""
+        import torch
+
+        model = tts.synthesizer.tts_model
+        ids = [model.tokenizer.text_to_ids(t) for t in texts]
+        lengths = torch.tensor([len(i) for i in ids], dtype=torch.long)
+        x = torch.zeros(len(ids), int(lengths.max()), dtype=torch.long)
+        for row, token_ids in enumerate(ids):
+            x[row, :len(token_ids)] = torch.tensor(token_ids, dtype=torch.long)
+
+        device = next(model.parameters()).device
+        with torch.inference_mode():
+            outputs = model.inference(x.to(device), aux_input={'x_lengths': lengths.to(device)})
+
+        wav = outputs['model_outputs']
+        hop_length = model.config.audio.hop_length
+        sample_lengths = (outputs['y_mask'].sum(dim=[1, 2]) * hop_length).long().tolist()
+        return [wav[row, 0, :sample_lengths[row]].float().cpu().numpy() for row in range(len(texts))]
+
+
+def _wav_bytes(pcm, sample_rate: int) -> bytes:
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def write_waveforms(wavs: list, sample_rate: int, output_path: str):
+    """Ghi các waveform thành một file WAV 16-bit (có khoảng lặng giữa câu), chuẩn hóa theo đỉnh cả trang.
+
+    Từng câu được chuyển sang PCM và ghi nối qua AudioConcatWriter, không
+    tạo thêm bản sao float của cả trang.
+    """
+    import numpy as np
+
+    peak = max([0.01] + [float(np.max(np.abs(wav))) for wav in wavs if len(wav)])
+    with AudioConcatWriter(output_path, 'wav') as writer:
+        for wav in wavs:
+            if writer.segments:
+                writer.append_silence(SENTENCE_GAP_SAMPLES / float(sample_rate))
+            pcm = (np.asarray(wav, dtype=np.float32) * (32767 / peak)).astype('<i2')
+            writer.append_bytes(_wav_bytes(pcm, sample_rate))
+
+
+def synthesize_to_file(text: str, output_path: str, model_name: str = DEFAULT_COQUI_MODEL,
+                       cancel: Optional[CancellationToken] = None) -> bool:
+    """Tổng hợp cả trang qua batcher: tách câu, gửi từng câu, ghép lại thành một file WAV.
+
+    Trả về False nếu batching bị tắt để engine dùng tts_to_file như cũ;
+    ném SynthesisCancelled nếu job bị hủy.
+    """
+    if cancel is not None:
+        cancel.raise_if_cancelled()
+    batcher = get_batcher(model_name)
+    if batcher is None:
+        return False
+    sentences = split_sentences(text)
+    if not sentences:
+        return False
+    wavs = batcher.synthesize(sentences, cancel)
+    write_waveforms(wavs, batcher.sample_rate, output_path)
+    return os.path.exists(output_path)
+
+
+_batchers = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(model_name: str = DEFAULT_COQUI_MODEL):
+    """Batcher dùng chung theo model (None nếu tắt bằng APP_COQUI_BATCH=0)"""
+    if not batching_enabled():
+        return None
+    with _batchers_lock:
+        batcher = _batchers.get(model_name)
+        if batcher is None:
+            batcher = CoquiBatcher(
+                model_name,
+                max_batch_size=int(os.environ.get('APP_COQUI_MAX_BATCH', '8')),
+                max_wait=float(os.environ.get('APP_COQUI_MAX_WAIT_MS', '20')) / 1000.0
+            )
+            _batchers[model_name] = batcher
+        return batcher
@@ -0,0 +1,223 @@
+import os
+import contextlib
+import importlib.util
+import threading
+import time
+from typing import List, Optional
+
+DEFAULT_COQUI_MODEL = "tts_models/vi/vivos/vits"
+
+
+def batching_enabled() -> bool:
+    """Inference Coqui đi qua CoquiBatcher (tắt bằng APP_COQUI_BATCH=0)"""
+    return os.environ.get('APP_COQUI_BATCH', '1') != '0'
+
+
+def inference_workers() -> int:
+    """Số lời gọi inference Coqui chạy đồng thời trong process.
+
+    Có batcher thì mọi câu đi qua một thread batcher duy nhất; không có thì
+    mỗi câu gọi tts_to_file trên worker của pool câu (APP_PAGE_PARALLELISM).
+    """
+    if batching_enabled():
+        return 1
+    return max(1, int(os.environ.get('APP_PAGE_PARALLELISM', '4')))
+
+
+class InferenceSettings:
+    """Cấu hình inference trên CPU.
+
+    - quantize: 'none' hoặc 'int8' (dynamic quantization cho Linear/LSTM/GRU)
+    - synth_workers: số lời gọi inference đồng thời, mặc định theo inference_workers()
+    - intra_op_threads: số thread torch cho mỗi phép tính; mặc định chia đều
+      số core cho các worker để không tranh chấp CPU khi nhiều câu chạy cùng lúc,
+      kể cả giữa các process app.py do run_workers.py chạy (APP_WORKERS)
+    """
+
+    def __init__(self, quantize: Optional[str] = None, synth_workers: Optional[int] = None,
+                 intra_op_threads: Optional[int] = None):
+        self.quantize = (quantize or os.environ.get('APP_COQUI_QUANTIZE', 'none')).lower()
+        self.synth_workers = max(1, synth_workers or inference_workers())
+        threads = intra_op_threads or int(os.environ.get('APP_COQUI_THREADS', '0'))
+        if threads <= 0:
+            processes = max(1, int(os.environ.get('APP_WORKERS', '1')))
+            threads = max(1, (os.cpu_count() or 1) // (processes * self.synth_workers))
+        self.intra_op_threads = threads
+
+    def as_dict(self) -> dict:
+        return {
+            'quantize': self.quantize,
+            'synth_workers': self.synth_workers,
+            'intra_op_threads': self.intra_op_threads
+        }
+
+
+def apply_thread_settings(settings: InferenceSettings):
+    """Giới hạn số thread của torch theo cấu hình"""
+    try:
+        import torch
+        torch.set_num_threads(settings.intra_op_threads)
+        try:
+            # Chỉ đặt được trước khi torch chạy phép tính song song đầu tiên
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass
+    except ImportError:
+        pass
+
+
+def quantize_model(tts):
+    """Dynamic int8 quantization cho model torch bên trong TTS (CPU)"""
+    import torch
+    model = tts.synthesizer.tts_model
+    model.eval()
+    quantized = torch.ao.quantization.quantize_dynamic(
+        model, {torch.nn.Linear, torch.nn.LSTM, torch.nn.GRU}, dtype=torch.qint8
+    )
+    tts.synthesizer.tts_model = quantized
+    return tts
+
+
+def inference_context():
+    """torch.inference_mode() nếu có torch (không lưu graph autograd khi suy luận)"""
+    try:
+        import torch
+        return torch.inference_mode()
+    except ImportError:
+        return contextlib.nullcontext()
+
+
+class CoquiModelCache:
+    """Cache model Coqui dùng chung cho toàn process.
+
+    Mỗi model chỉ được nạp một lần, ở lần dùng đầu tiên (hoặc qua warm_up lúc
+    khởi động server); mọi engine Coqui dùng chung instance nên chi phí mỗi
+    trang chỉ còn là inference.
+    """
+
+    def __init__(self, settings: Optional[InferenceSettings] = None, failure_backoff: float = 30.0,
+                 max_failure_backoff: float = 600.0):
+        self.settings = settings or InferenceSettings()
+        # Lỗi nạp (mạng, tải model...) chỉ chặn các lần nạp lại trong một khoảng
+        # backoff tăng gấp đôi sau mỗi lần lỗi liên tiếp, không chặn vĩnh viễn
+        self.failure_backoff = failure_backoff
+        self.max_failure_backoff = max_failure_backoff
+        self._threads_applied = False
+        self._models = {}
+        self._info = {}
+        self._failed = {}
+        self._lock = threading.Lock()
+        self._model_locks = {}
+
+    def is_available(self) -> bool:
+        """Thư viện Coqui TTS có được cài hay không (không nạp model)"""
+        return importlib.util.find_spec('TTS') is not None
+
+    def _model_lock(self, model_name: str) -> threading.Lock:
+        with self._lock:
+            lock = self._model_locks.get(model_name)
+            if lock is None:
+                lock = threading.Lock()
+                self._model_locks[model_name] = lock
+            return lock
+
+    def get(self, model_name: str = DEFAULT_COQUI_MODEL, quantize: Optional[str] = None):
+        """Lấy model đã nạp, nạp nếu chưa có (các thread khác chờ cùng một lần nạp).
+
+        quantize mặc định theo settings; mỗi biến thể (model, quantize) được cache riêng.
+        """
+        quantize = (quantize or self.settings.quantize).lower()
+        key = model_name if quantize == 'none' else f"{model_name}|{quantize}"
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._model_lock(key):
+            model = self._models.get(key)
+            if model is not None:
+                return model
+            failure = self._failed.get(key)
+            if failure is not None and time.monotonic() < failure['retry_at']:
+                raise RuntimeError(f"Coqui model {key} failed to load: {failure['error']} "
+                                   f"(retry in {failure['retry_at'] - time.monotonic():.0f}s)")
+
+            if not self._threads_applied:
+                apply_thread_settings(self.settings)
+                self._threads_applied = True
+
+            start = time.perf_counter()
+            try:
+                from TTS.api import TTS
+                model = TTS(model_name, gpu=False)
+                if quantize == 'int8':
+                    model = quantize_model(model)
+            except Exception as e:
+                attempts = failure['attempts'] + 1 if failure else 1
+                backoff = min(self.max_failure_backoff, self.failure_backoff * 2 ** (attempts - 1))
+                self._failed[key] = {'error': str(e), 'attempts': attempts, 'retry_at': time.monotonic() + backoff}
+                raise
+
+            self._failed.pop(key, None)
+            self._models[key] = model
+            self._info[key] = {
+                'load_seconds': round(time.perf_counter() - start, 2),
+                'parameter_bytes': self._parameter_bytes(model),
+                'quantize': quantize,
+                'loaded_at': time.time()
+            }
+            info = self._info[key]
+            print(f"✅ Coqui model loaded: {key} "
+                  f"({info['parameter_bytes'] / 1024 / 1024:.1f} MB, {info['load_seconds']}s)")
+            return model
+
+    @staticmethod
+    def _parameter_bytes(model) -> int:
+        """Dung lượng tham số + buffer của model torch bên trong TTS"""
+        try:
+            torch_model = model.synthesizer.tts_model
+            total = sum(p.numel() * p.element_size() for p in torch_model.parameters())
+            total += sum(b.numel() * b.element_size() for b in torch_model.buffers())
+            return int(total)
+        except Exception:
+            return 0
+
+    def warm_up(self, model_names: Optional[List[str]] = None) -> bool:
+        """Nạp trước các model (gọi lúc khởi động server)"""
+        if not self.is_available():
+            print("❌ Coqui TTS not installed, skipping warm-up")
+            return False
+        ok = True
+        for name in model_names or [DEFAULT_COQUI_MODEL]:
+            try:
+                self.get(name)
+            except Exception as e:
+                print(f"❌ Coqui warm-up failed for {name}: {e}")
+                ok = False
+        return ok
+
+    def is_loaded(self, model_name: str = DEFAULT_COQUI_MODEL) -> bool:
+        return any(key.split('|')[0] == model_name for key in self._models)
+
+    def memory_usage(self) -> dict:
+        """Thông tin bộ nhớ và thời gian nạp của từng model.
+
+        Với model đã quantize, trọng số int8 nằm trong packed params nên
+        parameter_bytes chỉ tính phần còn lại ở float32.
+        """
+        return {
+            'models': {name: dict(info) for name, info in self._info.items()},
+            'total_parameter_bytes': sum(info['parameter_bytes'] for info in self._info.values()),
+            'inference': self.settings.as_dict()
+        }
+
+    def unload(self, model_name: str):
+        """Giải phóng một model (mọi biến thể quantize)"""
+        for key in [k for k in list(self._models) + list(self._failed) if k.split('|')[0] == model_name]:
+            with self._model_lock(key):
+                self._models.pop(key, None)
+                self._info.pop(key, None)
+                self._failed.pop(key, None)
+
+
+# Cache dùng chung cho toàn process
+model_cache = CoquiModelCache()
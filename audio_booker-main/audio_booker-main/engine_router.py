@@ -0,0 +1,205 @@
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional
+
+
+class EngineProfile:
+    """Độ trễ và tỉ lệ lỗi trung bình trượt (EWMA) của một engine"""
+
+    def __init__(self, name: str, alpha: float = 0.3):
+        self.name = name
+        self.alpha = alpha
+        self.seconds_per_char = None
+        self.error_rate = 0.0
+        self.samples = 0
+        # Thời điểm đo độ trễ gần nhất (để biết số liệu đã cũ)
+        self.last_timed = 0.0
+        # Đang đo lại sau khi số liệu cũ: mẫu mới thay hẳn ước lượng cũ
+        self.exploring = False
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.probing = False
+
+    def record(self, chars: int, seconds: float, ok: bool, timed: bool = True):
+        """timed=False: lần chạy không đại diện cho độ trễ (ví dụ có cả thời gian nạp model), chỉ tính lỗi"""
+        self.samples += 1
+        self.error_rate = (1 - self.alpha) * self.error_rate + self.alpha * (0.0 if ok else 1.0)
+        if ok:
+            self.consecutive_failures = 0
+            if not timed:
+                return
+            self.last_timed = time.monotonic()
+            rate = seconds / max(chars, 1)
+            if self.seconds_per_char is None or self.exploring:
+                self.exploring = False
+                self.seconds_per_char = rate
+            else:
+                self.seconds_per_char = (1 - self.alpha) * self.seconds_per_char + self.alpha * rate
+        else:
+            self.consecutive_failures += 1
+
+    def expected_latency(self, chars: int) -> Optional[float]:
+        if self.seconds_per_char is None:
+            return None
+        return self.seconds_per_char * max(chars, 1)
+
+    def is_stale(self, max_age: float) -> bool:
+        return self.seconds_per_char is not None and time.monotonic() - self.last_timed > max_age
+
+    def is_ejected(self) -> bool:
+        return time.monotonic() < self.ejected_until
+
+    def snapshot(self) -> dict:
+        return {
+            'seconds_per_char': self.seconds_per_char,
+            'error_rate': round(self.error_rate, 3),
+            'samples': self.samples,
+            'consecutive_failures': self.consecutive_failures,
+            'ejected': self.is_ejected(),
+            'ejected_for': max(0.0, round(self.ejected_until - time.monotonic(), 1))
+        }
+
+
+class EngineRouter:
+    """Chọn engine cho từng trang theo độ trễ dự kiến so với deadline.
+
+    - Engine đáp ứng được deadline được ưu tiên theo thứ tự cấu hình.
+    - Engine không kịp deadline có số liệu cũ hơn explore_after giây được thử
+      lại một lần như engine chưa có số liệu, để một lần chậm (ví dụ lúc nạp
+      model hay mạng nghẽn) không loại engine vĩnh viễn.
+    - Engine lỗi liên tiếp (hoặc tỉ lệ lỗi cao) bị loại tạm thời và được thử
+      lại ở thread nền bằng hàm probe đã đăng ký.
+    - Các quyết định gần nhất được giữ lại để xem qua snapshot().
+    """
+
+    def __init__(self, deadline: float = 5.0, eject_failures: int = 3, max_error_rate: float = 0.5,
+                 eject_seconds: float = 30.0, history: int = 100, explore_after: float = 300.0):
+        self.deadline = deadline
+        self.explore_after = explore_after
+        self.eject_failures = eject_failures
+        self.max_error_rate = max_error_rate
+        self.eject_seconds = eject_seconds
+        self.profiles = {}
+        self.decisions = deque(maxlen=history)
+        self._probes = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, probe: Optional[Callable[[], bool]] = None):
+        """Khai báo engine và (tùy chọn) hàm probe dùng khi engine bị loại"""
+        with self._lock:
+            self.profiles.setdefault(name, EngineProfile(name))
+            if probe is not None:
+                self._probes[name] = probe
+
+    def route(self, candidates: List[str], chars: int) -> dict:
+        """Quyết định định tuyến cho một trang có `chars` ký tự; decision['order'] là thứ tự engine nên thử"""
+        with self._lock:
+            healthy = [n for n in candidates if not self.profiles[n].is_ejected()]
+            meets, misses, unknown, explored = [], [], [], []
+            for name in healthy:
+                profile = self.profiles[name]
+                expected = profile.expected_latency(chars)
+                if expected is None:
+                    unknown.append(name)
+                elif expected <= self.deadline:
+                    meets.append(name)
+                elif profile.is_stale(self.explore_after):
+                    # Đo lại: chỉ trang này thử, các trang khác dùng số liệu cũ tới khi có mẫu mới
+                    profile.last_timed = time.monotonic()
+                    profile.exploring = True
+                    unknown.append(name)
+                    explored.append(name)
+                else:
+                    misses.append(name)
+
+            # Engine chưa có số liệu được thử theo thứ tự ưu tiên để học profile;
+            # engine không kịp deadline xếp sau, nhanh hơn đứng trước
+            misses.sort(key=lambda n: self.profiles[n].expected_latency(chars))
+            order = [n for n in candidates if n in meets or n in unknown] + misses
+            if not order:
+                # Tất cả đều bị loại: vẫn thử engine bị loại lâu nhất thay vì thất bại ngay
+                order = sorted(candidates, key=lambda n: self.profiles[n].ejected_until)
+
+            decision = {
+                'time': time.time(),
+                'chars': chars,
+                'order': order,
+                'expected': {n: self.profiles[n].expected_latency(chars) for n in candidates},
+                'ejected': [n for n in candidates if n not in healthy],
+                'explored': explored,
+                'chosen': None
+            }
+            self.decisions.append(decision)
+            return decision
+
+    def record(self, name: str, chars: int, seconds: float, ok: bool, decision: Optional[dict] = None,
+               timed: bool = True):
+        """Ghi nhận kết quả một lần tổng hợp (và engine đã phục vụ trang nếu có decision)"""
+        with self._lock:
+            profile = self.profiles[name]
+            profile.record(chars, seconds, ok, timed)
+            if decision is not None and ok and decision['chosen'] is None:
+                decision['chosen'] = name
+                decision['seconds'] = round(seconds, 3)
+            should_eject = not ok and (
+                profile.consecutive_failures >= self.eject_failures
+                or (profile.samples >= 5 and profile.error_rate >= self.max_error_rate)
+            )
+            if should_eject and not profile.is_ejected():
+                self._eject(profile)
+
+    def _eject(self, profile: EngineProfile):
+        profile.ejected_until = time.monotonic() + self.eject_seconds
+        print(f"⚠️ Engine '{profile.name}' ejected for {self.eject_seconds:.0f}s")
+        probe = self._probes.get(profile.name)
+        if probe is not None and not profile.probing:
+            profile.probing = True
+            threading.Thread(target=self._probe_loop, args=(profile, probe), daemon=True).start()
+
+    def _probe_loop(self, profile: EngineProfile, probe: Callable[[], bool]):
+        """Thử lại engine bị loại ở nền cho đến khi probe thành công"""
+        try:
+            while True:
+                time.sleep(max(0.0, profile.ejected_until - time.monotonic()))
+                try:
+                    ok = probe()
+                except Exception:
+                    ok = False
+                with self._lock:
+                    if ok:
+                        profile.ejected_until = 0.0
+                        profile.consecutive_failures = 0
+                        profile.error_rate = 0.0
+                        print(f"✅ Engine '{profile.name}' back in rotation")
+                        return
+                    profile.ejected_until = time.monotonic() + self.eject_seconds
+        finally:
+            profile.probing = False
+
+    def snapshot(self) -> dict:
+        """Trạng thái profile từng engine và các quyết định định tuyến gần nhất"""
+        with self._lock:
+            return {
+                'deadline': self.deadline,
+                'engines': {name: p.snapshot() for name, p in self.profiles.items()},
+                'decisions': list(self.decisions)[-20:]
+            }
+
+
+_routers = {}
+_routers_lock = threading.Lock()
+
+
+def get_router(name: str, deadline: float = 5.0) -> EngineRouter:
+    """Router dùng chung theo tên (profile được giữ qua các session)"""
+    with _routers_lock:
+        router = _routers.get(name)
+        if router is None:
+            router = EngineRouter(deadline=deadline)
+            _routers[name] = router
+        return router
+
+
+def all_routers() -> Dict[str, EngineRouter]:
+    return dict(_routers)
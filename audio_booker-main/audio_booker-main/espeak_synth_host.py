@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Host espeak-ng chạy lâu dài cho PersistentSubprocessTTSEngine.
+
+Nạp libespeak-ng một lần qua ctypes (không spawn `espeak-ng` cho mỗi trang)
+rồi đọc request dạng dòng JSON từ stdin, ghi WAV và trả kết quả ra stdout.
+
+    APP_TTS_ENGINE=subprocess APP_SYNTH_COMMAND="python espeak_synth_host.py --voice vi" python app.py
+"""
+
+import argparse
+import ctypes
+import ctypes.util
+import json
+import sys
+import wave
+
+AUDIO_OUTPUT_SYNCHRONOUS = 2
+ESPEAK_CHARS_UTF8 = 1
+ESPEAK_RATE = 1
+ESPEAK_VOLUME = 2
+POS_CHARACTER = 1
+
+SYNTH_CALLBACK = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short), ctypes.c_int, ctypes.c_void_p)
+
+
+class EspeakHost:
+    def __init__(self, voice: str):
+        name = ctypes.util.find_library('espeak-ng') or 'libespeak-ng.so.1'
+        self.lib = ctypes.CDLL(name)
+        self.lib.espeak_Initialize.restype = ctypes.c_int
+        self.lib.espeak_Initialize.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+        self.lib.espeak_SetSynthCallback.argtypes = [SYNTH_CALLBACK]
+        self.lib.espeak_SetVoiceByName.argtypes = [ctypes.c_char_p]
+        self.lib.espeak_SetParameter.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        self.lib.espeak_Synth.argtypes = [
+            ctypes.c_void_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_int,
+            ctypes.c_uint, ctypes.c_uint, ctypes.POINTER(ctypes.c_uint), ctypes.c_void_p
+        ]
+
+        self.sample_rate = self.lib.espeak_Initialize(AUDIO_OUTPUT_SYNCHRONOUS, 500, None, 0)
+        if self.sample_rate <= 0:
+            raise RuntimeError("espeak_Initialize failed")
+
+        self._chunks = []
+        self._callback = SYNTH_CALLBACK(self._on_samples)  # giữ tham chiếu để không bị GC
+        self.lib.espeak_SetSynthCallback(self._callback)
+        self.default_voice = voice
+        self._current_voice = None
+        self._set_voice(voice)
+
+    def _on_samples(self, wav, num_samples, events):
+        if wav and num_samples > 0:
+            self._chunks.append(ctypes.string_at(wav, num_samples * 2))
+        return 0
+
+    def _set_voice(self, voice: str):
+        if voice and voice != self._current_voice:
+            self.lib.espeak_SetVoiceByName(voice.encode('utf-8'))
+            self._current_voice = voice
+
+    def synthesize(self, text: str, output_path: str, voice: dict):
+        self._set_voice(voice.get('name') or self.default_voice)
+        if 'rate' in voice:
+            self.lib.espeak_SetParameter(ESPEAK_RATE, int(voice['rate']), 0)
+        if 'volume' in voice:
+            self.lib.espeak_SetParameter(ESPEAK_VOLUME, int(float(voice['volume']) * 100), 0)
+
+        self._chunks = []
+        data = text.encode('utf-8') + b'\0'
+        buffer = ctypes.create_string_buffer(data)
+        self.lib.espeak_Synth(buffer, len(data), 0, POS_CHARACTER, 0, ESPEAK_CHARS_UTF8, None, None)
+
+        with wave.open(output_path, 'wb') as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(self.sample_rate)
+            w.writeframes(b''.join(self._chunks))
+        self._chunks = []
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Persistent espeak-ng synthesizer host')
+    parser.add_argument('--voice', default='vi')
+    args = parser.parse_args()
+
+    host = EspeakHost(args.voice)
+    print(json.dumps({'ready': True}), flush=True)
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            host.synthesize(request.get('text', ''), request['output'], request.get('voice') or {})
+            reply = {'id': request_id, 'ok': True}
+        except Exception as e:
+            reply = {'id': request_id, 'ok': False, 'error': str(e)}
+        print(json.dumps(reply), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,81 @@
 import os
 import tempfile
+import threading
 import time
 import urllib.request
 import urllib.parse
-from typing import Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import List, Optional, Tuple
+
+from audio_utils import probe_duration
+from audio_writer import AudioConcatWriter
+from cancellation import CancellationToken, is_cancelled
+from http_pool import get_pool
+from remote_resilience import CircuitOpenError, ResilientFetcher
+
+DEFAULT_TTS_URL = "https://translate.google.com/translate_tts"
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+# Thread pool dùng chung để tải các chunk song song (giới hạn kết nối nằm ở pool HTTP)
+_fetch_executor = None
+_fetch_executor_size = 0
+_fetch_executor_lock = threading.Lock()
+
+
+def _get_fetch_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _fetch_executor, _fetch_executor_size
+    with _fetch_executor_lock:
+        if _fetch_executor is None or max_workers > _fetch_executor_size:
+            old = _fetch_executor
+            _fetch_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='google-tts')
+            _fetch_executor_size = max_workers
+            if old is not None:
+                old.shutdown(wait=False)
+        return _fetch_executor
+
+
+# Hedging, ngân sách retry và circuit breaker dùng chung theo endpoint
+_fetchers = {}
+_fetchers_lock = threading.Lock()
+
+
+def _get_resilient_fetcher(base_url: str, pool) -> ResilientFetcher:
+    with _fetchers_lock:
+        fetcher = _fetchers.get(base_url)
+        if fetcher is None:
+            # Độ trễ đo trong request (không tính chờ slot của pool), và không hedge khi pool đã đầy
+            fetcher = ResilientFetcher(
+                hedge_percentile=float(os.environ.get('APP_GOOGLE_TTS_HEDGE_PERCENTILE', '95')),
+                max_retries=int(os.environ.get('APP_GOOGLE_TTS_RETRIES', '2')),
+                timed_by_caller=True,
+                can_hedge=pool.has_free_slot
+            )
+            _fetchers[base_url] = fetcher
+        return fetcher
+
 
 class GoogleTTSEngine:
     def __init__(self):
         self.available = False
-        self.base_url = "https://translate.google.com/translate_tts"
+        # APP_GOOGLE_TTS_URL cho phép trỏ sang server giả lập (stub_tts_server.py) để benchmark
+        self.base_url = os.environ.get('APP_GOOGLE_TTS_URL', DEFAULT_TTS_URL)
+        # Số kết nối keep-alive tối đa tới host TTS (dùng chung cho mọi session)
+        self.max_connections = int(os.environ.get('APP_GOOGLE_TTS_CONNECTIONS', '4'))
+        self.timeout = 10
+        self.pool = get_pool(self.base_url, max_connections=self.max_connections, timeout=self.timeout)
+        self.fetcher = _get_resilient_fetcher(self.base_url, self.pool)
         self._initialize_engine()
     
     def _initialize_engine(self):
         """Khởi tạo Google TTS engine"""
         try:
-            # Test kết nối
-            req = urllib.request.Request("https://www.google.com")
+            # Test kết nối (tới Google, hoặc tới host đã cấu hình)
+            check_url = "https://www.google.com"
+            if self.base_url != DEFAULT_TTS_URL:
+                parsed = urllib.parse.urlsplit(self.base_url)
+                check_url = f"{parsed.scheme}://{parsed.netloc}/"
+            req = urllib.request.Request(check_url)
             with urllib.request.urlopen(req, timeout=5) as response:
                 if response.status == 200:
                     self.available = True
@@ -41,8 +101,9 @@ class GoogleTTSEngine:
         
         return text.strip()
     
-    def generate_audio(self, text: str, output_path: str, dialect: str = 'north') -> bool:
-        """Tạo file audio từ text"""
+    def generate_audio(self, text: str, output_path: str, dialect: str = 'north',
+                       cancel: Optional[CancellationToken] = None) -> bool:
+        """Tạo file audio từ text (dừng ở ranh giới chunk kế tiếp nếu bị hủy)"""
         if not self.available:
             print("❌ Google TTS engine not available")
             return False
@@ -57,45 +118,137 @@ class GoogleTTSEngine:
             if not chunks:
                 return False
 
-            # Tải từng chunk dưới dạng mp3 bytes và ghép nối lại
-            combined = bytearray()
-            for part in chunks:
-                mp3_bytes = self._fetch_tts_bytes(part)
-                if not mp3_bytes:
+            # Tải các chunk song song qua pool keep-alive, ghi xuống đĩa theo đúng thứ tự
+            # ngay khi tới lượt (bỏ header ID3/Xing lặp lại giữa các chunk)
+            writer = AudioConcatWriter(output_path, 'mp3')
+            for mp3_bytes in self._fetch_chunks(chunks, cancel):
+                if not mp3_bytes or is_cancelled(cancel):
+                    writer.abort()
                     return False
-                combined.extend(mp3_bytes)
-
-            # Ghi file kết quả (mp3)
-            with open(output_path, 'wb') as f:
-                f.write(combined)
+                writer.append_bytes(mp3_bytes)
+            writer.close()
             return os.path.exists(output_path)
             
-            return False
-            
         except Exception as e:
             print(f"❌ Error generating audio: {e}")
             return False
     
+    def generate_many(self, items: List[Tuple[str, str, str]],
+                      cancel: Optional[CancellationToken] = None) -> List[bool]:
+        """Tạo nhiều file audio [(text, output_path, dialect), ...] với mọi chunk tải đồng thời.
+
+        Các câu/trang ngắn thường chỉ có một chunk, nên tải từng file một sẽ
+        tuần tự; ở đây chunk của mọi mục đi chung một cửa sổ tải song song và
+        mỗi file được ghi theo thứ tự khi tới lượt. Trả về kết quả theo đúng
+        thứ tự items.
+        """
+        results = [False] * len(items)
+        if not self.available or not items or is_cancelled(cancel):
+            return results
+
+        plan = [self._split_text_into_chunks(self._preprocess_text(text), max_len=180) for text, _, _ in items]
+        print(f"Generating {len(items)} audio files ({sum(len(chunks) for chunks in plan)} chunks) concurrently")
+        fetched = self._fetch_chunks([chunk for chunks in plan for chunk in chunks], cancel)
+        try:
+            for index, chunks in enumerate(plan):
+                if is_cancelled(cancel):
+                    break
+                if chunks:
+                    results[index] = self._stream_chunks(items[index][1], fetched, len(chunks), cancel)
+        except Exception as e:
+            print(f"❌ Error generating audio batch: {e}")
+        finally:
+            fetched.close()
+        return results
+
+    @staticmethod
+    def _stream_chunks(output_path: str, fetched, count: int, cancel: Optional[CancellationToken]) -> bool:
+        """Ghi `count` chunk kế tiếp của fetched vào output_path (luôn lấy đủ count chunk để giữ thứ tự)"""
+        writer = AudioConcatWriter(output_path, 'mp3')
+        ok = True
+        try:
+            for _ in range(count):
+                mp3_bytes = next(fetched)
+                ok = ok and bool(mp3_bytes) and not is_cancelled(cancel)
+                if ok:
+                    writer.append_bytes(mp3_bytes)
+        except Exception:
+            writer.abort()
+            raise
+        if not ok:
+            writer.abort()
+            return False
+        writer.close()
+        return os.path.exists(output_path)
+
+    def _fetch_chunks(self, chunks: list, cancel: Optional[CancellationToken] = None):
+        """Tải mp3 bytes của nhiều chunk song song, trả về theo thứ tự ban đầu.
+
+        Khi bị hủy, trả về b'' thay vì chờ chunk đang tải; các chunk chưa chạy bị bỏ.
+        """
+        if len(chunks) == 1:
+            yield b'' if is_cancelled(cancel) else self._fetch_tts_bytes(chunks[0])
+            return
+        # Chỉ giữ một cửa sổ chunk đang tải để bộ nhớ mỗi trang không tăng theo độ dài trang
+        window = max(self.max_connections, 1) * 2
+        executor = _get_fetch_executor(window)
+        futures = deque()
+        next_chunk = 0
+        try:
+            while next_chunk < len(chunks) or futures:
+                while next_chunk < len(chunks) and len(futures) < window:
+                    futures.append(executor.submit(self._fetch_tts_bytes, chunks[next_chunk]))
+                    next_chunk += 1
+                yield self._chunk_result(futures.popleft(), cancel)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    @staticmethod
+    def _chunk_result(future, cancel: Optional[CancellationToken]) -> bytes:
+        if cancel is None:
+            return future.result()
+        while not cancel.cancelled:
+            try:
+                return future.result(timeout=0.05)
+            except FutureTimeout:
+                continue
+        future.cancel()
+        return b''
+
+    def _request_chunk(self, text: str) -> bytes:
+        """Một request TTS cho một đoạn text ngắn; ném lỗi nếu không nhận được audio"""
+        params = {
+            'ie': 'UTF-8',
+            'q': text,
+            'tl': 'vi',  # Tiếng Việt
+            'client': 'tw-ob'
+        }
+        timing = {}
+        status, body = self.pool.get(params, headers={'User-Agent': USER_AGENT}, timing=timing)
+        if status != 200 or not body:
+            raise IOError(f"TTS request failed with status {status}")
+        self.fetcher.record_latency(timing['seconds'])
+        return body
+
     def _fetch_tts_bytes(self, text: str) -> bytes:
-        """Lấy mp3 bytes cho một đoạn text ngắn"""
+        """Lấy mp3 bytes cho một đoạn text ngắn (có hedging, retry và circuit breaker)"""
         try:
-            params = {
-                'ie': 'UTF-8',
-                'q': text,
-                'tl': 'vi',  # Tiếng Việt
-                'client': 'tw-ob'
-            }
-            url = self.base_url + '?' + urllib.parse.urlencode(params)
-            req = urllib.request.Request(url)
-            req.add_header('User-Agent', 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
-            with urllib.request.urlopen(req, timeout=10) as response:
-                if response.status == 200:
-                    return response.read()
+            return self.fetcher.call(self._request_chunk, text)
+        except CircuitOpenError as e:
+            print(f"❌ Google TTS unavailable: {e}")
             return b''
         except Exception as e:
             print(f"❌ Error fetching tts bytes: {e}")
             return b''
 
+    def get_resilience_stats(self) -> dict:
+        """Thống kê hedging/retry/circuit breaker của endpoint hiện tại"""
+        return dict(self.fetcher.snapshot(),
+                    circuit=self.fetcher.breaker.state,
+                    retry_tokens=round(self.fetcher.budget.tokens, 2),
+                    hedge_delay=round(self.fetcher.hedge_delay(), 3))
+
     def _split_text_into_chunks(self, text: str, max_len: int = 180) -> list:
         """Chia text thành các phần <= max_len, cắt theo từ để tránh vỡ chữ"""
         words = text.split()
@@ -115,14 +268,11 @@ class GoogleTTSEngine:
         return chunks
     
     def _merge_audio_files(self, audio_files: list, output_path: str):
-        """[Deprecated for MP3] Giữ lại để tương thích, không dùng cho MP3."""
+        """Ghép các file mp3 theo ranh giới frame, đọc/ghi theo block"""
         try:
-            combined = bytearray()
-            for p in audio_files:
-                with open(p, 'rb') as f:
-                    combined.extend(f.read())
-            with open(output_path, 'wb') as out:
-                out.write(combined)
+            with AudioConcatWriter(output_path, 'mp3') as writer:
+                for p in audio_files:
+                    writer.append_file(p)
         except Exception as e:
             print(f"❌ Error merging files: {e}")
     
@@ -178,20 +328,8 @@ class GoogleTTSEngine:
         return self.speak_text(test_text, dialect)
     
     def get_audio_duration(self, audio_path: str) -> float:
-        """Lấy thời lượng của file audio (giây)"""
-        try:
-            if not os.path.exists(audio_path):
-                return 0.0
-            
-            import wave
-            with wave.open(audio_path, 'rb') as audio_file:
-                frames = audio_file.getnframes()
-                sample_rate = audio_file.getframerate()
-                duration = frames / float(sample_rate)
-                return duration
-        except Exception as e:
-            print(f"Error getting audio duration: {e}")
-            return 0.0
+        """Lấy thời lượng của file audio (giây), hỗ trợ WAV và MP3"""
+        return probe_duration(audio_path)
     
     def cleanup(self):
         """Dọn dẹp tài nguyên"""
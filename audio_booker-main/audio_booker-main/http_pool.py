@@ -0,0 +1,117 @@
+import http.client
+import queue
+import threading
+import time
+import urllib.parse
+from typing import Dict, Optional, Tuple
+
+
+class KeepAliveConnectionPool:
+    """Pool kết nối HTTP/1.1 keep-alive tới một host, giới hạn số kết nối đồng thời.
+
+    Mỗi request mượn một kết nối đang rảnh (hoặc mở kết nối mới nếu chưa đủ
+    giới hạn), nên handshake TCP/TLS chỉ phải làm một lần cho mỗi kết nối.
+    """
+
+    def __init__(self, base_url: str, max_connections: int = 4, timeout: float = 10.0):
+        parsed = urllib.parse.urlsplit(base_url)
+        self.scheme = parsed.scheme or 'https'
+        self.host = parsed.hostname
+        self.port = parsed.port
+        self.path = parsed.path or '/'
+        self.timeout = timeout
+        self.max_connections = max(1, max_connections)
+        self._slots = threading.BoundedSemaphore(self.max_connections)
+        self._idle = queue.LifoQueue()
+        self._in_use = 0
+        self._in_use_lock = threading.Lock()
+        self.connections_opened = 0
+
+    def _new_connection(self):
+        self.connections_opened += 1
+        if self.scheme == 'https':
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def has_free_slot(self) -> bool:
+        """Còn kết nối rảnh (request mới không phải xếp hàng chờ slot)"""
+        with self._in_use_lock:
+            return self._in_use < self.max_connections
+
+    def _acquire(self):
+        self._slots.acquire()
+        with self._in_use_lock:
+            self._in_use += 1
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._new_connection()
+
+    def _release(self, conn, reusable: bool):
+        if reusable:
+            self._idle.put(conn)
+        else:
+            conn.close()
+        with self._in_use_lock:
+            self._in_use -= 1
+        self._slots.release()
+
+    def get(self, query: Dict[str, str], headers: Optional[Dict[str, str]] = None,
+            timeout: Optional[float] = None, timing: Optional[dict] = None) -> Tuple[int, bytes]:
+        """Gửi GET tới base path với query, trả về (status, body).
+
+        timing['seconds'] nhận thời gian request sau khi đã có kết nối (không
+        tính thời gian chờ slot của pool).
+        """
+        target = self.path + '?' + urllib.parse.urlencode(query)
+        headers = dict(headers or {})
+        headers.setdefault('Connection', 'keep-alive')
+
+        # Kết nối keep-alive có thể đã bị server đóng: thử lại một lần với kết nối mới
+        for attempt in range(2):
+            conn = self._acquire()
+            started = time.monotonic()
+            reusable = False
+            try:
+                if conn.sock is not None and timeout is not None:
+                    conn.sock.settimeout(timeout)
+                elif timeout is not None:
+                    conn.timeout = timeout
+                conn.request('GET', target, headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+                reusable = not response.will_close
+                if timing is not None:
+                    timing['seconds'] = time.monotonic() - started
+                return response.status, body
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError,
+                    http.client.CannotSendRequest, http.client.BadStatusLine):
+                if attempt == 1:
+                    raise
+            finally:
+                self._release(conn, reusable)
+        return 0, b''
+
+    def close(self):
+        """Đóng các kết nối đang rảnh"""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(base_url: str, max_connections: int = 4, timeout: float = 10.0) -> KeepAliveConnectionPool:
+    """Pool dùng chung theo host, để giới hạn kết nối áp dụng cho mọi session"""
+    parsed = urllib.parse.urlsplit(base_url)
+    key = (parsed.scheme, parsed.hostname, parsed.port, parsed.path)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = KeepAliveConnectionPool(base_url, max_connections=max_connections, timeout=timeout)
+            _pools[key] = pool
+        return pool
@@ -1,29 +1,41 @@
 import os
 import tempfile
+import threading
 import time
 from typing import Optional
 
+from audio_utils import probe_duration
+from cancellation import CancellationToken, SynthesisCancelled, is_cancelled
+from coqui_batcher import synthesize_to_file
+from coqui_model_cache import DEFAULT_COQUI_MODEL, inference_context, model_cache
+from engine_router import get_router
+from pyttsx3_pool import get_shared_pool
+
 class HybridTTSEngine:
-    def __init__(self):
+    def __init__(self, model_name: str = DEFAULT_COQUI_MODEL):
         self.coqui_available = False
         self.pyttsx3_available = False
-        self.coqui_tts = None
+        self.model_name = model_name
         self.pyttsx3_engine = None
+        # Driver pyttsx3 không thread-safe khi chạy trực tiếp (không có worker pool)
+        self._pyttsx3_lock = threading.Lock()
         
         self._initialize_engines()
+        
+        # Router dùng chung cho mọi HybridTTSEngine để profile không mất giữa các lần upload
+        self.router = get_router('hybrid', deadline=float(os.environ.get('APP_ROUTE_DEADLINE', '5')))
+        for name in ('coqui', 'pyttsx3'):
+            self.router.register(name, probe=lambda name=name: self._probe(name))
     
     def _initialize_engines(self):
         """Khởi tạo các TTS engines"""
-        # Thử Coqui TTS trước
-        try:
-            from TTS.api import TTS
-            self.coqui_tts = TTS("tts_models/vi/vivos/vits")
+        # Thử Coqui TTS trước (model dùng chung, nạp ở lần dùng đầu tiên)
+        if model_cache.is_available():
             self.coqui_available = True
-            print("✅ Coqui TTS initialized")
-        except Exception as e:
-            print(f"❌ Coqui TTS not available: {e}")
+            print("✅ Coqui TTS available")
+        else:
+            print("❌ Coqui TTS not available")
             self.coqui_available = False
-            self.coqui_tts = None
         
         # Fallback với pyttsx3
         try:
@@ -36,6 +48,16 @@ class HybridTTSEngine:
             self.pyttsx3_available = False
             self.pyttsx3_engine = None
     
+    @property
+    def coqui_tts(self):
+        """Model Coqui từ cache dùng chung của process"""
+        try:
+            return model_cache.get(self.model_name)
+        except Exception as e:
+            print(f"❌ Coqui TTS not available: {e}")
+            self.coqui_available = False
+            raise
+    
     def _preprocess_text(self, text: str) -> str:
         """Xử lý text trước khi đọc"""
         import re
@@ -48,41 +70,113 @@ class HybridTTSEngine:
             text += '.'
         return text.strip()
     
-    def generate_audio(self, text: str, output_path: str, dialect: str = 'north') -> bool:
-        """Tạo file audio từ text"""
+    def generate_audio(self, text: str, output_path: str, dialect: str = 'north',
+                       cancel: Optional[CancellationToken] = None) -> bool:
+        """Tạo file audio từ text, chọn engine theo độ trễ/tỉ lệ lỗi đã đo"""
         # Xử lý text
         processed_text = self._preprocess_text(text)
         print(f"Generating audio for: {processed_text[:50]}...")
         
-        # Thử Coqui TTS trước
-        if self.coqui_available:
-            try:
-                self.coqui_tts.tts_to_file(
-                    text=processed_text,
-                    file_path=output_path
-                )
-                
-                if os.path.exists(output_path):
-                    print(f"✅ Audio generated with Coqui TTS: {output_path}")
-                    return True
-            except Exception as e:
-                print(f"❌ Coqui TTS failed: {e}")
+        decision = self.router.route(self._candidates(), len(processed_text))
         
-        # Fallback với pyttsx3
-        if self.pyttsx3_available:
-            try:
-                self.pyttsx3_engine.save_to_file(processed_text, output_path)
-                self.pyttsx3_engine.runAndWait()
-                
-                if os.path.exists(output_path):
-                    print(f"✅ Audio generated with pyttsx3: {output_path}")
-                    return True
-            except Exception as e:
-                print(f"❌ pyttsx3 failed: {e}")
+        for name in decision['order']:
+            if is_cancelled(cancel):
+                print(f"⚠️ Synthesis cancelled: {output_path}")
+                return False
+            if self._attempt(name, processed_text, output_path, cancel, decision):
+                print(f"✅ Audio generated with {name}: {output_path}")
+                return True
+            if is_cancelled(cancel):
+                print(f"⚠️ Synthesis cancelled: {output_path}")
+                return False
         
         print("❌ All TTS engines failed")
         return False
     
+    def for_page(self, text: str):
+        """Engine cho các câu của một trang: router chọn một lần theo cả trang, mọi câu dùng cùng engine.
+
+        Dùng khi trang được ghép từ clip từng câu (cache câu), để một trang không
+        lẫn giọng Coqui và pyttsx3. Câu lỗi không chuyển engine: trang thất bại
+        và được tạo lại nguyên trang bằng generate_audio.
+        """
+        candidates = self._candidates()
+        if not candidates:
+            return self
+        decision = self.router.route(candidates, len(self._preprocess_text(text)))
+        return HybridPageEngine(self, decision['order'][0], decision)
+    
+    def _candidates(self) -> list:
+        return [name for name, available in (('coqui', self.coqui_available),
+                                             ('pyttsx3', self.pyttsx3_available)) if available]
+    
+    def _attempt(self, name: str, text: str, output_path: str, cancel: Optional[CancellationToken],
+                 decision: dict) -> bool:
+        """Tạo audio bằng một engine và ghi kết quả vào router"""
+        # Lần gọi Coqui đầu tiên gồm cả thời gian nạp model, không phản ánh độ trễ thật
+        cold = name == 'coqui' and not model_cache.is_loaded(self.model_name)
+        start = time.perf_counter()
+        ok = self._generate_with(name, text, output_path, cancel)
+        if not ok and is_cancelled(cancel):
+            # Job bị hủy không phải lỗi của engine, không ghi vào profile của router
+            return False
+        self.router.record(name, len(text), time.perf_counter() - start, ok, decision, timed=not cold)
+        return ok
+    
+    def _generate_with(self, name: str, text: str, output_path: str,
+                       cancel: Optional[CancellationToken] = None) -> bool:
+        if name == 'coqui':
+            return self._generate_coqui(text, output_path, cancel)
+        return self._generate_pyttsx3(text, output_path, cancel)
+    
+    def _generate_coqui(self, text: str, output_path: str, cancel: Optional[CancellationToken] = None) -> bool:
+        """Tạo audio bằng Coqui TTS"""
+        try:
+            if not synthesize_to_file(text, output_path, self.model_name, cancel):
+                with inference_context():
+                    self.coqui_tts.tts_to_file(
+                        text=text,
+                        file_path=output_path
+                    )
+            return os.path.exists(output_path)
+        except SynthesisCancelled:
+            return False
+        except Exception as e:
+            print(f"❌ Coqui TTS failed: {e}")
+            return False
+    
+    def _generate_pyttsx3(self, text: str, output_path: str, cancel: Optional[CancellationToken] = None) -> bool:
+        """Tạo audio bằng pyttsx3"""
+        try:
+            pool = get_shared_pool()
+            if pool is not None:
+                if not pool.synthesize(text, None, output_path, cancel=cancel):
+                    return False
+            else:
+                with self._pyttsx3_lock:
+                    self.pyttsx3_engine.save_to_file(text, output_path)
+                    self.pyttsx3_engine.runAndWait()
+            return os.path.exists(output_path)
+        except Exception as e:
+            print(f"❌ pyttsx3 failed: {e}")
+            return False
+    
+    def _probe(self, name: str) -> bool:
+        """Thử một câu ngắn để xem engine bị loại đã hoạt động lại chưa"""
+        with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
+            temp_path = temp_file.name
+        try:
+            return self._generate_with(name, "Xin chào.", temp_path)
+        finally:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+    
+    def get_routing_stats(self) -> dict:
+        """Profile độ trễ/lỗi của từng engine và các quyết định định tuyến gần nhất"""
+        return self.router.snapshot()
+    
     def speak_text(self, text: str, dialect: str = 'north') -> bool:
         """Đọc text trực tiếp (không lưu file)"""
         # Xử lý text
@@ -96,10 +190,11 @@ class HybridTTSEngine:
                     temp_path = temp_file.name
                 
                 # Tạo audio
-                self.coqui_tts.tts_to_file(
-                    text=processed_text,
-                    file_path=temp_path
-                )
+                with inference_context():
+                    self.coqui_tts.tts_to_file(
+                        text=processed_text,
+                        file_path=temp_path
+                    )
                 
                 # Phát audio
                 if os.name == 'nt':  # Windows
@@ -151,20 +246,8 @@ class HybridTTSEngine:
         return self.speak_text(test_text, dialect)
     
     def get_audio_duration(self, audio_path: str) -> float:
-        """Lấy thời lượng của file audio (giây)"""
-        try:
-            if not os.path.exists(audio_path):
-                return 0.0
-            
-            import wave
-            with wave.open(audio_path, 'rb') as audio_file:
-                frames = audio_file.getnframes()
-                sample_rate = audio_file.getframerate()
-                duration = frames / float(sample_rate)
-                return duration
-        except Exception as e:
-            print(f"Error getting audio duration: {e}")
-            return 0.0
+        """Lấy thời lượng của file audio (giây), hỗ trợ WAV và MP3"""
+        return probe_duration(audio_path)
     
     def cleanup(self):
         """Dọn dẹp tài nguyên"""
@@ -172,3 +255,23 @@ class HybridTTSEngine:
             self.pyttsx3_engine.stop()
             del self.pyttsx3_engine
             self.pyttsx3_engine = None
+
+
+class HybridPageEngine:
+    """HybridTTSEngine gắn với engine router đã chọn cho một trang (xem HybridTTSEngine.for_page)"""
+
+    def __init__(self, hybrid: HybridTTSEngine, engine_name: str, decision: dict):
+        self.hybrid = hybrid
+        self.engine_name = engine_name
+        self.decision = decision
+
+    def voice_key(self, dialect: str) -> str:
+        """Khóa cache câu theo engine con thật sự tạo audio (Coqui và pyttsx3 khác giọng, khác định dạng)"""
+        return f"HybridTTSEngine:{self.engine_name}|{dialect}"
+
+    def generate_audio(self, text: str, output_path: str, dialect: str = 'north',
+                       cancel: Optional[CancellationToken] = None) -> bool:
+        processed_text = self.hybrid._preprocess_text(text)
+        if is_cancelled(cancel):
+            return False
+        return self.hybrid._attempt(self.engine_name, processed_text, output_path, cancel, self.decision)
@@ -0,0 +1,35 @@
+from typing import Callable
+
+# Chế độ async của server Socket.IO ('eventlet', 'gevent', 'threading'...)
+_async_mode = 'threading'
+
+
+def configure(async_mode: str):
+    """Đặt chế độ async của server (gọi một lần sau khi tạo SocketIO)"""
+    global _async_mode
+    _async_mode = async_mode or 'threading'
+
+
+def async_mode() -> str:
+    return _async_mode
+
+
+def run_blocking(fn: Callable, *args, **kwargs):
+    """Chạy fn (tổng hợp audio, subprocess, HTTP...) mà không chặn event loop của server.
+
+    - eventlet: chạy trên native thread của eventlet.tpool, green thread gọi
+      nhường event loop cho các session khác tới khi có kết quả
+    - gevent: chạy trên threadpool của hub
+    - threading: mỗi request đã có thread riêng, gọi trực tiếp
+
+    fn chạy trên native thread nên không được emit Socket.IO trong đó. Lock
+    giữ trong lúc tổng hợp (ví dụ lock theo trang) chỉ được lấy bên trong fn:
+    green thread chờ một lock như vậy sẽ chặn cả event loop.
+    """
+    if _async_mode == 'eventlet':
+        from eventlet import tpool
+        return tpool.execute(fn, *args, **kwargs)
+    if _async_mode == 'gevent':
+        import gevent
+        return gevent.get_hub().threadpool.apply(fn, args, kwargs)
+    return fn(*args, **kwargs)
@@ -0,0 +1,185 @@
+import gc
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import Optional
+
+from offload import async_mode
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _stack(frame, root: str) -> str:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.append(root)
+    return ';'.join(reversed(stack))
+
+
+def _live_greenlets() -> list:
+    """Các greenlet đang tạm dừng (green thread của eventlet); greenlet đang chạy đã có trong frame của thread"""
+    try:
+        from greenlet import greenlet
+    except ImportError:
+        return []
+    return [obj for obj in gc.get_objects()
+            if isinstance(obj, greenlet) and not obj.dead and obj.gr_frame is not None]
+
+
+def _collapsed(weights: dict) -> str:
+    """Định dạng collapsed stack (mỗi dòng 'a;b;c weight'), dùng trực tiếp cho flamegraph.pl / speedscope"""
+    lines = [f"{stack} {int(weight)}" for stack, weight in sorted(weights.items(), key=lambda kv: -kv[1])]
+    return '\n'.join(lines) + ('\n' if lines else '')
+
+
+class SamplingProfiler:
+    """Profiler lấy mẫu stack của mọi thread trong process trong một khoảng thời gian giới hạn.
+
+    Chỉ có một thread lấy mẫu chạy khi đang profile; khi tắt không có hook hay
+    chi phí nào trên đường xử lý request. Kết quả là số mẫu theo collapsed stack,
+    mỗi stack bắt đầu bằng tên thread (request, Socket.IO handler, prefetch...).
+
+    Dưới eventlet, request và handler Socket.IO là green thread chạy chung
+    thread của hub, nên stack của các greenlet đang tạm dừng cũng được lấy
+    mẫu (gốc 'greenlet'); danh sách greenlet được quét lại mỗi GREENLET_RESCAN giây.
+    """
+
+    MAX_SECONDS = 120.0
+    GREENLET_RESCAN = 0.5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stop = threading.Event()
+        self._samples = defaultdict(int)
+        self.started_at = None
+        self.finished_at = None
+        self.duration = 0.0
+        self.interval = 0.0
+        self.sample_count = 0
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, seconds: float = 10.0, interval: float = 0.005) -> bool:
+        """Bắt đầu lấy mẫu trong `seconds` giây (tối đa MAX_SECONDS); False nếu đang chạy"""
+        with self._lock:
+            if self.is_running():
+                return False
+            self._samples = defaultdict(int)
+            self.sample_count = 0
+            self.duration = max(0.1, min(float(seconds), self.MAX_SECONDS))
+            self.interval = max(0.001, float(interval))
+            self.started_at = time.time()
+            self.finished_at = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self):
+        self._stop.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        deadline = time.monotonic() + self.duration
+        green = async_mode() == 'eventlet'
+        greenlets, scanned = [], 0.0
+        try:
+            while not self._stop.is_set() and time.monotonic() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id:
+                        continue
+                    self._samples[_stack(frame, names.get(thread_id, f"thread-{thread_id}"))] += 1
+                if green:
+                    if time.monotonic() - scanned > self.GREENLET_RESCAN:
+                        greenlets, scanned = _live_greenlets(), time.monotonic()
+                    for glet in greenlets:
+                        frame = glet.gr_frame
+                        if frame is not None:
+                            self._samples[_stack(frame, 'greenlet')] += 1
+                self.sample_count += 1
+                self._stop.wait(self.interval)
+        finally:
+            self.finished_at = time.time()
+
+    def status(self) -> dict:
+        return {
+            'running': self.is_running(),
+            'started_at': self.started_at,
+            'finished_at': self.finished_at,
+            'duration': self.duration,
+            'interval': self.interval,
+            'samples': self.sample_count,
+            'stacks': len(self._samples)
+        }
+
+    def collapsed(self) -> str:
+        """Báo cáo collapsed stack của lần profile gần nhất (trọng số = số mẫu)"""
+        return _collapsed(dict(self._samples))
+
+
+class CallTracer:
+    """Tracer xác định (sys.setprofile) cho một lời gọi trên thread hiện tại.
+
+    Ghi thời gian tự thân (self time, micro giây) theo collapsed stack để xem
+    một lần _emit_page tiêu thời gian vào đâu. Chỉ dùng khi được bật cho từng
+    session vì chi phí trace lớn hơn nhiều so với lấy mẫu.
+    """
+
+    def __init__(self):
+        self._stack = []
+        self._weights = defaultdict(float)
+        self.seconds = 0.0
+
+    def _profile(self, frame, event, arg):
+        now = time.perf_counter()
+        if event == 'call':
+            self._stack.append([_frame_label(frame), now, 0.0])
+        elif event == 'c_call':
+            self._stack.append([f"<builtin>:{getattr(arg, '__qualname__', repr(arg))}", now, 0.0])
+        elif event in ('return', 'c_return', 'c_exception'):
+            if not self._stack:
+                return
+            label, start, child = self._stack.pop()
+            elapsed = now - start
+            path = ';'.join([entry[0] for entry in self._stack] + [label])
+            self._weights[path] += (elapsed - child) * 1e6
+            if self._stack:
+                self._stack[-1][2] += elapsed
+
+    def run(self, fn, *args, **kwargs):
+        start = time.perf_counter()
+        sys.setprofile(self._profile)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            sys.setprofile(None)
+            self.seconds = time.perf_counter() - start
+
+    def collapsed(self) -> str:
+        return _collapsed(self._weights)
+
+
+_profiler: Optional[SamplingProfiler] = None
+_profiler_lock = threading.Lock()
+
+
+def get_profiler() -> SamplingProfiler:
+    """Profiler dùng chung cho process (mỗi worker tự profile chính nó)"""
+    global _profiler
+    with _profiler_lock:
+        if _profiler is None:
+            _profiler = SamplingProfiler()
+        return _profiler
@@ -0,0 +1,314 @@
+import os
+import sys
+import atexit
+import contextlib
+import itertools
+import queue
+import threading
+import multiprocessing as mp
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import List, Optional, Tuple
+
+from cancellation import CancellationToken
+
+_spawn_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def _main_module_replaced():
+    """Thay __main__ bằng module này trong lúc start worker.
+
+    Process 'spawn' nạp lại module __main__ của process cha; với `python
+    app.py` là tạo lại Flask app, session store và mở file SQLite trong mỗi
+    worker. Module này không có side effect khi import.
+    """
+    with _spawn_lock:
+        main = sys.modules.get('__main__')
+        sys.modules['__main__'] = sys.modules[__name__]
+        try:
+            yield
+        finally:
+            sys.modules['__main__'] = main
+
+
+def _worker_main(worker_index: int, conn):
+    """Vòng lặp của một worker process: giữ một driver pyttsx3 sống suốt đời process.
+
+    Job và kết quả đi qua Pipe riêng của worker: kill worker này (job bị hủy)
+    không làm hỏng kênh của các worker khác.
+    """
+    engine = None
+    init_error = None
+    try:
+        import pyttsx3
+        engine = pyttsx3.init()
+    except Exception as e:
+        init_error = f"pyttsx3 init failed: {e}"
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            break
+        if job is None:
+            break
+
+        # text/output_path là list với job batch: mọi trang cùng giọng, một lần runAndWait
+        text, voice_config, output_path = job
+        batch = isinstance(text, list)
+        items = list(zip(text, output_path)) if batch else [(text, output_path)]
+        failed = [False] * len(items) if batch else False
+
+        if engine is None:
+            conn.send((failed, init_error))
+            continue
+
+        try:
+            voice_config = voice_config or {}
+            if voice_config.get('voice_id'):
+                engine.setProperty('voice', voice_config['voice_id'])
+            if 'rate' in voice_config:
+                engine.setProperty('rate', voice_config['rate'])
+            if 'volume' in voice_config:
+                engine.setProperty('volume', voice_config['volume'])
+
+            for item_text, item_path in items:
+                engine.save_to_file(item_text, item_path)
+            engine.runAndWait()
+
+            created = [os.path.exists(item_path) for _, item_path in items]
+            missing = [item_path for (_, item_path), ok in zip(items, created) if not ok]
+            error = f"output not created: {', '.join(missing)}" if missing else None
+            conn.send((created if batch else created[0], error))
+        except Exception as e:
+            conn.send((failed, str(e)))
+
+
+class Pyttsx3WorkerPool:
+    """Pool các process riêng, mỗi process giữ một driver pyttsx3 đã khởi tạo.
+
+    pyttsx3 không thread-safe và runAndWait chặn event loop của server, nên mọi
+    lệnh save_to_file đều được gửi sang worker process.
+
+    Mỗi worker có một Pipe riêng và một thread điều phối lấy job từ hàng đợi
+    chung của pool. runAndWait không dừng được giữa chừng: job bị hủy khi đang
+    chạy sẽ kill worker, Pipe của nó bị bỏ cùng process và thread điều phối
+    khởi động worker mới thay chỗ; job bị hủy khi còn trong hàng đợi được bỏ
+    qua trước khi gửi đi.
+    """
+
+    def __init__(self, num_workers: int = 2, timeout: float = 120.0):
+        self.num_workers = max(1, num_workers)
+        self.timeout = timeout
+        self._ctx = mp.get_context('spawn')
+        self._jobs = queue.Queue()
+        self._workers = []
+        self._threads = []
+        self._pending = {}
+        self._running = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._closed = False
+        self.cancellations = 0
+
+    def start(self):
+        """Khởi động các worker process và thread điều phối của từng worker"""
+        with self._lock:
+            if self._workers:
+                return
+            self._workers = [None] * self.num_workers
+            self._threads = [threading.Thread(target=self._serve, args=(i,), daemon=True)
+                             for i in range(self.num_workers)]
+        for thread in self._threads:
+            thread.start()
+        print(f"✅ pyttsx3 worker pool started ({self.num_workers} workers)")
+
+    def _spawn_worker(self, index: int):
+        parent_conn, child_conn = self._ctx.Pipe()
+        proc = self._ctx.Process(target=_worker_main, args=(index, child_conn), daemon=True)
+        with _main_module_replaced():
+            proc.start()
+        # Đầu pipe của worker chỉ thuộc về process con
+        child_conn.close()
+        with self._lock:
+            self._workers[index] = proc
+        return proc, parent_conn
+
+    @staticmethod
+    def _discard_worker(proc, conn):
+        conn.close()
+        if proc.is_alive():
+            proc.terminate()
+        proc.join(timeout=2)
+
+    def submit(self, text, voice_config: Optional[dict], output_path) -> Future:
+        """Gửi một job (text, voice config, output path), trả về Future[bool] (có thuộc tính job_id).
+
+        text và output_path là hai list cùng độ dài cho job batch, khi đó Future trả về list[bool].
+        """
+        if not self._workers:
+            self.start()
+
+        future = Future()
+        job_id = next(self._ids)
+        future.job_id = job_id
+        with self._lock:
+            if self._closed:
+                future.set_result(False)
+                return future
+            self._pending[job_id] = future
+        if isinstance(output_path, list):
+            output_path = [os.path.abspath(path) for path in output_path]
+        else:
+            output_path = os.path.abspath(output_path)
+        self._jobs.put((job_id, (text, dict(voice_config or {}), output_path)))
+        return future
+
+    def synthesize(self, text: str, voice_config: Optional[dict], output_path: str,
+                   timeout: Optional[float] = None, cancel: Optional[CancellationToken] = None) -> bool:
+        """Tạo file audio qua pool và chờ kết quả (dừng sớm khi token bị hủy)"""
+        if cancel is not None and cancel.cancelled:
+            return False
+        future = self.submit(text, voice_config, output_path)
+        return bool(self._wait(future, timeout or self.timeout, cancel))
+
+    def synthesize_many(self, items: List[Tuple[str, str]], voice_config: Optional[dict],
+                        timeout: Optional[float] = None,
+                        cancel: Optional[CancellationToken] = None) -> List[bool]:
+        """Tạo nhiều file [(text, output_path)] cùng giọng trong một lần runAndWait của một worker.
+
+        Trả về kết quả theo từng mục; cả batch thất bại nếu worker lỗi hoặc job bị hủy.
+        """
+        if not items or (cancel is not None and cancel.cancelled):
+            return [False] * len(items)
+        future = self.submit([text for text, _ in items], voice_config, [path for _, path in items])
+        result = self._wait(future, timeout or self.timeout * len(items), cancel)
+        return result if isinstance(result, list) else [False] * len(items)
+
+    def _wait(self, future: Future, timeout: float, cancel: Optional[CancellationToken]):
+        try:
+            if cancel is None:
+                return future.result(timeout=timeout)
+            remaining = timeout
+            while True:
+                if cancel.cancelled:
+                    self.cancel(future.job_id)
+                    return False
+                try:
+                    return future.result(timeout=min(remaining, 0.05))
+                except FutureTimeout:
+                    remaining -= 0.05
+                    if remaining <= 0:
+                        raise
+        except Exception as e:
+            print(f"❌ pyttsx3 worker job failed: {e}")
+            return False
+
+    def cancel(self, job_id: int):
+        """Hủy một job: bỏ qua nếu còn trong hàng đợi, kill worker nếu đang chạy"""
+        with self._lock:
+            future = self._pending.pop(job_id, None)
+            if future is None:
+                return
+            self.cancellations += 1
+            running_index = next((i for i, running in self._running.items() if running == job_id), None)
+            proc = self._workers[running_index] if running_index is not None else None
+        if proc is not None and proc.is_alive():
+            # Pipe của worker này không dùng chung với ai: thread điều phối bỏ nó và thay worker mới
+            proc.terminate()
+        future.set_result(False)
+
+    def _serve(self, index: int):
+        """Thread điều phối của một worker: gửi job qua Pipe riêng, nhận kết quả, thay worker đã chết"""
+        proc, conn = self._spawn_worker(index)
+        while True:
+            job = self._jobs.get()
+            if job is None or self._closed:
+                break
+            job_id, payload = job
+            with self._lock:
+                if job_id not in self._pending:
+                    continue
+                self._running[index] = job_id
+            if not proc.is_alive():
+                self._discard_worker(proc, conn)
+                proc, conn = self._spawn_worker(index)
+
+            result = self._run_job(proc, conn, payload)
+            with self._lock:
+                self._running.pop(index, None)
+                future = self._pending.pop(job_id, None)
+
+            if result is None:
+                # Worker bị kill (job bị hủy) hoặc tự chết giữa chừng
+                if future is not None:
+                    print(f"⚠️ pyttsx3 worker {index} died (exit code {proc.exitcode}), restarting")
+                self._discard_worker(proc, conn)
+                if self._closed:
+                    break
+                proc, conn = self._spawn_worker(index)
+
+            if future is None:
+                continue
+            ok, error = result if result is not None else (False, None)
+            if error:
+                print(f"❌ pyttsx3 worker error: {error}")
+            future.set_result(ok if isinstance(ok, list) else bool(ok))
+
+        try:
+            conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self._discard_worker(proc, conn)
+
+    @staticmethod
+    def _run_job(proc, conn, payload):
+        """(ok, error) từ worker, None nếu worker chết trước khi trả lời"""
+        try:
+            conn.send(payload)
+            while not conn.poll(0.2):
+                if not proc.is_alive():
+                    return None
+            return conn.recv()
+        except (EOFError, OSError):
+            return None
+
+    def shutdown(self):
+        """Dừng tất cả worker"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            pending = list(self._pending.values())
+            self._pending.clear()
+        for future in pending:
+            future.set_result(False)
+        # Mỗi thread điều phối nhận một lệnh dừng, gửi tiếp cho worker của nó qua Pipe
+        for _ in self._threads:
+            self._jobs.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._workers = []
+
+
+_shared_pool = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_pool() -> Optional[Pyttsx3WorkerPool]:
+    """Pool dùng chung cho toàn process.
+
+    Số worker đặt qua biến môi trường APP_PYTTSX3_WORKERS (0 = chạy pyttsx3
+    trực tiếp trên thread hiện tại như trước).
+    """
+    global _shared_pool
+    with _shared_lock:
+        if _shared_pool is None:
+            default_workers = min(2, os.cpu_count() or 1)
+            num_workers = int(os.environ.get('APP_PYTTSX3_WORKERS', default_workers))
+            if num_workers <= 0:
+                return None
+            _shared_pool = Pyttsx3WorkerPool(num_workers=num_workers)
+            _shared_pool.start()
+            atexit.register(_shared_pool.shutdown)
+        return _shared_pool
@@ -0,0 +1,228 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Optional
+
+
+class CircuitOpenError(Exception):
+    """Remote đang được coi là không ổn định, request bị từ chối ngay"""
+
+
+class LatencyTracker:
+    """Lưu độ trễ các request thành công gần nhất để tính ngưỡng hedge theo percentile"""
+
+    def __init__(self, window: int = 200, min_samples: int = 20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Giá trị percentile `pct` (None nếu chưa đủ mẫu)"""
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100.0))
+        return ordered[index]
+
+
+class RetryBudget:
+    """Ngân sách retry toàn cục: mỗi request thành công nạp `ratio` token, mỗi retry/hedge tốn 1 token.
+
+    Khi remote lỗi hàng loạt, số request phát sinh thêm bị chặn ở khoảng
+    `ratio` lần lưu lượng bình thường thay vì nhân lên theo số lần retry.
+    """
+
+    def __init__(self, ratio: float = 0.2, max_tokens: float = 20.0, initial_tokens: float = 10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self._tokens = min(initial_tokens, max_tokens)
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        with self._lock:
+            self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_withdraw(self) -> bool:
+        with self._lock:
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return True
+            return False
+
+    @property
+    def tokens(self) -> float:
+        return self._tokens
+
+
+class CircuitBreaker:
+    """Circuit breaker: mở sau `failure_threshold` lỗi liên tiếp, thử lại một request sau `cooldown` giây"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, cooldown: float = 10.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = self.HALF_OPEN
+                self._probe_in_flight = False
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    print(f"⚠️ Circuit opened after {self._failures} failures")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class ResilientFetcher:
+    """Gọi remote với hedging theo percentile, retry có jitter trong ngân sách chung và circuit breaker.
+
+    - timed_by_caller=True: fn tự báo độ trễ qua record_latency (ví dụ chỉ
+      tính thời gian sau khi có kết nối), thay vì đo cả lời gọi fn
+    - can_hedge: không gửi request dự phòng khi hàm này trả về False (ví dụ
+      pool kết nối đã hết slot, request dự phòng chỉ xếp hàng thêm tải)
+    """
+
+    def __init__(self, hedge_percentile: float = 95.0, default_hedge_delay: float = 1.0,
+                 min_hedge_delay: float = 0.05, max_retries: int = 2, base_backoff: float = 0.1,
+                 max_backoff: float = 2.0, budget: Optional[RetryBudget] = None,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = 16,
+                 timed_by_caller: bool = False, can_hedge: Optional[Callable[[], bool]] = None):
+        self.hedge_percentile = hedge_percentile
+        self.default_hedge_delay = default_hedge_delay
+        self.min_hedge_delay = min_hedge_delay
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.latency = LatencyTracker()
+        self.budget = budget or RetryBudget()
+        self.breaker = breaker or CircuitBreaker()
+        self.timed_by_caller = timed_by_caller
+        self.can_hedge = can_hedge
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='hedge')
+        # stats được cập nhật từ nhiều thread gọi call() cùng lúc
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'hedges': 0, 'hedge_wins': 0, 'hedges_skipped': 0, 'retries': 0,
+                      'failures': 0, 'rejected': 0}
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self.stats)
+
+    def hedge_delay(self) -> float:
+        """Thời gian chờ trước khi gửi request dự phòng"""
+        threshold = self.latency.percentile(self.hedge_percentile)
+        if threshold is None:
+            return self.default_hedge_delay
+        return max(self.min_hedge_delay, threshold)
+
+    def record_latency(self, seconds: float):
+        """Độ trễ một request thành công (fn gọi khi timed_by_caller)"""
+        self.latency.record(seconds)
+
+    def _timed(self, fn: Callable, *args):
+        if self.timed_by_caller:
+            return fn(*args)
+        start = time.monotonic()
+        result = fn(*args)
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    def _hedged_attempt(self, fn: Callable, *args):
+        """Một lần thử: request chính, thêm request dự phòng nếu quá ngưỡng; lấy kết quả về trước"""
+        primary = self._executor.submit(self._timed, fn, *args)
+        done, _ = wait([primary], timeout=self.hedge_delay())
+        if done:
+            return primary.result()
+
+        if self.can_hedge is not None and not self.can_hedge():
+            self._count('hedges_skipped')
+            return primary.result()
+
+        futures = [primary]
+        if self.budget.try_withdraw():
+            self._count('hedges')
+            futures.append(self._executor.submit(self._timed, fn, *args))
+
+        last_error = None
+        pending = set(futures)
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if future is not primary:
+                    self._count('hedge_wins')
+                for other in pending:
+                    other.cancel()
+                return result
+        raise last_error
+
+    def call(self, fn: Callable, *args):
+        """Gọi fn(*args); ném CircuitOpenError nếu circuit đang mở, hoặc lỗi cuối cùng"""
+        self._count('calls')
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            if attempt > 0:
+                if not self.budget.try_withdraw():
+                    break
+                self._count('retries')
+                backoff = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+                time.sleep(random.uniform(0, backoff))
+
+            if not self.breaker.allow():
+                self._count('rejected')
+                raise CircuitOpenError("remote unhealthy, failing fast")
+
+            try:
+                result = self._hedged_attempt(fn, *args)
+            except Exception as e:
+                last_error = e
+                self.breaker.record_failure()
+                continue
+
+            self.breaker.record_success()
+            self.budget.deposit()
+            return result
+
+        self._count('failures')
+        raise last_error or CircuitOpenError("retry budget exhausted")
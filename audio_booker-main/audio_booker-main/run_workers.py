@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Chạy nhiều worker app.py dùng chung trạng thái session và message queue Socket.IO.
+
+    python run_workers.py --workers 4 --base-port 5001
+
+Mỗi worker nghe một cổng riêng (base-port, base-port + 1, ...); đặt một load
+balancer phía trước với sticky session (Socket.IO long-polling cần mọi request
+của một client về cùng worker). Mặc định trạng thái session và message queue
+là hai file SQLite trong cache/ (các worker phải chạy trên cùng máy); có thể
+trỏ APP_MESSAGE_QUEUE tới redis:// khi đã cài redis.
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run several app.py workers behind a load balancer')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--base-port', type=int, default=int(os.environ.get('APP_PORT', '5001')))
+    parser.add_argument('--session-store', default=os.environ.get('APP_SESSION_STORE') or
+                        f"sqlite:///{os.path.join(os.getcwd(), 'cache', 'sessions.db')}")
+    parser.add_argument('--message-queue', default=os.environ.get('APP_MESSAGE_QUEUE') or
+                        f"sqlite:///{os.path.join(os.getcwd(), 'cache', 'socketio_queue.db')}")
+    args = parser.parse_args()
+
+    app_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'app.py')
+
+    def spawn(i: int) -> subprocess.Popen:
+        env = dict(os.environ)
+        env['APP_PORT'] = str(args.base_port + i)
+        env['APP_SESSION_STORE'] = args.session_store
+        env['APP_MESSAGE_QUEUE'] = args.message_queue
+        # Số process cùng chia CPU, để mỗi worker chỉ dùng phần core của nó (thread torch)
+        env['APP_WORKERS'] = str(max(1, args.workers))
+        proc = subprocess.Popen([sys.executable, app_path], env=env)
+        print(f"✅ Worker {i} on http://localhost:{args.base_port + i} (pid {proc.pid})")
+        return proc
+
+    processes = [spawn(i) for i in range(max(1, args.workers))]
+
+    def stop(*_):
+        for proc in processes:
+            if proc.poll() is None:
+                proc.terminate()
+        for proc in processes:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        while True:
+            for i, proc in enumerate(processes):
+                if proc.poll() is not None:
+                    # Sessions live in the shared store, so a replacement worker picks them up
+                    print(f"⚠️ Worker {i} exited with code {proc.returncode}, restarting")
+                    processes[i] = spawn(i)
+            time.sleep(1)
+    except KeyboardInterrupt:
+        stop()
+
+
+if __name__ == "__main__":
+    main()
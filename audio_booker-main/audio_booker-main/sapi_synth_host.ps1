@@ -0,0 +1,42 @@
+# Host System.Speech chạy lâu dài cho PersistentSubprocessTTSEngine / VietnameseTTSEngine.
+# Nạp System.Speech một lần, đọc request dạng dòng JSON từ stdin, ghi WAV, trả kết quả ra stdout.
+#
+#   powershell -NoProfile -ExecutionPolicy Bypass -File sapi_synth_host.ps1 -Voice "Microsoft An"
+param([string]$Voice = "")
+
+[Console]::InputEncoding = New-Object System.Text.UTF8Encoding $false
+[Console]::OutputEncoding = New-Object System.Text.UTF8Encoding $false
+
+Add-Type -AssemblyName System.Speech
+$speak = New-Object System.Speech.Synthesis.SpeechSynthesizer
+if ($Voice) {
+    try { $speak.SelectVoice($Voice) } catch { }
+}
+
+[Console]::Out.WriteLine('{"ready": true}')
+[Console]::Out.Flush()
+
+while ($true) {
+    $line = [Console]::In.ReadLine()
+    if ($line -eq $null) { break }
+    if ($line.Trim() -eq "") { continue }
+
+    $id = $null
+    try {
+        $request = $line | ConvertFrom-Json
+        $id = $request.id
+        if ($request.voice -and $request.voice.name) { $speak.SelectVoice([string]$request.voice.name) }
+        if ($request.voice -and $request.voice.rate -ne $null) { $speak.Rate = [int]$request.voice.rate }
+        $speak.SetOutputToWaveFile([string]$request.output)
+        $speak.Speak([string]$request.text)
+        $speak.SetOutputToNull()
+        $reply = @{ id = $id; ok = $true }
+    } catch {
+        try { $speak.SetOutputToNull() } catch { }
+        $reply = @{ id = $id; ok = $false; error = $_.Exception.Message }
+    }
+    [Console]::Out.WriteLine(($reply | ConvertTo-Json -Compress))
+    [Console]::Out.Flush()
+}
+
+$speak.Dispose()
@@ -0,0 +1,333 @@
+import os
+import re
+import hashlib
+import threading
+import time
+import unicodedata
+import uuid
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+from audio_utils import probe_duration
+from audio_writer import AudioConcatWriter
+from cancellation import CancellationToken, is_cancelled
+
+
+# Thread pool dùng chung để tạo song song các câu của một trang (giới hạn số câu chạy cùng lúc)
+_sentence_executor = None
+_sentence_executor_size = 0
+_sentence_executor_lock = threading.Lock()
+
+
+def _get_sentence_executor(max_workers: int) -> ThreadPoolExecutor:
+    global _sentence_executor, _sentence_executor_size
+    with _sentence_executor_lock:
+        if _sentence_executor is None or max_workers > _sentence_executor_size:
+            old = _sentence_executor
+            _sentence_executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sentence')
+            _sentence_executor_size = max_workers
+            if old is not None:
+                old.shutdown(wait=False)
+        return _sentence_executor
+
+
+def split_sentences(text: str) -> List[str]:
+    """Tách text thành các câu, giữ dấu kết câu"""
+    sentences = re.findall(r'[^.!?]+[.!?]*', text)
+    return [s.strip() for s in sentences if s.strip()]
+
+
+def normalize_sentence(sentence: str) -> str:
+    """Chuẩn hóa câu để làm khóa cache (Unicode NFC, gộp khoảng trắng)"""
+    sentence = unicodedata.normalize('NFC', sentence)
+    sentence = re.sub(r'\s+', ' ', sentence)
+    return sentence.strip()
+
+
+def voice_key(tts, dialect: str) -> str:
+    """Định danh cấu hình giọng của engine cho một vùng miền.
+
+    Engine tự định nghĩa voice_key(dialect) khi giọng thật không suy ra được từ
+    voices (ví dụ trang HybridTTSEngine gồm engine con router đã chọn).
+    """
+    if hasattr(tts, 'voice_key'):
+        return tts.voice_key(dialect)
+    voices = getattr(tts, 'voices', None) or {}
+    config = voices.get(dialect) if isinstance(voices, dict) else None
+    return f"{type(tts).__name__}|{dialect}|{sorted(config.items()) if isinstance(config, dict) else ''}"
+
+
+class SentenceAudioCache:
+    """Cache audio theo câu, khóa bằng câu đã chuẩn hóa + cấu hình giọng.
+
+    Một trang được ghép từ các clip câu đã có; chỉ các câu còn thiếu mới phải
+    tạo audio. Nhờ vậy phân trang khác nhau hay sách gần giống nhau vẫn tái sử
+    dụng được phần lớn audio đã tạo.
+
+    Clip đang được ghép vào một trang được ghim (đếm tham chiếu) để việc dọn
+    cache ở thread khác không xóa mất nó giữa lúc tra cache và lúc ghép.
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int = 500 * 1024 * 1024,
+                 on_engine_run: Optional[Callable[[float, float], None]] = None, gap_ms: int = 250):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Khoảng lặng chèn giữa hai câu khi ghép (clip câu bị cắt sát, thiếu nhịp ngắt của engine)
+        self.gap_seconds = max(gap_ms, 0) / 1000.0
+        # Gọi với (giây engine chạy, giây audio tạo ra) sau mỗi lần tạo câu còn thiếu
+        self.on_engine_run = on_engine_run
+        self.hits = 0
+        self.misses = 0
+        self._pinned = Counter()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(
+            os.path.getsize(os.path.join(cache_dir, name))
+            for name in os.listdir(cache_dir)
+            if not name.startswith('tmp_')
+        )
+
+    def _key(self, sentence: str, voice: str, audio_ext: str) -> str:
+        raw = f"{voice}\n{normalize_sentence(sentence)}".encode('utf-8')
+        return f"{hashlib.sha1(raw).hexdigest()}.{audio_ext}"
+
+    def get(self, sentence: str, voice: str, audio_ext: str, pin: bool = False) -> Optional[str]:
+        """Đường dẫn clip đã cache (None nếu chưa có); pin=True giữ clip tới khi release(path)"""
+        path = os.path.join(self.cache_dir, self._key(sentence, voice, audio_ext))
+        with self._lock:
+            if not os.path.exists(path):
+                return None
+            try:
+                os.utime(path)  # cập nhật thời điểm dùng cho LRU
+            except OSError:
+                pass
+            if pin:
+                self._pinned[path] += 1
+        return path
+
+    def release(self, path: str):
+        """Bỏ ghim một clip đã lấy với pin=True"""
+        with self._lock:
+            self._pinned[path] -= 1
+            if self._pinned[path] <= 0:
+                del self._pinned[path]
+
+    def _count(self, hit: bool, n: int = 1):
+        with self._lock:
+            if hit:
+                self.hits += n
+            else:
+                self.misses += n
+
+    def synthesize_sentence(self, tts, sentence: str, dialect: str, audio_ext: str,
+                            cancel: Optional[CancellationToken] = None, count: bool = True,
+                            meter: bool = True) -> Optional[str]:
+        """Lấy clip của một câu, tạo mới nếu chưa có trong cache.
+
+        meter=False khi câu chạy song song với các câu khác (thời gian chờ slot
+        engine không phản ánh tốc độ engine) nên không báo cho on_engine_run.
+        Clip trả về đã được ghim: người gọi release(path) sau khi dùng xong.
+        """
+        voice = voice_key(tts, dialect)
+        cached = self.get(sentence, voice, audio_ext, pin=True)
+        if cached:
+            if count:
+                self._count(True)
+            return cached
+
+        if count:
+            self._count(False)
+        final_path = os.path.join(self.cache_dir, self._key(sentence, voice, audio_ext))
+        tmp_path = os.path.join(self.cache_dir, f"tmp_{uuid.uuid4().hex}.{audio_ext}")
+        try:
+            started = time.monotonic()
+            if not tts.generate_audio(sentence, tmp_path, dialect=dialect, cancel=cancel) or not os.path.exists(tmp_path):
+                return None
+            if meter:
+                self._report(time.monotonic() - started, [tmp_path])
+            self._store(tmp_path, final_path, pin=True)
+        finally:
+            self._discard(tmp_path)
+        return final_path
+
+    def _prefill(self, tts, sentences: List[str], dialect: str, audio_ext: str,
+                 cancel: Optional[CancellationToken] = None):
+        """Tạo mọi câu còn thiếu trong một lần tts.generate_many (một chu kỳ driver cho cả batch)"""
+        voice = voice_key(tts, dialect)
+        missing = {}
+        for sentence in sentences:
+            key = self._key(sentence, voice, audio_ext)
+            if key in missing or self.get(sentence, voice, audio_ext):
+                self._count(True)
+                continue
+            self._count(False)
+            missing[key] = (sentence, os.path.join(self.cache_dir, f"tmp_{uuid.uuid4().hex}.{audio_ext}"))
+        if not missing:
+            return
+
+        jobs = list(missing.items())
+        try:
+            started = time.monotonic()
+            results = tts.generate_many([(sentence, tmp_path, dialect) for _, (sentence, tmp_path) in jobs],
+                                        cancel=cancel)
+            if not is_cancelled(cancel):
+                self._report(time.monotonic() - started,
+                             [tmp_path for (_, (_, tmp_path)), ok in zip(jobs, results) if ok])
+            for (key, (_, tmp_path)), ok in zip(jobs, results):
+                if ok and os.path.exists(tmp_path):
+                    self._store(tmp_path, os.path.join(self.cache_dir, key))
+        finally:
+            for _, (_, tmp_path) in jobs:
+                self._discard(tmp_path)
+
+    def synthesize_page(self, tts, text: str, output_path: str, dialect: str, audio_ext: str,
+                        cancel: Optional[CancellationToken] = None, parallel: int = 1) -> bool:
+        """Tạo audio cho cả trang bằng cách ghép clip từng câu (dừng ở câu kế tiếp nếu bị hủy)"""
+        return self.synthesize_pages(tts, [(text, output_path)], dialect, audio_ext, cancel, parallel)[0]
+
+    def synthesize_pages(self, tts, pages: List[Tuple[str, str]], dialect: str, audio_ext: str,
+                         cancel: Optional[CancellationToken] = None, parallel: int = 1) -> List[bool]:
+        """Tạo audio cho nhiều trang [(text, output_path)], kết quả theo từng trang.
+
+        - parallel > 1: tối đa `parallel` câu của trang được tạo đồng thời trên
+          các worker của engine, ghép theo đúng thứ tự; độ trễ một trang gần
+          bằng câu dài nhất thay vì tổng các câu
+        - ngược lại, engine có generate_many (pyttsx3, Google) tạo mọi câu còn thiếu của
+          cả nhóm trang trong một batch trước, rồi từng trang được ghép từ cache
+        - engine có for_page (HybridTTSEngine) chọn engine con một lần cho mỗi
+          trang, mọi câu của trang dùng engine đó
+        """
+        sentences = [split_sentences(text) for text, _ in pages]
+        batched = parallel <= 1 and hasattr(tts, 'generate_many')
+        if batched and not is_cancelled(cancel):
+            self._prefill(tts, [s for page in sentences for s in page], dialect, audio_ext, cancel)
+        engines = [tts.for_page(text) if hasattr(tts, 'for_page') else tts for text, _ in pages]
+        return [self._stitch(engine, page, output_path, dialect, audio_ext, cancel, not batched, parallel)
+                for engine, page, (_, output_path) in zip(engines, sentences, pages)]
+
+    def _clips(self, tts, sentences: List[str], dialect: str, audio_ext: str,
+               cancel: Optional[CancellationToken], count: bool, parallel: int):
+        """Clip của từng câu theo thứ tự trong trang (None nếu câu đó thất bại).
+
+        Các clip được ghim tới khi generator đóng, tức là sau khi trang đã ghép xong.
+        """
+        if parallel <= 1:
+            pinned = []
+            try:
+                for sentence in sentences:
+                    if is_cancelled(cancel):
+                        yield None
+                        return
+                    clip = self.synthesize_sentence(tts, sentence, dialect, audio_ext, cancel, count)
+                    if clip:
+                        pinned.append(clip)
+                    yield clip
+            finally:
+                for clip in pinned:
+                    self.release(clip)
+            return
+
+        executor = _get_sentence_executor(parallel)
+        futures = {}
+        ordered = []
+        for sentence in sentences:
+            # Câu lặp lại trong trang chỉ tạo một lần
+            key = normalize_sentence(sentence)
+            if key not in futures:
+                futures[key] = executor.submit(self.synthesize_sentence, tts, sentence, dialect, audio_ext,
+                                               cancel, count, False)
+            ordered.append(futures[key])
+        try:
+            for future in ordered:
+                yield future.result()
+        finally:
+            # Mỗi future ghim clip của nó một lần: bỏ ghim khi nó xong (ngay nếu đã xong, bỏ qua nếu đã hủy)
+            for future in futures.values():
+                if not future.cancel():
+                    future.add_done_callback(self._release_result)
+
+    def _release_result(self, future):
+        try:
+            clip = future.result()
+        except Exception:
+            return
+        if clip:
+            self.release(clip)
+
+    def _stitch(self, tts, sentences: List[str], output_path: str, dialect: str, audio_ext: str,
+                cancel: Optional[CancellationToken], count: bool, parallel: int = 1) -> bool:
+        if not sentences:
+            return False
+
+        # Ghi nối từng clip xuống file trang ngay khi có, không chờ đủ cả trang
+        writer = AudioConcatWriter(output_path, audio_ext)
+        clips = self._clips(tts, sentences, dialect, audio_ext, cancel, count, parallel)
+        try:
+            for clip in clips:
+                if not clip or is_cancelled(cancel):
+                    writer.abort()
+                    return False
+                if writer.segments:
+                    writer.append_silence(self.gap_seconds)
+                writer.append_file(clip)
+            writer.close()
+        except Exception as e:
+            print(f"❌ Error stitching sentence clips: {e}")
+            writer.abort()
+            return False
+        finally:
+            clips.close()
+        return os.path.exists(output_path)
+
+    def _report(self, seconds: float, paths: List[str]):
+        if self.on_engine_run is None:
+            return
+        audio_seconds = sum(probe_duration(path) for path in paths if os.path.exists(path))
+        self.on_engine_run(seconds, audio_seconds)
+
+    def _store(self, tmp_path: str, final_path: str, pin: bool = False):
+        with self._lock:
+            # Thread khác có thể vừa lưu cùng câu: chỉ tính phần chênh lệch
+            previous = os.path.getsize(final_path) if os.path.exists(final_path) else 0
+            os.replace(tmp_path, final_path)
+            self._total_bytes += os.path.getsize(final_path) - previous
+            if pin:
+                self._pinned[final_path] += 1
+        self._evict_if_needed()
+
+    @staticmethod
+    def _discard(path: str):
+        if os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _evict_if_needed(self):
+        """Xóa các clip dùng lâu nhất khi cache vượt quá max_bytes"""
+        with self._lock:
+            if self._total_bytes <= self.max_bytes:
+                return
+            entries = []
+            for name in os.listdir(self.cache_dir):
+                if name.startswith('tmp_'):
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            entries.sort()
+            target = int(self.max_bytes * 0.9)
+            for _, size, path in entries:
+                if self._total_bytes <= target:
+                    break
+                if path in self._pinned:
+                    continue
+                try:
+                    os.remove(path)
+                    self._total_bytes -= size
+                except OSError:
+                    pass
@@ -0,0 +1,184 @@
+import os
+import copy
+import pickle
+import sqlite3
+import threading
+import weakref
+from array import array
+from typing import Callable, List, Optional
+
+from book_store import Book, BookStore, pack_pages
+
+
+class MemorySessionStore:
+    """Trạng thái session trong bộ nhớ của process (chạy một worker).
+
+    - Metadata (dialect, trang hiện tại, các trang đã tạo...) đọc/ghi qua get/update
+    - Nội dung sách không đổi, lưu một lần trong BookStore và dùng chung giữa
+      các session đọc cùng sách; metadata chỉ giữ book_id
+    """
+
+    def __init__(self):
+        self._data = {}
+        self.books = BookStore()
+        self._lock = threading.Lock()
+
+    def create(self, session_id: str, data: dict, pages: List[str]):
+        book = self.books.acquire(pages)
+        data = copy.deepcopy(data)
+        data['book_id'] = book.book_id
+        with self._lock:
+            self._data[session_id] = data
+
+    def get(self, session_id: str) -> Optional[dict]:
+        """Bản sao metadata của session (None nếu không tồn tại)"""
+        with self._lock:
+            data = self._data.get(session_id)
+            return copy.deepcopy(data) if data is not None else None
+
+    def pages(self, session_id: str) -> Optional[Book]:
+        with self._lock:
+            data = self._data.get(session_id)
+        return self.books.get(data['book_id']) if data is not None else None
+
+    def update(self, session_id: str, fn: Callable[[dict], object]) -> Optional[dict]:
+        """Sửa metadata một cách nguyên tử: fn nhận dict và sửa tại chỗ.
+
+        Trả về bản sao metadata sau khi sửa, None nếu session không tồn tại.
+        """
+        with self._lock:
+            data = self._data.get(session_id)
+            if data is None:
+                return None
+            fn(data)
+            return copy.deepcopy(data)
+
+    def delete(self, session_id: str) -> Optional[dict]:
+        with self._lock:
+            data = self._data.pop(session_id, None)
+        if data is not None:
+            self.books.release(data['book_id'])
+        return data
+
+    def __contains__(self, session_id) -> bool:
+        with self._lock:
+            return session_id in self._data
+
+
+class SqliteSessionStore:
+    """Trạng thái session dùng chung giữa nhiều worker process qua một file SQLite.
+
+    Mọi worker trên cùng máy (cùng thư mục static/audio) đọc/ghi chung, nên
+    worker nào cũng phục vụ được page_finished của bất kỳ session nào.
+    update() chạy trong transaction IMMEDIATE nên không mất cập nhật khi hai
+    worker sửa cùng lúc. Metadata được pickle để giữ nguyên khóa int của các trang.
+
+    Mỗi cuốn sách chỉ lưu một dòng (text + offset trang) với số session đang
+    đọc; worker giữ Book trong bộ nhớ khi còn session của nó dùng tới.
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0):
+        self.path = path
+        self.timeout = timeout
+        self._books = weakref.WeakValueDictionary()
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS books ("
+                         "id TEXT PRIMARY KEY, text TEXT NOT NULL, offsets BLOB NOT NULL, refs INTEGER NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        # Mỗi thread một kết nối (sqlite3 không cho dùng chung giữa các thread)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def create(self, session_id: str, data: dict, pages: List[str]):
+        book_id, text, offsets = pack_pages(pages)
+        data = dict(data, book_id=book_id)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("INSERT OR IGNORE INTO books (id, text, offsets, refs) VALUES (?, ?, ?, 0)",
+                         (book_id, text, offsets.tobytes()))
+            conn.execute("UPDATE books SET refs = refs + 1 WHERE id = ?", (book_id,))
+            conn.execute("INSERT INTO sessions (id, data) VALUES (?, ?)",
+                         (session_id, pickle.dumps(data)))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, session_id: str) -> Optional[dict]:
+        row = self._connect().execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return pickle.loads(row[0]) if row else None
+
+    def pages(self, session_id: str) -> Optional[Book]:
+        """Sách của session; đọc từ SQLite một lần rồi dùng chung trong worker.
+
+        Người gọi phải giữ tham chiếu tới Book (ví dụ trong runtime của session),
+        cache chỉ giữ tham chiếu yếu để sách được giải phóng cùng session cuối.
+        """
+        data = self.get(session_id)
+        if data is None:
+            return None
+        book_id = data['book_id']
+        book = self._books.get(book_id)
+        if book is None:
+            row = self._connect().execute("SELECT text, offsets FROM books WHERE id = ?", (book_id,)).fetchone()
+            if not row:
+                return None
+            book = Book(book_id, row[0], array('I', row[1]))
+            self._books[book_id] = book
+        return book
+
+    def update(self, session_id: str, fn: Callable[[dict], object]) -> Optional[dict]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if not row:
+                conn.execute("ROLLBACK")
+                return None
+            data = pickle.loads(row[0])
+            fn(data)
+            conn.execute("UPDATE sessions SET data = ? WHERE id = ?", (pickle.dumps(data), session_id))
+            conn.execute("COMMIT")
+            return data
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def delete(self, session_id: str) -> Optional[dict]:
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row:
+                book_id = pickle.loads(row[0])['book_id']
+                conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                conn.execute("UPDATE books SET refs = refs - 1 WHERE id = ?", (book_id,))
+                conn.execute("DELETE FROM books WHERE id = ? AND refs <= 0", (book_id,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return pickle.loads(row[0]) if row else None
+
+    def __contains__(self, session_id) -> bool:
+        row = self._connect().execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row is not None
+
+
+def create_session_store(url: str = ''):
+    """Tạo store theo URL: '' = bộ nhớ process, 'sqlite:///path/to/sessions.db' = SQLite dùng chung"""
+    if not url:
+        return MemorySessionStore()
+    if url.startswith('sqlite:///'):
+        return SqliteSessionStore(url[len('sqlite:///'):])
+    raise ValueError(f"Unsupported session store: {url}")
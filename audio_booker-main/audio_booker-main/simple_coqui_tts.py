@@ -4,19 +4,23 @@ import tempfile
 import time
 from typing import Optional
 
+from audio_utils import probe_duration
+from cancellation import CancellationToken, SynthesisCancelled
+from coqui_batcher import synthesize_to_file
+from coqui_model_cache import DEFAULT_COQUI_MODEL, inference_context, model_cache
+
 class SimpleCoquiTTSEngine:
-    def __init__(self):
+    def __init__(self, model_name: str = DEFAULT_COQUI_MODEL):
         self.tts_available = False
+        self.model_name = model_name
         self._check_tts_availability()
     
     def _check_tts_availability(self):
-        """Kiểm tra xem TTS có sẵn không"""
-        try:
-            # Thử import TTS
-            from TTS.api import TTS
+        """Kiểm tra xem TTS có sẵn không (model được nạp khi dùng lần đầu)"""
+        if model_cache.is_available():
             self.tts_available = True
             print("✅ TTS available")
-        except ImportError:
+        else:
             print("❌ TTS not available, using fallback")
             self.tts_available = False
     
@@ -32,27 +36,27 @@ class SimpleCoquiTTSEngine:
             text += '.'
         return text.strip()
     
-    def generate_audio(self, text: str, output_path: str, dialect: str = 'north') -> bool:
-        """Tạo file audio từ text"""
+    def generate_audio(self, text: str, output_path: str, dialect: str = 'north',
+                       cancel: Optional[CancellationToken] = None) -> bool:
+        """Tạo file audio từ text (dừng ở ranh giới câu kế tiếp nếu bị hủy)"""
         if not self.tts_available:
             print("❌ TTS not available")
             return False
         
         try:
-            from TTS.api import TTS
-            
             # Xử lý text
             processed_text = self._preprocess_text(text)
             print(f"Generating audio for: {processed_text[:50]}...")
             
-            # Sử dụng model tiếng Việt
-            tts = TTS("tts_models/vi/vivos/vits")
-            
-            # Tạo audio
-            tts.tts_to_file(
-                text=processed_text,
-                file_path=output_path
-            )
+            # Gom câu với các session khác thành batch; nếu batching tắt thì tạo cả trang một lần
+            if not synthesize_to_file(processed_text, output_path, self.model_name, cancel):
+                # Model tiếng Việt dùng chung cho toàn process (chỉ nạp một lần)
+                tts = model_cache.get(self.model_name)
+                with inference_context():
+                    tts.tts_to_file(
+                        text=processed_text,
+                        file_path=output_path
+                    )
             
             # Kiểm tra file đã được tạo
             if os.path.exists(output_path):
@@ -62,6 +66,9 @@ class SimpleCoquiTTSEngine:
                 print(f"❌ Failed to generate audio: {output_path}")
                 return False
                 
+        except SynthesisCancelled:
+            print(f"⚠️ Synthesis cancelled: {output_path}")
+            return False
         except Exception as e:
             print(f"❌ Error generating audio: {e}")
             return False
@@ -118,20 +125,8 @@ class SimpleCoquiTTSEngine:
         return self.speak_text(test_text, dialect)
     
     def get_audio_duration(self, audio_path: str) -> float:
-        """Lấy thời lượng của file audio (giây)"""
-        try:
-            if not os.path.exists(audio_path):
-                return 0.0
-            
-            import wave
-            with wave.open(audio_path, 'rb') as audio_file:
-                frames = audio_file.getnframes()
-                sample_rate = audio_file.getframerate()
-                duration = frames / float(sample_rate)
-                return duration
-        except Exception as e:
-            print(f"Error getting audio duration: {e}")
-            return 0.0
+        """Lấy thời lượng của file audio (giây), hỗ trợ WAV và MP3"""
+        return probe_duration(audio_path)
     
     def cleanup(self):
         """Dọn dẹp tài nguyên"""
@@ -0,0 +1,81 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from socketio.pubsub_manager import PubSubManager
+
+
+class SqliteQueueManager(PubSubManager):
+    """Message queue cho Socket.IO giữa nhiều worker trên cùng máy, dùng một file SQLite.
+
+    Thay cho Redis/RabbitMQ khi chạy thử hoặc test: mỗi emit tới room được ghi
+    thành một dòng, mọi worker (kể cả worker gửi) đọc các dòng mới theo chu kỳ
+    poll_interval rồi phát tới client đang kết nối với mình. Dòng cũ hơn
+    retention giây được xóa dần.
+
+        socketio = SocketIO(app, client_manager=SqliteQueueManager('cache/queue.db'))
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path: str, channel: str = 'socketio', write_only: bool = False, logger=None,
+                 poll_interval: float = 0.05, retention: float = 60.0):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.path = path
+        self.poll_interval = poll_interval
+        self.retention = retention
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connect()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS messages ("
+                     "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+                     "created REAL NOT NULL, payload BLOB NOT NULL)")
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def _publish(self, data):
+        self._connect().execute(
+            "INSERT INTO messages (channel, created, payload) VALUES (?, ?, ?)",
+            (self.channel, time.time(), pickle.dumps(data))
+        )
+
+    def _sleep(self, seconds: float):
+        # Dùng sleep của server để không chặn event loop khi chạy với eventlet
+        if self.server is not None:
+            self.server.sleep(seconds)
+        else:
+            time.sleep(seconds)
+
+    def _listen(self):
+        conn = self._connect()
+        # Chỉ nhận các message gửi sau khi worker khởi động
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+        last_cleanup = time.monotonic()
+        while True:
+            try:
+                rows = conn.execute(
+                    "SELECT id, payload FROM messages WHERE channel = ? AND id > ? ORDER BY id",
+                    (self.channel, last_id)
+                ).fetchall()
+            except sqlite3.OperationalError:
+                rows = []
+            for message_id, payload in rows:
+                last_id = message_id
+                yield pickle.loads(payload)
+
+            if time.monotonic() - last_cleanup > self.retention:
+                last_cleanup = time.monotonic()
+                try:
+                    conn.execute("DELETE FROM messages WHERE created < ?", (time.time() - self.retention,))
+                except sqlite3.OperationalError:
+                    pass
+            if not rows:
+                self._sleep(self.poll_interval)
@@ -5,7 +5,12 @@ class AudioBookApp {
         this.isPlaying = false;
         this.currentPage = 0;
         this.totalPages = 0;
+        this.currentDuration = 0;
         this.audioPlayer = null;
+        // page_number -> { data, blobUrl } for upcoming pages downloaded ahead of time
+        this.preloaded = new Map();
+        // Page we switched to locally from a preload, before the server's new_page arrives
+        this.locallyAdvancedTo = null;
         
         this.initializeElements();
         this.setupEventListeners();
@@ -25,6 +30,8 @@ class AudioBookApp {
         this.pauseBtn = document.getElementById('pause-btn');
         this.stopBtn = document.getElementById('stop-btn');
         this.homeBtn = document.getElementById('home-btn');
+        this.seekInput = document.getElementById('seek-input');
+        this.seekBtn = document.getElementById('seek-btn');
         this.dialectLiveInputs = document.querySelectorAll('input[name="dialect-live"]');
         
         this.leftPage = document.getElementById('left-page');
@@ -52,6 +59,7 @@ class AudioBookApp {
         this.pauseBtn.addEventListener('click', () => this.pauseReading());
         this.stopBtn.addEventListener('click', () => this.stopReading());
         this.homeBtn.addEventListener('click', () => this.goHome());
+        this.seekBtn.addEventListener('click', () => this.seekTo(parseInt(this.seekInput.value, 10) - 1));
         this.dialectLiveInputs.forEach((el) => {
             el.addEventListener('change', () => this.changeDialect(el.value));
         });
@@ -62,6 +70,24 @@ class AudioBookApp {
         this.audioPlayer.addEventListener('canplay', () => this.onAudioCanPlay());
     }
 
+    seekTo(pageNumber) {
+        if (!this.currentSession || isNaN(pageNumber)) return;
+        if (pageNumber < 0 || pageNumber >= this.totalPages) {
+            this.showError(`Trang phải từ 1 đến ${this.totalPages}`);
+            return;
+        }
+        // Preloaded pages belong to the old position
+        this.clearPreloaded();
+        this.audioPlayer.pause();
+        this.isPlaying = true;
+        this.playBtn.style.display = 'none';
+        this.pauseBtn.style.display = 'inline-block';
+        this.socket.emit('seek', {
+            session_id: this.currentSession,
+            page_number: pageNumber
+        });
+    }
+
     changeDialect(dialect) {
         if (!this.currentSession) return;
         // Notify server to apply new dialect for next pages
@@ -83,6 +109,30 @@ class AudioBookApp {
             this.handleNewPage(data);
         });
         
+        this.socket.on('manifest_ready', (data) => {
+            this.preloadPage(data);
+        });
+        
+        this.socket.on('page_audio', (data, ack) => {
+            // Small pages arrive as bytes ahead of their new_page/manifest_ready event
+            this.storeInlineAudio(data);
+            if (ack) ack();
+        });
+        
+        this.socket.on('dialect_changed', () => {
+            // Preloaded audio was rendered with the previous dialect
+            this.clearPreloaded();
+        });
+        
+        this.socket.on('queue_position', (data) => {
+            // Server is at capacity: reading starts by itself once a slot frees up
+            this.showQueuePosition(data);
+        });
+        
+        this.socket.on('admitted', () => {
+            this.showMessage('Đến lượt bạn, đang tạo audio...', 'success');
+        });
+        
         this.socket.on('error', (data) => {
             this.showError(data.message);
         });
@@ -142,7 +192,7 @@ class AudioBookApp {
                 this.bookTitle.textContent = result.filename;
                 
                 // Join socket room
-                this.socket.emit('join_session', { session_id: this.currentSession });
+                this.socket.emit('join_session', { session_id: this.currentSession, inline_audio: true });
                 
                 this.showBookSection();
                 this.showMessage('File uploaded successfully!', 'success');
@@ -169,6 +219,8 @@ class AudioBookApp {
             .then(result => {
                 if (!result.success) {
                     this.showError(result.message);
+                } else if (result.queued) {
+                    this.showQueuePosition(result);
                 }
             })
             .catch(error => {
@@ -176,6 +228,11 @@ class AudioBookApp {
             });
     }
     
+    showQueuePosition(data) {
+        const wait = Math.ceil(data.estimated_wait || 0);
+        this.showMessage(`Máy chủ đang bận: bạn ở vị trí ${data.queue_position} trong hàng chờ, khoảng ${wait} giây`, 'success');
+    }
+    
     pauseReading() {
         this.isPlaying = false;
         this.audioPlayer.pause();
@@ -203,6 +260,7 @@ class AudioBookApp {
             } catch (_) {}
         }
         this.currentSession = null;
+        this.clearPreloaded();
         // Reset UI
         this.bookSection.style.display = 'none';
         this.uploadSection.style.display = 'block';
@@ -215,12 +273,72 @@ class AudioBookApp {
     
     handleNewPage(data) {
         console.log('New page received:', data);
+        (data.manifest || []).forEach((entry) => this.preloadPage(entry));
+        if (this.locallyAdvancedTo === data.page_number) {
+            // Already playing this page from the preload
+            this.locallyAdvancedTo = null;
+            return;
+        }
+        const preloaded = this.preloaded.get(data.page_number);
+        const usable = preloaded && preloaded.blobUrl && preloaded.data.audio_url === data.audio_url;
+        this.showPage(data, usable ? preloaded.blobUrl : data.audio_url);
+    }
+    
+    showPage(data, src) {
         // Defer UI update until audio can play to keep text strictly in sync
         this.pendingPageData = data;
-        this.audioPlayer.src = data.audio_url;
+        this.audioPlayer.src = src;
         this.audioPlayer.load();
     }
     
+    preloadPage(entry) {
+        if (!entry || !entry.audio_url || entry.page_number <= this.currentPage) return;
+        if (this.preloaded.has(entry.page_number)) return;
+        const item = { data: entry, blobUrl: null };
+        this.preloaded.set(entry.page_number, item);
+        fetch(entry.audio_url)
+            .then(response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status}`);
+                return response.blob();
+            })
+            .then(blob => {
+                // Dropped meanwhile (page played, dialect changed or session left)
+                if (this.preloaded.get(entry.page_number) !== item) return;
+                item.blobUrl = URL.createObjectURL(blob);
+            })
+            .catch(error => {
+                console.warn('Preload failed for page', entry.page_number, error);
+                this.preloaded.delete(entry.page_number);
+            });
+    }
+    
+    storeInlineAudio(data) {
+        const current = this.preloaded.get(data.page_number);
+        if (current && current.data.audio_url === data.audio_url && current.blobUrl) return;
+        if (current && current.blobUrl) URL.revokeObjectURL(current.blobUrl);
+        const { audio, mime_type, ...entry } = data;
+        const blob = new Blob([audio], { type: mime_type });
+        this.preloaded.set(data.page_number, { data: entry, blobUrl: URL.createObjectURL(blob) });
+    }
+    
+    prunePreloaded() {
+        // Release pages that are behind the page now playing
+        for (const [pageNumber, item] of this.preloaded) {
+            if (pageNumber < this.currentPage) {
+                if (item.blobUrl) URL.revokeObjectURL(item.blobUrl);
+                this.preloaded.delete(pageNumber);
+            }
+        }
+    }
+    
+    clearPreloaded() {
+        for (const item of this.preloaded.values()) {
+            if (item.blobUrl) URL.revokeObjectURL(item.blobUrl);
+        }
+        this.preloaded.clear();
+        this.locallyAdvancedTo = null;
+    }
+    
     animatePageFlip() {
         this.book.classList.add('flipping');
         
@@ -242,6 +360,13 @@ class AudioBookApp {
                 session_id: this.currentSession,
                 page_number: this.currentPage
             });
+            // Switch straight to the next page if it is already downloaded;
+            // the server's new_page for it is then only used for its manifest
+            const next = this.preloaded.get(this.currentPage + 1);
+            if (next && next.blobUrl) {
+                this.locallyAdvancedTo = next.data.page_number;
+                this.showPage(next.data, next.blobUrl);
+            }
         }
     }
 
@@ -253,7 +378,9 @@ class AudioBookApp {
         // Update page content and progress now
         this.rightText.textContent = data.text;
         this.currentPage = data.page_number;
+        this.currentDuration = data.duration || 0;
         this.updateProgress();
+        this.prunePreloaded();
         // Start playback
         if (this.isPlaying) {
             this.audioPlayer.play().catch(error => {
@@ -269,7 +396,14 @@ class AudioBookApp {
     }
     
     updateProgress() {
-        this.bookProgress.textContent = `Trang ${this.currentPage + 1} / ${this.totalPages}`;
+        let progress = `Trang ${this.currentPage + 1} / ${this.totalPages}`;
+        if (this.currentDuration) {
+            const total = Math.floor(this.currentDuration);
+            const minutes = Math.floor(total / 60);
+            const seconds = String(total % 60).padStart(2, '0');
+            progress += ` (${minutes}:${seconds})`;
+        }
+        this.bookProgress.textContent = progress;
     }
     
     showBookSection() {
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Synthesizer giả lập nói giao thức dòng JSON của PersistentSubprocessTTSEngine:
+ghi WAV im lặng dài khoảng 60 ms mỗi ký tự. Dùng cho test và benchmark.
+
+    APP_TTS_ENGINE=subprocess APP_SYNTH_COMMAND="python stub_synth.py" python app.py
+"""
+
+import argparse
+import json
+import sys
+import time
+import wave
+
+
+def write_silence(path: str, text: str, sample_rate: int = 16000):
+    frames = int(len(text) * 0.06 * sample_rate)
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(sample_rate)
+        w.writeframes(b'\0\0' * frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub line-protocol synthesizer')
+    parser.add_argument('--delay', type=float, default=0.0, help='thời gian xử lý mỗi request (giây)')
+    args = parser.parse_args()
+
+    print(json.dumps({'ready': True}), flush=True)
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            time.sleep(args.delay)
+            write_silence(request['output'], request.get('text', ''))
+            reply = {'id': request_id, 'ok': True}
+        except Exception as e:
+            reply = {'id': request_id, 'ok': False, 'error': str(e)}
+        print(json.dumps(reply), flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Server TTS giả lập (tương thích với endpoint translate_tts) để benchmark
+GoogleTTSEngine mà không cần gọi dịch vụ thật. Có thể bơm lỗi: trả 503,
+trả lời rất chậm, hoặc đóng kết nối giữa chừng.
+
+    python stub_tts_server.py --port 8765 --latency 0.15
+    python stub_tts_server.py --error-rate 0.1 --slow-rate 0.05 --slow-latency 3
+    APP_GOOGLE_TTS_URL=http://127.0.0.1:8765/translate_tts python app.py
+"""
+
+import argparse
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Một frame MPEG-1 Layer III im lặng, 128 kbps / 44.1 kHz (417 byte, ~26 ms)
+_FRAME = bytes([0xFF, 0xFB, 0x90, 0x00]) + b'\0' * 413
+
+
+def fake_mp3(text: str) -> bytes:
+    """MP3 im lặng dài khoảng 60 ms mỗi ký tự"""
+    frames = max(1, int(len(text) * 0.06 / 0.026))
+    return _FRAME * frames
+
+
+class StubTTSHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        parsed = urllib.parse.urlsplit(self.path)
+        if parsed.path != '/translate_tts':
+            self._send(200, b'ok', 'text/plain')
+            return
+
+        with server.stats_lock:
+            server.requests += 1
+        text = urllib.parse.parse_qs(parsed.query).get('q', [''])[0]
+
+        roll = random.random()
+        if roll < server.drop_rate:
+            # Đóng kết nối không trả lời
+            self.close_connection = True
+            return
+        roll -= server.drop_rate
+        if roll < server.error_rate:
+            self._send(503, b'unavailable', 'text/plain')
+            return
+        roll -= server.error_rate
+        latency = server.slow_latency if roll < server.slow_rate else server.latency
+
+        time.sleep(max(0.0, latency + random.uniform(-server.jitter, server.jitter)))
+        self._send(200, fake_mp3(text), 'audio/mpeg')
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StubTTSServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency: float = 0.1, jitter: float = 0.0, error_rate: float = 0.0,
+                 slow_rate: float = 0.0, slow_latency: float = 3.0, drop_rate: float = 0.0):
+        super().__init__(address, StubTTSHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.drop_rate = drop_rate
+        self.requests = 0
+        self.connections = 0
+        self.stats_lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self.stats_lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/translate_tts"
+
+
+def start_stub_server(port: int = 0, **options) -> StubTTSServer:
+    """Chạy stub server trên thread nền, trả về server (server.url là endpoint TTS)"""
+    server = StubTTSServer(('127.0.0.1', port), **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stub TTS HTTP server')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.1, help='độ trễ mỗi request (giây)')
+    parser.add_argument('--jitter', type=float, default=0.0, help='dao động độ trễ (giây)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='tỉ lệ trả 503')
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='tỉ lệ request rất chậm')
+    parser.add_argument('--slow-latency', type=float, default=3.0, help='độ trễ của request chậm (giây)')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='tỉ lệ đóng kết nối không trả lời')
+    args = parser.parse_args()
+
+    server = StubTTSServer(('127.0.0.1', args.port), latency=args.latency, jitter=args.jitter,
+                           error_rate=args.error_rate, slow_rate=args.slow_rate,
+                           slow_latency=args.slow_latency, drop_rate=args.drop_rate)
+    print(f"🧪 Stub TTS server: {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
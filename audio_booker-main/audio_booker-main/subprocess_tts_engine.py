@@ -0,0 +1,257 @@
+import os
+import json
+import queue
+import shlex
+import subprocess
+import threading
+import time
+from typing import List, Optional, Union
+
+from audio_utils import probe_duration
+from cancellation import CancellationToken, is_cancelled
+
+# Chu kỳ kiểm tra token hủy trong các vòng chờ (giây)
+CANCEL_POLL_INTERVAL = 0.05
+
+
+class SynthesizerProcess:
+    """Một process synthesizer sống lâu, giao tiếp qua stdin/stdout theo từng dòng JSON.
+
+    Giao thức:
+    - Khi sẵn sàng, process in một dòng {"ready": true}.
+    - Mỗi request là một dòng {"id", "text", "output", "voice"}.
+    - Mỗi kết quả là một dòng {"id", "ok", "error"}.
+    """
+
+    def __init__(self, command: List[str], startup_timeout: float = 30.0):
+        self.command = command
+        self.startup_timeout = startup_timeout
+        self.proc = None
+        self.restarts = 0
+        self._lines = None
+        self._next_id = 0
+
+    def start(self) -> bool:
+        """Khởi động process và chờ dòng ready"""
+        self._lines = queue.Queue()
+        try:
+            self.proc = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding='utf-8',
+                bufsize=1
+            )
+        except Exception as e:
+            print(f"❌ Cannot start synthesizer {self.command[0]}: {e}")
+            self.proc = None
+            return False
+
+        threading.Thread(target=self._read_stdout, args=(self.proc, self._lines), daemon=True).start()
+
+        deadline = time.monotonic() + self.startup_timeout
+        while True:
+            message = self._next_message(deadline)
+            if message is None:
+                print(f"❌ Synthesizer did not become ready: {self.command[0]}")
+                self.kill()
+                return False
+            if message.get('ready'):
+                return True
+
+    @staticmethod
+    def _read_stdout(proc, lines):
+        for line in proc.stdout:
+            lines.put(line)
+        lines.put(None)  # EOF: process đã thoát
+
+    def _next_message(self, deadline: float, cancel: Optional[CancellationToken] = None) -> Optional[dict]:
+        """Dòng JSON kế tiếp từ stdout (None nếu hết giờ, bị hủy hoặc process đã thoát)"""
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or is_cancelled(cancel):
+                return None
+            try:
+                line = self._lines.get(timeout=min(remaining, CANCEL_POLL_INTERVAL) if cancel else remaining)
+            except queue.Empty:
+                continue
+            if line is None:
+                return None
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                return json.loads(line)
+            except ValueError:
+                # Bỏ qua log không phải JSON của synthesizer
+                continue
+
+    def is_alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def synthesize(self, text: str, output_path: str, voice: Optional[dict], timeout: float,
+                   cancel: Optional[CancellationToken] = None) -> bool:
+        """Gửi một request và chờ kết quả; process bị treo hoặc chết sẽ được khởi động lại.
+
+        Giao thức không có lệnh hủy, nên request bị hủy giữa chừng sẽ kill
+        process (được khởi động lại ở request kế tiếp) để slot rảnh ngay.
+        """
+        if is_cancelled(cancel):
+            return False
+        if not self.is_alive():
+            self.restarts += 1
+            if not self.start():
+                return False
+
+        self._next_id += 1
+        request_id = self._next_id
+        request = {'id': request_id, 'text': text, 'output': output_path, 'voice': voice or {}}
+        try:
+            self.proc.stdin.write(json.dumps(request, ensure_ascii=False) + '\n')
+            self.proc.stdin.flush()
+        except (BrokenPipeError, OSError) as e:
+            print(f"❌ Synthesizer pipe broken: {e}")
+            self.kill()
+            return False
+
+        deadline = time.monotonic() + timeout
+        while True:
+            message = self._next_message(deadline, cancel)
+            if message is None:
+                if is_cancelled(cancel):
+                    print(f"⚠️ Synthesis cancelled (request {request_id}), killing synthesizer")
+                    self.kill()
+                    return False
+                print(f"❌ Synthesizer timed out or crashed (request {request_id}), restarting")
+                self.kill()
+                return False
+            if message.get('id') != request_id:
+                continue
+            if not message.get('ok'):
+                print(f"❌ Synthesizer error: {message.get('error')}")
+                return False
+            return os.path.exists(output_path)
+
+    def kill(self):
+        if self.proc is None:
+            return
+        try:
+            self.proc.kill()
+            self.proc.wait(timeout=5)
+        except Exception:
+            pass
+        self.proc = None
+
+    def close(self):
+        """Đóng stdin để process tự thoát, kill nếu không thoát"""
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+            self.proc.wait(timeout=5)
+        except Exception:
+            self.kill()
+        self.proc = None
+
+
+class PersistentSubprocessTTSEngine:
+    """Engine dùng pool synthesizer CLI chạy lâu dài (không tốn chi phí spawn process mỗi trang).
+
+    Lệnh synthesizer phải nói giao thức của SynthesizerProcess, ví dụ:
+    - python stub_synth.py              (stub cho test/benchmark)
+    - python espeak_synth_host.py       (espeak-ng qua libespeak-ng)
+    - powershell -File sapi_synth_host.ps1   (Windows System.Speech)
+    """
+
+    def __init__(self, command: Optional[Union[str, List[str]]] = None, pool_size: Optional[int] = None,
+                 timeout: Optional[float] = None, voices: Optional[dict] = None):
+        command = command or os.environ.get('APP_SYNTH_COMMAND', '')
+        if isinstance(command, str):
+            command = shlex.split(command, posix=(os.name != 'nt'))
+        self.command = command
+        self.pool_size = pool_size or int(os.environ.get('APP_SYNTH_POOL_SIZE', '2'))
+        self.timeout = timeout or float(os.environ.get('APP_SYNTH_TIMEOUT', '60'))
+        self.voices = voices or {}
+        self.available = False
+        self._processes = []
+        self._idle = queue.Queue()
+        self._initialize_engine()
+
+    def _initialize_engine(self):
+        """Khởi động pool synthesizer"""
+        if not self.command:
+            print("❌ No synthesizer command configured (APP_SYNTH_COMMAND)")
+            return
+
+        for _ in range(max(1, self.pool_size)):
+            proc = SynthesizerProcess(self.command)
+            if not proc.start():
+                break
+            self._processes.append(proc)
+            self._idle.put(proc)
+
+        self.available = bool(self._processes)
+        if self.available:
+            print(f"✅ Persistent synthesizer started: {self.command[0]} x{len(self._processes)}")
+
+    def _preprocess_text(self, text: str) -> str:
+        """Xử lý text trước khi đọc"""
+        import re
+        text = re.sub(r'\s+', ' ', text)
+        if text and text[-1] not in '.!?':
+            text += '.'
+        return text.strip()
+
+    def generate_audio(self, text: str, output_path: str, dialect: str = 'north',
+                       cancel: Optional[CancellationToken] = None) -> bool:
+        """Tạo file audio từ text qua một synthesizer đang rảnh trong pool"""
+        if not self.available:
+            print("❌ Persistent synthesizer not available")
+            return False
+
+        processed_text = self._preprocess_text(text)
+        print(f"Generating audio for: {processed_text[:50]}...")
+
+        proc = self._acquire(cancel)
+        if proc is None:
+            return False
+        try:
+            return proc.synthesize(processed_text, os.path.abspath(output_path),
+                                   self.voices.get(dialect), self.timeout, cancel)
+        except Exception as e:
+            print(f"❌ Error generating audio: {e}")
+            return False
+        finally:
+            self._idle.put(proc)
+
+    def _acquire(self, cancel: Optional[CancellationToken]) -> Optional[SynthesizerProcess]:
+        """Chờ một synthesizer rảnh (None nếu job bị hủy trong lúc chờ)"""
+        if cancel is None:
+            return self._idle.get()
+        while not cancel.cancelled:
+            try:
+                return self._idle.get(timeout=CANCEL_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+        return None
+
+    def get_available_voices(self) -> dict:
+        """Lấy danh sách giọng nói có sẵn"""
+        return {
+            'north': f"{self.command[0] if self.command else 'synth'} (north)",
+            'central': f"{self.command[0] if self.command else 'synth'} (central)",
+            'south': f"{self.command[0] if self.command else 'synth'} (south)"
+        }
+
+    def get_audio_duration(self, audio_path: str) -> float:
+        """Lấy thời lượng của file audio (giây), hỗ trợ WAV và MP3"""
+        return probe_duration(audio_path)
+
+    def cleanup(self):
+        """Dọn dẹp tài nguyên"""
+        for proc in self._processes:
+            proc.close()
+        self._processes = []
+        self.available = False
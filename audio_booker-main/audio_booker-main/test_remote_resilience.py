@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test ResilientFetcher với stub_tts_server bơm lỗi: hedging, retry, circuit breaker
+
+    python -m unittest test_remote_resilience
+"""
+
+import random
+import threading
+import unittest
+import urllib.parse
+import urllib.request
+
+from http_pool import KeepAliveConnectionPool
+from remote_resilience import CircuitBreaker, CircuitOpenError, LatencyTracker, ResilientFetcher, RetryBudget
+from stub_tts_server import start_stub_server
+
+
+def fetch(url: str, text: str) -> bytes:
+    """GET endpoint translate_tts của stub (HTTPError/URLError với 503 hoặc kết nối bị đóng)"""
+    query = urllib.parse.urlencode({'q': text})
+    with urllib.request.urlopen(f"{url}?{query}", timeout=5) as response:
+        return response.read()
+
+
+class ResilientFetcherStubTest(unittest.TestCase):
+
+    def setUp(self):
+        random.seed(1234)
+        self.server = None
+
+    def tearDown(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def start(self, **faults):
+        self.server = start_stub_server(**faults)
+        return self.server.url
+
+    def test_slow_requests_are_hedged(self):
+        url = self.start(latency=0.02, slow_rate=0.5, slow_latency=1.0)
+        fetcher = ResilientFetcher(default_hedge_delay=0.2, budget=RetryBudget(initial_tokens=20.0))
+
+        for _ in range(20):
+            self.assertTrue(fetcher.call(fetch, url, 'Xin chào'))
+
+        stats = fetcher.snapshot()
+        self.assertEqual(stats['calls'], 20)
+        self.assertGreater(stats['hedges'], 0)
+        self.assertGreater(stats['hedge_wins'], 0)
+        self.assertLessEqual(stats['hedge_wins'], stats['hedges'])
+        self.assertEqual(stats['failures'], 0)
+
+    def test_errors_are_retried(self):
+        url = self.start(latency=0.0, error_rate=0.4, drop_rate=0.1)
+        fetcher = ResilientFetcher(max_retries=4, base_backoff=0.01, budget=RetryBudget(initial_tokens=20.0),
+                                   breaker=CircuitBreaker(failure_threshold=100))
+
+        succeeded = 0
+        for _ in range(20):
+            try:
+                succeeded += bool(fetcher.call(fetch, url, 'Xin chào'))
+            except Exception:
+                pass
+
+        stats = fetcher.snapshot()
+        self.assertGreater(stats['retries'], 0)
+        self.assertEqual(succeeded + stats['failures'], 20)
+        self.assertGreater(succeeded, stats['failures'])
+
+    def test_circuit_opens_and_fails_fast(self):
+        url = self.start(latency=0.0, error_rate=1.0)
+        fetcher = ResilientFetcher(max_retries=0, breaker=CircuitBreaker(failure_threshold=3, cooldown=60.0))
+
+        for _ in range(3):
+            with self.assertRaises(Exception) as raised:
+                fetcher.call(fetch, url, 'Xin chào')
+            self.assertNotIsInstance(raised.exception, CircuitOpenError)
+        with self.assertRaises(CircuitOpenError):
+            fetcher.call(fetch, url, 'Xin chào')
+
+        self.assertEqual(fetcher.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(fetcher.snapshot()['rejected'], 1)
+        self.assertEqual(self.server.requests, 3)
+
+    def test_stats_are_consistent_across_threads(self):
+        url = self.start(latency=0.0, error_rate=0.3)
+        fetcher = ResilientFetcher(max_retries=3, base_backoff=0.0, budget=RetryBudget(initial_tokens=20.0),
+                                   breaker=CircuitBreaker(failure_threshold=1000))
+        outcomes = []
+
+        def worker():
+            for _ in range(10):
+                try:
+                    fetcher.call(fetch, url, 'Xin chào')
+                    outcomes.append(True)
+                except Exception:
+                    outcomes.append(False)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        stats = fetcher.snapshot()
+        self.assertEqual(stats['calls'], 80)
+        self.assertEqual(stats['failures'], outcomes.count(False))
+        self.assertGreaterEqual(self.server.requests, stats['calls'] + stats['retries'])
+
+    def pooled_fetcher(self, url: str, max_connections: int, **options):
+        """Fetcher gọi qua pool kết nối như GoogleTTSEngine: độ trễ đo trong request, không hedge khi pool đầy"""
+        pool = KeepAliveConnectionPool(url, max_connections=max_connections)
+        fetcher = ResilientFetcher(timed_by_caller=True, can_hedge=pool.has_free_slot, **options)
+
+        def fetch_pooled(text: str) -> bytes:
+            timing = {}
+            status, body = pool.get({'q': text}, timing=timing)
+            if status != 200:
+                raise IOError(f"status {status}")
+            fetcher.record_latency(timing['seconds'])
+            return body
+
+        return fetcher, fetch_pooled
+
+    def test_no_hedge_when_pool_is_full(self):
+        self.start(latency=0.3)
+        fetcher, fetch_pooled = self.pooled_fetcher(self.server.url, 1, default_hedge_delay=0.05)
+
+        self.assertTrue(fetcher.call(fetch_pooled, 'Xin chào'))
+
+        stats = fetcher.snapshot()
+        self.assertEqual(stats['hedges'], 0)
+        self.assertEqual(stats['hedges_skipped'], 1)
+        self.assertEqual(self.server.requests, 1)
+
+    def test_latency_excludes_pool_queueing(self):
+        self.start(latency=0.1)
+        fetcher, fetch_pooled = self.pooled_fetcher(self.server.url, 1, default_hedge_delay=5.0)
+        fetcher.latency = LatencyTracker(min_samples=1)
+
+        threads = [threading.Thread(target=fetcher.call, args=(fetch_pooled, 'Xin chào')) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Bốn request nối đuôi nhau trên một kết nối: request cuối chờ ~0.3s nhưng chỉ chạy ~0.1s
+        self.assertLess(fetcher.latency.percentile(100), 0.25)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -74,10 +74,10 @@ class TextProcessor:
         return pages
     
     def _split_into_sentences(self, text: str) -> List[str]:
-        """Tách text thành câu"""
+        """Tách text thành câu (giữ dấu kết câu để có thể tách lại theo câu khi tạo audio)"""
         # Pattern để tách câu tiếng Việt
-        sentence_endings = r'[.!?]+'
-        sentences = re.split(sentence_endings, text)
+        sentence_pattern = r'[^.!?]+[.!?]*'
+        sentences = re.findall(sentence_pattern, text)
         
         # Làm sạch và lọc câu rỗng
         cleaned_sentences = []
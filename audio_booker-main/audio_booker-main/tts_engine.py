@@ -2,17 +2,23 @@ import os
 import pyttsx3
 import threading
 import time
-from typing import Optional
+from typing import List, Optional, Tuple
 import wave
 import struct
 import re
 import subprocess
 import platform
 
+from audio_utils import probe_duration
+from cancellation import CancellationToken, is_cancelled
+from pyttsx3_pool import get_shared_pool
+
 class TTSEngine:
     def __init__(self):
         self.engine = None
         self.voices = {}
+        # Driver pyttsx3 không thread-safe: các câu được tạo song song phải chờ nhau khi chạy trực tiếp
+        self._driver_lock = threading.Lock()
         self._initialize_engine()
     
     def _initialize_engine(self):
@@ -134,11 +140,14 @@ class TTSEngine:
         
         return converted_text
     
-    def generate_audio(self, text: str, output_path: str, dialect: str = 'north') -> bool:
-        """Tạo file audio từ text"""
+    def generate_audio(self, text: str, output_path: str, dialect: str = 'north',
+                       cancel: Optional[CancellationToken] = None) -> bool:
+        """Tạo file audio từ text (dừng sớm nếu token cancel bị hủy)"""
         if not self.engine:
             print("TTS engine not initialized")
             return False
+        if is_cancelled(cancel):
+            return False
         
         try:
             # Xử lý text trước khi đọc
@@ -154,15 +163,28 @@ class TTSEngine:
             # Thiết lập giọng nói theo vùng miền
             voice_config = self.voices.get(dialect, self.voices['north'])
             
-            if voice_config['voice_id']:
-                self.engine.setProperty('voice', voice_config['voice_id'])
-            
-            self.engine.setProperty('rate', voice_config['rate'])
-            self.engine.setProperty('volume', voice_config['volume'])
+            # Ưu tiên pool worker process để không chặn server và tránh dùng chung driver
+            pool = get_shared_pool()
+            if pool is not None:
+                ok = pool.synthesize(phonetic_text, voice_config, output_path, cancel=cancel)
+                if ok:
+                    print(f"Audio generated: {output_path}")
+                elif is_cancelled(cancel):
+                    print(f"Synthesis cancelled: {output_path}")
+                else:
+                    print(f"Failed to generate audio: {output_path}")
+                return ok
             
-            # Tạo file audio với text đã xử lý
-            self.engine.save_to_file(phonetic_text, output_path)
-            self.engine.runAndWait()
+            with self._driver_lock:
+                if voice_config['voice_id']:
+                    self.engine.setProperty('voice', voice_config['voice_id'])
+                
+                self.engine.setProperty('rate', voice_config['rate'])
+                self.engine.setProperty('volume', voice_config['volume'])
+                
+                # Tạo file audio với text đã xử lý
+                self.engine.save_to_file(phonetic_text, output_path)
+                self.engine.runAndWait()
             
             # Kiểm tra file đã được tạo
             if os.path.exists(output_path):
@@ -176,20 +198,54 @@ class TTSEngine:
             print(f"Error generating audio: {e}")
             return False
     
+    def generate_many(self, items: List[Tuple[str, str, str]],
+                      cancel: Optional[CancellationToken] = None) -> List[bool]:
+        """Tạo nhiều file audio [(text, output_path, dialect), ...] trong ít lần runAndWait nhất.
+
+        Các mục được gom theo giọng vùng miền: mỗi nhóm đặt thuộc tính giọng một
+        lần, xếp hàng mọi save_to_file rồi chạy driver một lần. Trả về kết quả
+        theo đúng thứ tự items.
+        """
+        results = [False] * len(items)
+        if not self.engine or not items or is_cancelled(cancel):
+            return results
+
+        groups = {}
+        for index, (text, output_path, dialect) in enumerate(items):
+            voice_dialect = dialect if dialect in self.voices else 'north'
+            phonetic_text = self._convert_to_phonetic(self._preprocess_text(text))
+            groups.setdefault(voice_dialect, []).append((index, phonetic_text, output_path))
+
+        pool = get_shared_pool()
+        for dialect, group in groups.items():
+            if is_cancelled(cancel):
+                break
+            voice_config = self.voices[dialect]
+            print(f"Generating {len(group)} audio files in one batch ({dialect})")
+            try:
+                if pool is not None:
+                    created = pool.synthesize_many([(text, path) for _, text, path in group],
+                                                   voice_config, cancel=cancel)
+                else:
+                    with self._driver_lock:
+                        if voice_config['voice_id']:
+                            self.engine.setProperty('voice', voice_config['voice_id'])
+                        self.engine.setProperty('rate', voice_config['rate'])
+                        self.engine.setProperty('volume', voice_config['volume'])
+                        for _, text, path in group:
+                            self.engine.save_to_file(text, path)
+                        self.engine.runAndWait()
+                    created = [os.path.exists(path) for _, _, path in group]
+            except Exception as e:
+                print(f"Error generating audio batch: {e}")
+                created = [False] * len(group)
+            for (index, _, _), ok in zip(group, created):
+                results[index] = ok
+        return results
+    
     def get_audio_duration(self, audio_path: str) -> float:
-        """Lấy thời lượng của file audio (giây)"""
-        try:
-            if not os.path.exists(audio_path):
-                return 0.0
-            
-            with wave.open(audio_path, 'rb') as audio_file:
-                frames = audio_file.getnframes()
-                sample_rate = audio_file.getframerate()
-                duration = frames / float(sample_rate)
-                return duration
-        except Exception as e:
-            print(f"Error getting audio duration: {e}")
-            return 0.0
+        """Lấy thời lượng của file audio (giây), hỗ trợ WAV và MP3"""
+        return probe_duration(audio_path)
     
     def speak_text(self, text: str, dialect: str = 'north'):
         """Đọc text trực tiếp (không lưu file)"""
@@ -205,14 +261,16 @@ class TTSEngine:
             
             voice_config = self.voices.get(dialect, self.voices['north'])
             
-            if voice_config['voice_id']:
-                self.engine.setProperty('voice', voice_config['voice_id'])
-            
-            self.engine.setProperty('rate', voice_config['rate'])
-            self.engine.setProperty('volume', voice_config['volume'])
-            
-            self.engine.say(phonetic_text)
-            self.engine.runAndWait()
+            # Driver dùng chung với generate_audio/generate_many: đặt giọng và chạy trong cùng một lần giữ lock
+            with self._driver_lock:
+                if voice_config['voice_id']:
+                    self.engine.setProperty('voice', voice_config['voice_id'])
+                
+                self.engine.setProperty('rate', voice_config['rate'])
+                self.engine.setProperty('volume', voice_config['volume'])
+                
+                self.engine.say(phonetic_text)
+                self.engine.runAndWait()
             return True
             
         except Exception as e:
@@ -1,14 +1,49 @@
+import atexit
 import os
 import tempfile
+import threading
 import time
 import subprocess
 from typing import Optional
 
+from audio_utils import probe_duration
+from cancellation import CancellationToken, is_cancelled
+from subprocess_tts_engine import PersistentSubprocessTTSEngine
+
+SAPI_HOST_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sapi_synth_host.ps1')
+
+# Pool host PowerShell dùng chung cho cả process theo giọng (mỗi session tạo engine
+# riêng nhưng không khởi động thêm process), False = không dùng được
+_persistent_hosts = {}
+_persistent_hosts_lock = threading.Lock()
+
+
+def _get_shared_host(voice_name: Optional[str]):
+    """Pool host sapi_synth_host.ps1 của process cho giọng voice_name, khởi động một lần"""
+    with _persistent_hosts_lock:
+        host = _persistent_hosts.get(voice_name)
+        if host is None:
+            voice = {'name': voice_name} if voice_name else {}
+            host = PersistentSubprocessTTSEngine(
+                command=['powershell', '-NoProfile', '-ExecutionPolicy', 'Bypass', '-File', SAPI_HOST_SCRIPT],
+                voices={'north': voice, 'central': voice, 'south': voice}
+            )
+            if host.available:
+                atexit.register(host.cleanup)
+            else:
+                host = False
+            _persistent_hosts[voice_name] = host
+        return host or None
+
+
 class VietnameseTTSEngine:
     def __init__(self):
         self.available = False
         self.voices = {}
         self.has_vietnamese_voice = False
+        # Host PowerShell chạy lâu dài (nạp System.Speech một lần), khởi động khi cần
+        self.persistent_host = None
+        self._persistent_failed = os.environ.get('APP_VI_PERSISTENT', '1') == '0'
         self._initialize_engine()
     
     def _initialize_engine(self):
@@ -114,8 +149,9 @@ class VietnameseTTSEngine:
         
         return text.strip()
     
-    def generate_audio(self, text: str, output_path: str, dialect: str = 'north') -> bool:
-        """Tạo file audio từ text"""
+    def generate_audio(self, text: str, output_path: str, dialect: str = 'north',
+                       cancel: Optional[CancellationToken] = None) -> bool:
+        """Tạo file audio từ text (kill process PowerShell nếu job bị hủy)"""
         if not self.available:
             print("TTS engine not available")
             return False
@@ -131,7 +167,17 @@ class VietnameseTTSEngine:
 
             print(f"Generating audio for: {processed_text[:80]}...")
 
-            # Ưu tiên sử dụng PowerShell System.Speech để ghi WAV ổn định
+            # Ưu tiên host PowerShell chạy lâu dài để không spawn process cho mỗi trang
+            host = self._get_persistent_host()
+            if host is not None and host.generate_audio(processed_text, output_path, dialect=dialect,
+                                                        cancel=cancel):
+                print(f"Audio generated with persistent PowerShell host: {output_path}")
+                return True
+            if is_cancelled(cancel):
+                print(f"Synthesis cancelled: {output_path}")
+                return False
+
+            # Dự phòng: PowerShell System.Speech cho riêng trang này
             ps_script = (
                 f"Add-Type -AssemblyName System.Speech; "
                 f"$speak = New-Object System.Speech.Synthesis.SpeechSynthesizer; "
@@ -140,14 +186,12 @@ class VietnameseTTSEngine:
                 f"$speak.Dispose();"
             )
 
-            result = subprocess.run(
-                ['powershell', '-Command', ps_script],
-                capture_output=True,
-                text=True,
-                timeout=60
-            )
+            returncode, stderr = self._run_powershell(ps_script, cancel, timeout=60)
+            if is_cancelled(cancel):
+                print(f"Synthesis cancelled: {output_path}")
+                return False
 
-            if result.returncode == 0 and os.path.exists(output_path):
+            if returncode == 0 and os.path.exists(output_path):
                 print(f"Audio generated with PowerShell: {output_path}")
                 return True
 
@@ -160,14 +204,49 @@ class VietnameseTTSEngine:
                     pass
 
             print("Failed to generate audio")
-            if result.stderr:
-                print(f"PowerShell error: {result.stderr}")
+            if stderr:
+                print(f"PowerShell error: {stderr}")
             return False
 
         except Exception as e:
             print(f"Error generating audio: {e}")
             return False
     
+    @staticmethod
+    def _run_powershell(ps_script: str, cancel: Optional[CancellationToken], timeout: float):
+        """Chạy một lệnh PowerShell, kill process khi hết giờ hoặc job bị hủy; trả về (returncode, stderr)"""
+        proc = subprocess.Popen(
+            ['powershell', '-Command', ps_script],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True
+        )
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                _, stderr = proc.communicate(timeout=0.1)
+                return proc.returncode, stderr
+            except subprocess.TimeoutExpired:
+                if is_cancelled(cancel) or time.monotonic() > deadline:
+                    proc.kill()
+                    _, stderr = proc.communicate()
+                    return None, stderr
+
+    def _get_persistent_host(self):
+        """Pool host sapi_synth_host.ps1 dùng chung cho cả process (None nếu không dùng được)"""
+        if self.persistent_host is not None or self._persistent_failed:
+            return self.persistent_host
+        if os.name != 'nt' or not os.path.exists(SAPI_HOST_SCRIPT):
+            self._persistent_failed = True
+            return None
+
+        host = _get_shared_host(getattr(self, 'powershell_voice', None))
+        if host is None:
+            self._persistent_failed = True
+            return None
+        self.persistent_host = host
+        return host
+    
     def speak_text(self, text: str, dialect: str = 'north') -> bool:
         """Đọc text trực tiếp (không lưu file)"""
         if not self.available:
@@ -216,22 +295,12 @@ class VietnameseTTSEngine:
         return self.speak_text(test_text, dialect)
     
     def get_audio_duration(self, audio_path: str) -> float:
-        """Lấy thời lượng của file audio (giây)"""
-        try:
-            if not os.path.exists(audio_path):
-                return 0.0
-            
-            import wave
-            with wave.open(audio_path, 'rb') as audio_file:
-                frames = audio_file.getnframes()
-                sample_rate = audio_file.getframerate()
-                duration = frames / float(sample_rate)
-                return duration
-        except Exception as e:
-            print(f"Error getting audio duration: {e}")
-            return 0.0
+        """Lấy thời lượng của file audio (giây), hỗ trợ WAV và MP3"""
+        return probe_duration(audio_path)
     
     def cleanup(self):
         """Dọn dẹp tài nguyên"""
         if hasattr(self, 'sapi'):
             del self.sapi
+        # Host dùng chung với các engine khác trong process, chỉ bỏ tham chiếu
+        self.persistent_host = None